@@ -0,0 +1,47 @@
+"""
+Benchmark normalizace datumů
+============================
+Ověřuje lineární škálování normalize_dates až do milionů řádků.
+
+Spuštění (z kořene repozitáře): python -m benchmarks.bench_dates [počty řádků...]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from trade_pipeline import normalize_dates, format_date_stats
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 3_000_000]
+
+
+def make_dates(n, seed=0):
+    """Syntetický sloupec datumů v mixu formátů ze SQLite a Excelu"""
+    rng = np.random.default_rng(seed)
+    base = pd.Timestamp('2020-06-01') + pd.to_timedelta(rng.integers(0, 5 * 365 * 86400, n), unit='s')
+    text = pd.Series(base.strftime('%Y-%m-%d %H:%M:%S'), dtype=object)
+
+    kind = rng.integers(0, 10, n)
+    text[kind == 0] = text[kind == 0] + '+01:00'
+    text[kind == 1] = text[kind == 1].str.replace(' ', 'T') + '-05:00'
+    text[kind == 2] = text[kind == 2].str.replace(' ', 'T') + 'Z'
+    text[kind == 3] = '1900-01-01 00:00:00'
+    text[kind == 4] = None
+    return text
+
+
+def run(sizes):
+    """Změří normalizaci pro každou velikost a vypíše ns na řádek"""
+    print(f"{'řádků':>12} {'čas [s]':>10} {'ns/řádek':>10}")
+    for n in sizes:
+        dates = make_dates(n)
+        start = time.perf_counter()
+        _, stats = normalize_dates(dates)
+        elapsed = time.perf_counter() - start
+        print(f"{n:>12,} {elapsed:>10.3f} {elapsed / n * 1e9:>10.0f}   {format_date_stats(stats)}")
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
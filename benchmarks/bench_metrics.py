@@ -0,0 +1,57 @@
+"""
+Benchmark metrik strategií
+==========================
+Porovnává původní smyčku calc_metrics přes strategie s grouped_metrics.
+
+Spuštění (z kořene repozitáře): python -m benchmarks.bench_metrics [počet obchodů] [počty strategií...]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from trade_analytics import grouped_metrics
+from trade_pipeline import apply_trade_schema
+from trade_views import INITIAL_CAPITAL, calc_metrics
+
+DEFAULT_TRADES = 200_000
+DEFAULT_STRATEGIES = [10, 50, 100, 200]
+
+
+def make_trades(n, n_strategies, seed=0):
+    """Syntetické obchody seřazené podle exitDate"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'strategy': rng.choice([f'Strategie {i}' for i in range(n_strategies)], n),
+        'exitDate': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 5 * 365, n), unit='D'),
+        'netPL': rng.normal(5, 150, n).round(2),
+    })
+    return apply_trade_schema(df.sort_values('exitDate'))
+
+
+def loop_metrics(df):
+    """Původní výpočet ze záložky Strategie - maska a calc_metrics pro každou strategii"""
+    return [calc_metrics(df[df['strategy'] == s]) for s in df['strategy'].unique()]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def run(n_trades, strategy_counts):
+    print(f"{n_trades:,} obchodů")
+    print(f"{'strategií':>10} {'smyčka [s]':>12} {'grouped [s]':>12} {'zrychlení':>10}")
+    for n_strategies in strategy_counts:
+        df = make_trades(n_trades, n_strategies)
+        loop = timed(loop_metrics, df)
+        grouped = timed(grouped_metrics, df, INITIAL_CAPITAL)
+        print(f"{n_strategies:>10} {loop:>12.3f} {grouped:>12.3f} {loop / grouped:>9.1f}x")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    run(args[0] if args else DEFAULT_TRADES, args[1:] or DEFAULT_STRATEGIES)
@@ -0,0 +1,253 @@
+"""
+Benchmark celé pipeline dashboardu
+==================================
+Na syntetickém tradebooku (tabulka diary) a vícelistovém sešitu s českými
+hlavičkami měří načtení zdrojů, normalizaci datumů, časové filtry, metriky,
+všechny grafy a loadery onedrive_integration (přes lokální HTTP server).
+
+Výsledky se ukládají do JSON a porovnávají s baseline: měření pomalejší
+než baseline × (1 + tolerance) a zároveň o víc než min_slack sekund je
+regrese a běh skončí s kódem 1 - vhodné jako kontrola před nasazením.
+Baseline je specifická pro stroj, ukládá se přepínačem --save-baseline.
+
+Spuštění (z kořene repozitáře):
+    python -m benchmarks.bench_suite [počty obchodů...]
+    python -m benchmarks.bench_suite --save-baseline
+"""
+
+import argparse
+import functools
+import http.server
+import json
+import logging
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+import trade_views as views
+from benchmarks.synthetic import ensure_dataset
+from trade_analytics import ROLLING_WINDOWS, TradeCube, grouped_metrics
+from trade_pipeline import DIARY_FILTER
+from trade_remote import DownloadCache
+
+# Import aplikace mimo `streamlit run` jen varuje o chybějícím runtime
+logging.getLogger('streamlit').setLevel(logging.ERROR)
+import onedrive_integration as onedrive  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, '.cache', 'bench')
+RESULTS_DIR = os.path.join(DATA_DIR, 'results')
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+# Opakování měření (bere se minimum), velké datové sady jen jednou
+REPEAT = 3
+REPEAT_LARGE = 1
+LARGE_SIZE = 1_000_000
+
+# Regresní práh - relativní tolerance a absolutní rezerva proti šumu krátkých měření
+TOLERANCE = 0.25
+MIN_SLACK = 0.02  # s
+
+
+def timed(func, repeat):
+    """Nejkratší čas z repeat běhů a výsledek posledního"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+class _DriveHandler(http.server.SimpleHTTPRequestHandler):
+    """Soubory adresáře; /uc?export=download&id=X vrací soubor X jako Google Drive"""
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/uc':
+            self.path = '/' + parse_qs(url.query)['id'][0]
+        super().do_GET()
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def serve(directory):
+    """Lokální HTTP server nad adresářem - vrací base URL"""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(_DriveHandler, directory=directory))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def dashboard_cases(db_path, excel_path, work_dir):
+    """Měřené kroky dashboardu (trade_views) - (název, funkce) v pořadí pipeline"""
+    snapshot_dir = os.path.join(work_dir, 'snapshot')
+
+    def load_cold():
+        # Bez snapshotu - čte oba zdroje a normalizuje vše
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        return views.load_combined_data(db_path, excel_path, snapshot_dir)
+
+    def load_snapshot():
+        return views.load_combined_data(db_path, excel_path, snapshot_dir)
+
+    df = load_cold()
+    conn = sqlite3.connect(db_path)
+    try:
+        raw_dates = pd.read_sql_query(f"SELECT exitDate FROM diary WHERE {DIARY_FILTER}", conn)['exitDate']
+    finally:
+        conn.close()
+    cube = TradeCube.from_trades(df)
+
+    def figure(build):
+        # Graf se i serializuje - stejně jako při odeslání do prohlížeče
+        return lambda: build().to_json()
+
+    return df, [
+        ('load_combined_data (cold)', load_cold),
+        ('load_combined_data (snapshot)', load_snapshot),
+        ('convert_to_date_only', lambda: views.convert_to_date_only(raw_dates)),
+        ('filter_by_time (všechna období)',
+         lambda: [views.filter_by_time(df, preset) for preset in views.TIME_FILTERS]),
+        ('calc_metrics', lambda: views.calc_metrics(df)),
+        ('grouped_metrics', lambda: grouped_metrics(df, views.INITIAL_CAPITAL)),
+        ('TradeCube.from_trades', lambda: TradeCube.from_trades(df)),
+        ('TradeCube.metrics', lambda: cube.metrics(views.INITIAL_CAPITAL)),
+        # slice() dává novou kostku bez memoizace - měří se výpočet, ne cache
+        ('TradeCube.rolling (20/60/250)', lambda: [cube.slice().rolling(w) for w in ROLLING_WINDOWS]),
+        ('create_cumulative_chart (denní)', figure(lambda: views.create_cumulative_chart(cube.daily()))),
+        ('create_cumulative_chart (obchody)', figure(lambda: views.create_cumulative_chart(df))),
+        ('create_individual_chart', figure(lambda: views.create_individual_chart(df))),
+        ('create_strategy_chart', figure(lambda: views.create_strategy_chart(cube.strategy_totals()))),
+        ('create_monthly_heatmap', figure(lambda: views.create_monthly_heatmap(cube))),
+        ('create_strategy_monthly_heatmap', figure(lambda: views.create_strategy_monthly_heatmap(cube))),
+        ('create_rolling_chart', figure(lambda: views.create_rolling_chart(cube.rolling(60)))),
+        ('create_rolling_comparison_chart',
+         figure(lambda: views.create_rolling_comparison_chart(cube.rolling(60), 'sharpe', "Sharpe"))),
+    ]
+
+
+def onedrive_cases(db_path, excel_path, base_url, work_dir):
+    """Loadery onedrive_integration proti lokálnímu serveru - bez cache a s revalidací (304)"""
+    onedrive.GOOGLE_DRIVE_DOWNLOAD_URL = f'{base_url}/uc?export=download'
+    file_id = os.path.basename(db_path)
+    excel_url = f'{base_url}/{os.path.basename(excel_path)}'
+    cache = DownloadCache(os.path.join(work_dir, 'downloads'))
+    onedrive.load_sqlite_data(file_id, cache=cache)
+    excel, _ = onedrive.load_excel_data(excel_url, cache=cache)
+
+    return [
+        ('onedrive.load_sqlite_data', lambda: onedrive.load_sqlite_data(file_id)),
+        ('onedrive.load_sqlite_data (cache)', lambda: onedrive.load_sqlite_data(file_id, cache=cache)),
+        ('onedrive.load_excel_data', lambda: onedrive.load_excel_data(excel_url)),
+        ('onedrive.load_excel_data (cache)', lambda: onedrive.load_excel_data(excel_url, cache=cache)),
+        ('onedrive.calc_metrics', lambda: onedrive.calc_metrics(excel)),
+        ('onedrive.create_simple_chart', lambda: onedrive.create_simple_chart(excel).to_json()),
+    ]
+
+
+def run_size(n, repeat, data_dir):
+    """Změří všechny kroky pro n obchodů - vrací seznam výsledků"""
+    db_path, excel_path = ensure_dataset(n, data_dir)
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        df, cases = dashboard_cases(db_path, excel_path, work_dir)
+        with serve(os.path.dirname(db_path)) as base_url:
+            cases += onedrive_cases(db_path, excel_path, base_url, work_dir)
+            for name, func in cases:
+                seconds, _ = timed(func, repeat)
+                results.append({'name': name, 'size': n, 'rows': len(df), 'seconds': seconds})
+                print(f"{n:>10,} {name:<40} {seconds:>9.3f} s")
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE, min_slack=MIN_SLACK):
+    """Doplní k výsledkům baseline, práh a stav ok / regrese / nové"""
+    reference = {(entry['name'], entry['size']): entry['seconds'] for entry in baseline.get('results', [])}
+    for entry in results:
+        base = reference.get((entry['name'], entry['size']))
+        if base is None:
+            entry.update(baseline=None, threshold=None, status='new')
+            continue
+        threshold = max(base * (1 + tolerance), base + min_slack)
+        entry.update(baseline=base, threshold=threshold,
+                     status='regression' if entry['seconds'] > threshold else 'ok')
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'machine': platform.node(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline dashboardu na syntetických datech")
+    parser.add_argument('sizes', nargs='*', type=int, default=DEFAULT_SIZES, help="počty obchodů")
+    parser.add_argument('--repeat', type=int, help="počet opakování (výchozí 3, pro 1M obchodů 1)")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="povolené zpomalení proti baseline")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="JSON s baseline")
+    parser.add_argument('--save-baseline', action='store_true', help="uložit výsledky jako novou baseline")
+    parser.add_argument('--output', help="cesta výsledného JSON (výchozí .cache/bench/results/)")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="adresář syntetických dat")
+    args = parser.parse_args(argv)
+
+    results = []
+    for n in args.sizes:
+        repeat = args.repeat or (REPEAT_LARGE if n >= LARGE_SIZE else REPEAT)
+        results += run_size(n, repeat, args.data_dir)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    compare(results, baseline, args.tolerance)
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'tolerance': args.tolerance,
+        'min_slack': MIN_SLACK,
+        'baseline_environment': baseline.get('environment'),
+        'results': results,
+    }
+    output = args.baseline if args.save_baseline else (
+        args.output or os.path.join(RESULTS_DIR, f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"Výsledky: {output}")
+
+    regressions = [entry for entry in results if entry['status'] == 'regression']
+    for entry in regressions:
+        print(f"REGRESE {entry['name']} ({entry['size']:,}): {entry['seconds']:.3f} s > práh "
+              f"{entry['threshold']:.3f} s (baseline {entry['baseline']:.3f} s)")
+    if not baseline and not args.save_baseline:
+        print(f"Baseline {args.baseline} neexistuje - uložte ji přepínačem --save-baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
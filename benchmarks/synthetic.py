@@ -0,0 +1,115 @@
+"""
+Syntetická data pro benchmarky
+==============================
+Tradebook s tabulkou diary (stejné schéma jako Autotrader) a vícelistový
+sešit s českými hlavičkami jako portfolio v Excelu. Data jsou
+deterministická podle seed, takže se běhy dají porovnávat.
+"""
+
+import os
+import sqlite3
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+TICKERS = ['ES', 'NQ', 'YM', 'RTY', 'CL', 'GC', 'ZB', '6E']
+DIARY_SCHEMA = """
+CREATE TABLE diary (strategy text, exitDate text, "NetP/L" real, entryDate text, ticker text,
+                    quantity real, entryPrice real, exitPrice real, commission real)
+"""
+# Hlavičky sešitu - druhé Datum / Cena se čtou jako Datum.1 / Cena.1
+EXCEL_HEADER = ['Systém', 'Symbol', 'Typ', 'Datum', 'Datum', 'Počet', 'Cena', 'Cena', '% změna', 'Komise',
+                'Profit/Loss']
+
+# Podíl obchodů, které jdou do sešitu (historie), zbytek je v deníku
+EXCEL_SHARE = 0.2
+
+
+def make_trades(n, n_strategies=20, seed=0, start='2020-01-01', years=5):
+    """Syntetické obchody seřazené podle exitDate"""
+    rng = np.random.default_rng(seed)
+    exit_date = pd.Timestamp(start) + pd.to_timedelta(np.sort(rng.integers(0, years * 365 * 86400, n)), unit='s')
+    entry_price = rng.uniform(50, 5000, n).round(2)
+    chg_percent = rng.normal(0, 1.5, n).round(3)
+    quantity = rng.integers(1, 6, n)
+    return pd.DataFrame({
+        'strategy': rng.choice([f'Strategie {i:02d}' for i in range(n_strategies)], n),
+        'ticker': rng.choice(TICKERS, n),
+        'position': rng.choice(['Long', 'Short'], n),
+        'entryDate': exit_date - pd.to_timedelta(rng.integers(600, 3 * 86400, n), unit='s'),
+        'exitDate': exit_date,
+        'quantity': quantity,
+        'entryPrice': entry_price,
+        'exitPrice': (entry_price * (1 + chg_percent / 100)).round(2),
+        'chg_percent': chg_percent,
+        'commission': quantity * 2.5,
+        'netPL': rng.normal(8, 180, n).round(2),
+    })
+
+
+def diary_dates(dates, rng):
+    """Text datumů jako v tradebooku - část s timezone značkou, výjimečně 1900"""
+    text = pd.Series(dates.dt.strftime('%Y-%m-%d %H:%M:%S'), dtype=object)
+    kind = rng.integers(0, 1000, len(text))
+    text[kind < 100] = text[kind < 100] + '+01:00'
+    text[kind == 999] = '1900-01-01 00:00:00'
+    return text
+
+
+def write_diary(path, trades, seed=0):
+    """Uloží obchody do nové SQLite databáze jako tabulku diary"""
+    if os.path.exists(path):
+        os.unlink(path)
+    rng = np.random.default_rng(seed)
+    diary = pd.DataFrame({
+        'strategy': trades['strategy'],
+        'exitDate': diary_dates(trades['exitDate'], rng),
+        'NetP/L': trades['netPL'],
+        'entryDate': trades['entryDate'].dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'ticker': trades['ticker'],
+        'quantity': trades['quantity'].astype(float),
+        'entryPrice': trades['entryPrice'],
+        'exitPrice': trades['exitPrice'],
+        'commission': trades['commission'],
+    })
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(DIARY_SCHEMA)
+        diary.to_sql('diary', conn, if_exists='append', index=False)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def write_workbook(path, trades, sheets=4):
+    """Uloží obchody do sešitu - souvislé bloky po sheetech a jeden list bez obchodů"""
+    wb = openpyxl.Workbook(write_only=True)
+    columns = ['strategy', 'ticker', 'position', 'entryDate', 'exitDate', 'quantity', 'entryPrice', 'exitPrice',
+               'chg_percent', 'commission', 'netPL']
+    for i, chunk in enumerate(np.array_split(np.arange(len(trades)), sheets)):
+        ws = wb.create_sheet(f'Portfolio {i + 1}')
+        ws.append(EXCEL_HEADER)
+        block = trades.iloc[chunk][columns].astype(object)
+        for row in block.itertuples(index=False, name=None):
+            ws.append(row)
+    # List s poznámkami - čtečka ho podle hlavičky zamítne
+    notes = wb.create_sheet('Poznámky')
+    notes.append(['Poznámka'])
+    notes.append(['Syntetická data pro benchmark'])
+    wb.save(path)
+
+
+def ensure_dataset(n, data_dir, seed=0):
+    """Cesty (tradebook, sešit) pro n obchodů - vygenerují se jen při prvním použití"""
+    os.makedirs(data_dir, exist_ok=True)
+    db_path = os.path.join(data_dir, f'tradebook_{n}_{seed}.db3')
+    excel_path = os.path.join(data_dir, f'portfolio_{n}_{seed}.xlsx')
+    if not (os.path.exists(db_path) and os.path.exists(excel_path)):
+        trades = make_trades(n, seed=seed)
+        n_excel = int(n * EXCEL_SHARE)
+        write_workbook(excel_path, trades.iloc[:n_excel])
+        # Deník se zapisuje jako poslední a přejmenuje až hotový - přerušené generování se zopakuje
+        write_diary(db_path + '.tmp', trades.iloc[n_excel:].reset_index(drop=True), seed)
+        os.replace(db_path + '.tmp', db_path)
+    return db_path, excel_path
@@ -5,16 +5,23 @@ Trading Portfolio Dashboard - Fresh Setup
 """
 
 import streamlit as st
-import sqlite3
 import pandas as pd
 import plotly.graph_objects as go
+import requests
 from datetime import datetime, timedelta
+import itertools
 import os
-import requests
-import tempfile
-import io
 import re
 
+from trade_pipeline import (
+    DIARY_COLUMNS, DIARY_FILTER, EXCEL_COLUMN_MAP, TradeDeduplicator, apply_trade_schema, normalize_trades,
+    overlap_report, read_excel_trades
+)
+from trade_remote import (
+    DOWNLOAD_CHUNK_SIZE, HTTP_POOL, HTTP_TIMEOUT, SQLITE_MAGIC, DownloadCache, content_length, is_html,
+    open_sqlite, run_sources, spool_chunks
+)
+
 # Konfigurace
 st.set_page_config(
     page_title="Trading Portfolio Dashboard",
@@ -23,6 +30,10 @@ st.set_page_config(
 )
 
 INITIAL_CAPITAL = 50000
+DOWNLOAD_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "downloads")
+DOWNLOAD_CACHE_BYTES = 1 << 30
+GOOGLE_DRIVE_DOWNLOAD_URL = "https://drive.google.com/uc?export=download"
+SOURCE_TIMEOUTS = {'SQLite': 300, 'Excel': 300}  # s, stažení + zpracování
 
 # Session state
 if 'sqlite_file_id' not in st.session_state:
@@ -51,9 +62,9 @@ def extract_google_drive_id(url):
 def test_google_drive_access(file_id):
     """Test přístupu k Google Drive souboru"""
     try:
-        download_url = f"https://drive.google.com/uc?export=download&id={file_id}"
+        download_url = f"{GOOGLE_DRIVE_DOWNLOAD_URL}&id={file_id}"
         
-        response = requests.head(download_url, timeout=10)  # Jen hlavičky
+        response = HTTP_POOL.session().head(download_url, timeout=HTTP_TIMEOUT)  # Jen hlavičky
         
         if response.status_code == 200:
             return True, "OK"
@@ -66,7 +77,7 @@ def test_google_drive_access(file_id):
 def test_onedrive_access(url):
     """Test přístupu k OneDrive souboru"""
     try:
-        response = requests.head(url, timeout=10)  # Jen hlavičky
+        response = HTTP_POOL.session().head(url, timeout=HTTP_TIMEOUT)  # Jen hlavičky
         
         if response.status_code == 200:
             return True, "OK"
@@ -76,17 +87,31 @@ def test_onedrive_access(url):
     except Exception as e:
         return False, str(e)
 
-def download_from_google_drive(file_id):
-    """Stáhne soubor z Google Drive"""
+@st.cache_resource
+def get_download_cache():
+    """Sdílená cache stažených souborů pro všechny session"""
+    return DownloadCache(DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_BYTES)
+
+def download_from_google_drive(file_id, progress=None, cache=None):
+    """Stáhne soubor z Google Drive po blocích do spool souboru (vrací Download)
+
+    S cache se posílá podmíněný GET - nezměněný soubor se vrátí z cache bez přenosu těla,
+    při chybě serveru se vrátí poslední stažená kopie.
+    """
     try:
-        download_url = f"https://drive.google.com/uc?export=download&id={file_id}"
-        
-        session = requests.Session()
-        response = session.get(download_url, stream=True)
-        
-        # Pro větší soubory může Google vyžadovat confirmation
-        if "virus scan warning" in response.text.lower() or len(response.content) < 1000:
-            for line in response.text.split('\n'):
+        download_url = f"{GOOGLE_DRIVE_DOWNLOAD_URL}&id={file_id}"
+        headers = cache.validators(file_id) if cache is not None else {}
+        
+        # Potvrzovací požadavek jde přes stejnou session (cookies) i spojení z poolu
+        session = HTTP_POOL.session()
+        response = session.get(download_url, stream=True, timeout=HTTP_TIMEOUT, headers=headers)
+        chunks = response.iter_content(DOWNLOAD_CHUNK_SIZE)
+        head = next(chunks, b'')
+        
+        # Pro větší soubory může Google vyžadovat confirmation - varovná stránka
+        # je malé HTML, které se celé vejde do prvního bloku
+        if is_html(head) or len(head) < 1000:
+            for line in head.decode('utf-8', errors='replace').split('\n'):
                 if 'confirm=' in line and 'download' in line:
                     start = line.find('confirm=') + 8
                     end = line.find('&', start)
@@ -94,108 +119,143 @@ def download_from_google_drive(file_id):
                         end = line.find('"', start)
                     if end != -1:
                         confirm_token = line[start:end]
-                        download_url = f"https://drive.google.com/uc?export=download&confirm={confirm_token}&id={file_id}"
-                        response = session.get(download_url, stream=True)
+                        download_url = f"{GOOGLE_DRIVE_DOWNLOAD_URL}&confirm={confirm_token}&id={file_id}"
+                        response.close()
+                        response = session.get(download_url, stream=True, timeout=HTTP_TIMEOUT, headers=headers)
+                        chunks = response.iter_content(DOWNLOAD_CHUNK_SIZE)
+                        head = next(chunks, b'')
                         break
         
-        response.raise_for_status()
-        return response.content
-        
+        with response:
+            if response.status_code == 304:
+                return cache.hit(file_id)
+            response.raise_for_status()
+            # Obsah se ověří před uložením do cache - chybná odpověď nesmí nahradit platnou kopii
+            if not head.startswith(SQLITE_MAGIC):
+                raise Exception("Downloaded file is not SQLite database")
+            download = spool_chunks(
+                itertools.chain([head], chunks), content_length(response), progress, '.db3',
+                cache.spool_dir if cache is not None else None
+            )
+        
+        return cache.store(file_id, download, response.headers) if cache is not None else download
+        
+    except requests.RequestException as e:
+        # Server nedostupný nebo vrátil chybu - použije se poslední stažená kopie
+        download = cache.fallback(file_id) if cache is not None else None
+        if download is None:
+            raise Exception(f"Google Drive download failed: {e}")
+        return download
     except Exception as e:
         raise Exception(f"Google Drive download failed: {e}")
 
-def download_from_onedrive(url):
-    """Stáhne soubor z OneDrive"""
+def download_from_onedrive(url, progress=None, cache=None):
+    """Stáhne soubor z OneDrive po blocích do spool souboru (vrací Download)
+
+    S cache se posílá podmíněný GET - nezměněný soubor se vrátí z cache bez přenosu těla,
+    při chybě serveru se vrátí poslední stažená kopie.
+    """
     try:
-        response = requests.get(url, stream=True, timeout=30)
-        response.raise_for_status()
-        
-        if response.content.startswith(b'<!DOCTYPE') or b'<html' in response.content[:500]:
-            raise Exception("OneDrive returned HTML instead of file")
-        
-        return response.content
-        
+        headers = cache.validators(url) if cache is not None else {}
+        session = HTTP_POOL.session()
+        with session.get(url, stream=True, timeout=HTTP_TIMEOUT, headers=headers) as response:
+            if response.status_code == 304:
+                return cache.hit(url)
+            response.raise_for_status()
+            
+            chunks = response.iter_content(DOWNLOAD_CHUNK_SIZE)
+            head = next(chunks, b'')
+            if is_html(head):
+                raise Exception("OneDrive returned HTML instead of file")
+            
+            download = spool_chunks(
+                itertools.chain([head], chunks), content_length(response), progress, '.xlsx',
+                cache.spool_dir if cache is not None else None
+            )
+        
+        return cache.store(url, download, response.headers) if cache is not None else download
+        
+    except requests.RequestException as e:
+        # Server nedostupný nebo vrátil chybu - použije se poslední stažená kopie
+        download = cache.fallback(url) if cache is not None else None
+        if download is None:
+            raise Exception(f"OneDrive download failed: {e}")
+        return download
     except Exception as e:
         raise Exception(f"OneDrive download failed: {e}")
 
-def load_sqlite_data(file_id):
-    """Načte SQLite data"""
+def fetch_info(download):
+    """Odkud a kdy byl soubor stažen - pro zobrazení u zdroje"""
+    return {'from_cache': download.from_cache, 'stale': download.stale, 'fetched_at': download.fetched_at,
+            'size': download.size}
+
+def format_fetch_info(fetch):
+    """Indikátor "naposledy staženo / z cache" vedle hlášky zdroje"""
+    fetched = datetime.fromtimestamp(fetch['fetched_at']).strftime('%d.%m.%Y %H:%M:%S')
+    if fetch['stale']:
+        return f"⚠️ z cache, server nedostupný (staženo {fetched})"
+    if fetch['from_cache']:
+        return f"📦 z cache, beze změny (staženo {fetched})"
+    return f"⬇️ staženo {fetched} ({fetch['size'] / 1e6:.1f} MB)"
+
+def load_sqlite_data(file_id, progress=None, cache=None):
+    """Načte SQLite data - vrací (data, fetch_info)"""
     try:
-        sqlite_content = download_from_google_drive(file_id)
-        
-        if not sqlite_content.startswith(b'SQLite format 3'):
-            raise Exception("Downloaded file is not SQLite database")
-        
-        # Uložit do dočasného souboru
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".db3")
-        temp_file.write(sqlite_content)
-        temp_file.close()
-        
-        # Načíst data
-        conn = sqlite3.connect(temp_file.name)
-        query = """
-        SELECT strategy, exitDate, "NetP/L" as netPL, entryDate, ticker, 
-               quantity, entryPrice, exitPrice, commission
-        FROM diary 
-        WHERE exitDate IS NOT NULL AND "NetP/L" IS NOT NULL AND strategy IS NOT NULL
-        ORDER BY exitDate
-        """
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        os.unlink(temp_file.name)
+        # Stažený soubor (nebo soubor z cache) se otevře v paměti / přes mmap, bez další kopie na disk
+        with download_from_google_drive(file_id, progress, cache) as download:
+            if not download.head.startswith(SQLITE_MAGIC):
+                raise Exception("Downloaded file is not SQLite database")
+            
+            conn = open_sqlite(download)
+            query = f"SELECT {DIARY_COLUMNS} FROM diary WHERE {DIARY_FILTER} ORDER BY exitDate"
+            try:
+                df = pd.read_sql_query(query, conn)
+            finally:
+                conn.close()
         
         df['source'] = 'SQLite-GoogleDrive'
-        return df
+        return df, fetch_info(download)
         
     except Exception as e:
         raise Exception(f"SQLite processing failed: {e}")
 
-def load_excel_data(url):
-    """Načte Excel data"""
+def load_excel_data(url, progress=None, cache=None):
+    """Načte Excel data - vrací (data, fetch_info)"""
     try:
-        excel_content = download_from_onedrive(url)
+        # Všechny sheets v jednom průchodu sešitem, čteno přímo ze staženého souboru
+        with download_from_onedrive(url, progress, cache) as download:
+            combined_data, _ = read_excel_trades(
+                download.path,
+                column_map={**EXCEL_COLUMN_MAP, 'Typ': 'position'},
+                source_prefix='Excel-OneDrive-'
+            )
         
-        # Načíst Excel z bytes
-        excel_file = io.BytesIO(excel_content)
-        excel_data = pd.read_excel(excel_file, sheet_name=None)
-        
-        combined_data = pd.DataFrame()
-        
-        for sheet_name, df_sheet in excel_data.items():
-            if len(df_sheet) == 0:
-                continue
-            
-            # Mapování sloupců
-            col_map = {
-                'Systém': 'strategy',
-                'Symbol': 'ticker',
-                'Typ': 'position',
-                'Datum': 'entryDate',
-                'Datum.1': 'exitDate',
-                'Počet': 'quantity',
-                'Cena': 'entryPrice',
-                'Cena.1': 'exitPrice',
-                '% změna': 'chg_percent',
-                'Komise': 'commission',
-                'Profit/Loss': 'netPL'
-            }
-            
-            df_sheet = df_sheet.rename(columns=col_map)
-            
-            # Kontrola povinných sloupců
-            required_cols = ['strategy', 'exitDate', 'netPL']
-            missing_cols = [col for col in required_cols if col not in df_sheet.columns]
-            
-            if len(missing_cols) == 0:
-                df_sheet['source'] = f'Excel-OneDrive-{sheet_name}'
-                df_sheet['sheet_name'] = sheet_name
-                combined_data = pd.concat([combined_data, df_sheet], ignore_index=True)
-        
-        return combined_data
+        return combined_data, fetch_info(download)
         
     except Exception as e:
         raise Exception(f"Excel processing failed: {e}")
 
+def combine_sources(all_data):
+    """Normalizace a deduplikace spojených zdrojů - vrací (data, TradeDeduplicator)
+
+    Datumy se normalizují stejně jako v dashboardu (bez času), takže stejný
+    obchod ze SQLite i z Excelu dá stejný otisk.
+    """
+    all_data, _ = normalize_trades(all_data)
+    # Obchody obsažené ve více zdrojích se počítají jen jednou (priorita podle pořadí načtení)
+    dedup = TradeDeduplicator()
+    all_data = dedup.filter(all_data)
+    return apply_trade_schema(all_data.sort_values('exitDate')), dedup
+
+def download_progress(placeholder, label):
+    """Callback průběhu stahování, vypisuje staženou velikost do placeholderu"""
+    def update(done, total):
+        if total:
+            placeholder.progress(min(done / total, 1.0), text=f"{label}: {done / 1e6:.1f} / {total / 1e6:.1f} MB")
+        else:
+            placeholder.caption(f"{label}: {done / 1e6:.1f} MB")
+    return update
+
 def calc_metrics(df):
     """Výpočet základních metrik"""
     if df.empty:
@@ -342,39 +402,47 @@ def main():
     
     if st.button("📊 Načíst data z obou zdrojů", type="primary"):
         all_data = pd.DataFrame()
-        
-        # SQLite
-        try:
-            with st.spinner("Načítám SQLite z Google Drive..."):
-                sqlite_df = load_sqlite_data(st.session_state.sqlite_file_id)
-                if not sqlite_df.empty:
-                    all_data = pd.concat([all_data, sqlite_df], ignore_index=True)
-                    st.success(f"✅ SQLite: {len(sqlite_df)} záznamů")
-        except Exception as e:
-            st.error(f"❌ SQLite chyba: {e}")
-        
-        # Excel
-        try:
-            with st.spinner("Načítám Excel z OneDrive..."):
-                excel_df = load_excel_data(st.session_state.onedrive_url)
-                if not excel_df.empty:
-                    all_data = pd.concat([all_data, excel_df], ignore_index=True)
-                    st.success(f"✅ Excel: {len(excel_df)} záznamů")
-        except Exception as e:
-            st.error(f"❌ Excel chyba: {e}")
+        cache = get_download_cache()
+        
+        # Oba zdroje se stahují a zpracovávají souběžně, každý s vlastním limitem
+        sqlite_file_id = st.session_state.sqlite_file_id
+        onedrive_url = st.session_state.onedrive_url
+        jobs = {
+            'SQLite': lambda progress: load_sqlite_data(sqlite_file_id, progress, cache),
+            'Excel': lambda progress: load_excel_data(onedrive_url, progress, cache),
+        }
+        placeholders = {name: st.empty() for name in jobs}
+        renderers = {name: download_progress(placeholders[name], name) for name in jobs}
+        
+        def show_progress(state):
+            for name, (done, total) in state.items():
+                if done:
+                    renderers[name](done, total)
+        
+        with st.spinner("Načítám SQLite z Google Drive a Excel z OneDrive..."):
+            results = run_sources(jobs, SOURCE_TIMEOUTS, show_progress)
+        for placeholder in placeholders.values():
+            placeholder.empty()
+        
+        # Každý zdroj hlásí úspěch / chybu samostatně
+        for name, (result, error) in results.items():
+            if isinstance(error, TimeoutError):
+                st.error(f"⏱️ {name}: {error}")
+                continue
+            if error is not None:
+                st.error(f"❌ {name} chyba: {error}")
+                continue
+            source_df, fetch = result
+            if not source_df.empty:
+                all_data = pd.concat([all_data, source_df], ignore_index=True)
+                st.success(f"✅ {name}: {len(source_df)} záznamů | {format_fetch_info(fetch)}")
         
         if all_data.empty:
             st.error("❌ Nepodařilo se načíst žádná data")
             return
         
         # Zpracování dat
-        all_data['exitDate'] = pd.to_datetime(all_data['exitDate'], errors='coerce')
-        all_data['netPL'] = pd.to_numeric(all_data['netPL'], errors='coerce')
-        all_data = all_data.dropna(subset=['exitDate', 'netPL', 'strategy'])
-        all_data = all_data.sort_values('exitDate')
-        
-        # Odstranit duplikáty
-        all_data = all_data.drop_duplicates(subset=['strategy', 'exitDate', 'netPL'], keep='first')
+        all_data, dedup = combine_sources(all_data)
         
         st.session_state.data_loaded = True
         
@@ -384,6 +452,8 @@ def main():
             counts = all_data['source'].value_counts()
             info = " | ".join([f"{k}: {v}" for k, v in counts.items()])
             msg += f" | {info}"
+        if dedup.dropped:
+            msg += f" | duplicity mezi zdroji: {dedup.dropped}"
         st.success(msg)
         
         # Základní metriky
@@ -410,6 +480,14 @@ def main():
                 for source, count in all_data['source'].value_counts().items():
                     st.write(f"- {source}: {count}")
             
+            if dedup.overlap:
+                st.write("**Překryvy zdrojů (započteno jednou):**")
+                st.dataframe(overlap_report(dedup.overlap), hide_index=True)
+            
+            cache_stats = cache.stats()
+            st.write(f"**Cache stažených souborů:** {cache_stats['entries']} zdrojů, "
+                     f"{cache_stats['files']} souborů, {cache_stats['MB']:.1f} MB")
+            
             st.dataframe(all_data[['strategy', 'exitDate', 'netPL', 'source']].head(10))
 
 if __name__ == "__main__":
@@ -0,0 +1,60 @@
+import http.server
+import threading
+import time
+from urllib.parse import urlsplit
+
+import pytest
+
+
+def reply(body=b'', status=200, headers=None, chunked=False, delay=0.0):
+    """Odpověď zástupného serveru - chunked posílá tělo po blocích bez Content-Length"""
+    return {'body': body, 'status': status, 'headers': headers or {}, 'chunked': chunked, 'delay': delay}
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """Odpovídá podle server.routes - cesta -> seznam odpovědí, poslední se opakuje"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        self.server.requests.append((path, dict(self.headers)))
+        replies = self.server.routes.get(path) or [reply(status=404)]
+        spec = replies.pop(0) if len(replies) > 1 else replies[0]
+        time.sleep(spec['delay'])
+
+        body = spec['body']
+        self.send_response(spec['status'])
+        for name, value in spec['headers'].items():
+            self.send_header(name, value)
+        if spec['chunked']:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        if not spec['chunked']:
+            self.wfile.write(body)
+            return
+        for start in range(0, len(body), 64 << 10):
+            piece = body[start:start + (64 << 10)]
+            self.wfile.write(f'{len(piece):x}\r\n'.encode() + piece + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """Lokální HTTP server v threadu - server.url, server.routes, server.requests"""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.routes, server.requests = {}, []
+    # Klient smí spojení zavřít předčasně (odmítnutí HTML, timeout) - bez výpisu chyby
+    server.handle_error = lambda request, client_address: None
+    server.url = f'http://127.0.0.1:{server.server_port}'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from trade_analytics import FigureCache, TradeCube, figure_bytes
+
+
+def _daily(rows):
+    return pd.DataFrame(rows, columns=['strategy', 'day', *TradeCube.FIELDS])
+
+
+def test_from_daily_drops_strategies_outside_selection():
+    daily = _daily([
+        ('A', 19000, 10.0, 1, 1, 0, 10.0, 0.0),
+        ('B', 19001, -5.0, 1, 0, 1, 0.0, -5.0),
+        ('C', 19002, 99.0, 2, 2, 0, 99.0, 0.0),
+    ])
+
+    cube = TradeCube.from_daily(daily, ['A', 'B'])
+
+    assert cube.strategies == ['A', 'B']
+    # C se nesmí přičíst k poslední strategii (B)
+    np.testing.assert_allclose(cube.arrays['pl'].sum(axis=1), [10.0, -5.0])
+    assert cube.arrays['trades'].sum() == 2
+
+
+def test_from_daily_without_selected_rows_is_empty():
+    daily = _daily([('C', 19002, 99.0, 2, 2, 0, 99.0, 0.0)])
+
+    cube = TradeCube.from_daily(daily, ['A'])
+
+    assert cube.strategies == []
+    assert cube.metrics(50000) == {}
+
+
+def test_strategy_metrics_of_empty_cube():
+    cube = TradeCube.from_daily(_daily([]), [])
+
+    table = cube.strategy_metrics(50000)
+
+    assert table.empty
+    assert 'max_drawdown' in table.columns
+
+
+def test_figure_cache_sizes_figures_without_json():
+    fig = go.Figure(go.Scatter(x=np.arange(1000), y=np.zeros(1000)))
+    assert figure_bytes(fig) >= 16000
+
+    cache = FigureCache(max_bytes=20000)
+    cache.get(('a',), lambda: fig)
+    cache.get(('b',), lambda: go.Figure(go.Scatter(x=np.arange(1000), y=np.ones(1000))))
+
+    assert cache.stats()['entries'] == 1
+    assert cache.evictions == 1
@@ -0,0 +1,131 @@
+import logging
+import os
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from conftest import reply
+from trade_remote import SQLITE_MAGIC, DownloadCache, HttpPool
+
+# Import aplikace mimo `streamlit run` jen varuje o chybějícím runtime
+logging.getLogger('streamlit').setLevel(logging.ERROR)
+import onedrive_integration as onedrive  # noqa: E402
+
+
+@pytest.fixture
+def drive(http_server, monkeypatch):
+    monkeypatch.setattr(onedrive, 'GOOGLE_DRIVE_DOWNLOAD_URL', f'{http_server.url}/uc?export=download')
+    # Opakování bez čekání - testy nemají čekat na backoff
+    monkeypatch.setattr(onedrive, 'HTTP_POOL', HttpPool(retries=1, backoff=0))
+    return http_server
+
+
+def diary_bytes(path):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("CREATE TABLE diary (strategy text, exitDate text, 'NetP/L' real, entryDate text, ticker text,"
+                     " quantity real, entryPrice real, exitPrice real, commission real)")
+        conn.execute("INSERT INTO diary VALUES ('A', '2024-01-02 15:30:00', 12.5, '2024-01-02 10:00:00', 'ES',"
+                     " 1, 4700, 4702.5, 4.5)")
+        conn.commit()
+    finally:
+        conn.close()
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_google_drive_download_streams_chunks_into_spool(drive):
+    body = SQLITE_MAGIC + os.urandom(3 << 20)
+    drive.routes['/uc'] = [reply(body, chunked=True)]
+    progress = []
+
+    download = onedrive.download_from_google_drive('file-id', progress=lambda done, total: progress.append(total))
+    with download:
+        assert download.size == len(body)
+        assert download.head == body[:len(download.head)]
+        assert download.read_bytes() == body
+
+    # Bez Content-Length je celková velikost neznámá, průběh se hlásí po blocích
+    assert len(progress) >= 3 and set(progress) == {None}
+    assert not os.path.exists(download.path)
+
+
+def test_onedrive_rejects_html_before_spooling(http_server, tmp_path):
+    page = b'<!DOCTYPE html><html><body>Sign in</body></html>' + b' ' * (2 << 20)
+    http_server.routes['/portfolio.xlsx'] = [reply(page)]
+    cache = DownloadCache(str(tmp_path / 'downloads'))
+    progress = []
+
+    with pytest.raises(Exception, match='HTML'):
+        onedrive.download_from_onedrive(f'{http_server.url}/portfolio.xlsx', lambda *args: progress.append(args), cache)
+
+    assert progress == []
+    assert os.listdir(cache.spool_dir) == [] and cache.stats()['entries'] == 0
+
+
+def test_load_sqlite_data_checks_magic_bytes(drive, tmp_path):
+    drive.routes['/uc'] = [reply(b'PK\x03\x04' + bytes(4096))]
+    with pytest.raises(Exception, match='not SQLite'):
+        onedrive.load_sqlite_data('file-id')
+
+    drive.routes['/uc'] = [reply(diary_bytes(tmp_path / 'tradebook.db3'))]
+    df, fetch = onedrive.load_sqlite_data('file-id')
+
+    assert df['netPL'].tolist() == [12.5]
+    assert fetch['from_cache'] is False
+
+
+def test_google_drive_revalidates_cached_file(drive, tmp_path):
+    body = diary_bytes(tmp_path / 'tradebook.db3')
+    drive.routes['/uc'] = [reply(body, headers={'ETag': '"v1"'}), reply(status=304)]
+    cache = DownloadCache(str(tmp_path / 'downloads'))
+
+    first = onedrive.download_from_google_drive('file-id', cache=cache)
+    second = onedrive.download_from_google_drive('file-id', cache=cache)
+
+    assert drive.requests[1][1]['If-None-Match'] == '"v1"'
+    assert not first.from_cache and second.from_cache and not second.stale
+    assert second.read_bytes() == body
+
+
+def test_google_drive_does_not_cache_invalid_body(drive, tmp_path):
+    body = diary_bytes(tmp_path / 'tradebook.db3')
+    drive.routes['/uc'] = [reply(body, headers={'ETag': '"v1"'}), reply(b'\x00' * 4096, headers={'ETag': '"v2"'})]
+    cache = DownloadCache(str(tmp_path / 'downloads'))
+    onedrive.download_from_google_drive('file-id', cache=cache)
+
+    with pytest.raises(Exception, match='not SQLite'):
+        onedrive.download_from_google_drive('file-id', cache=cache)
+
+    assert cache.validators('file-id') == {'If-None-Match': '"v1"'}
+    assert cache.stats()['files'] == 1
+
+
+def test_download_falls_back_to_cache_on_server_error(drive, tmp_path):
+    body = diary_bytes(tmp_path / 'tradebook.db3')
+    drive.routes['/uc'] = [reply(body), reply(status=503)]
+    cache = DownloadCache(str(tmp_path / 'downloads'))
+    onedrive.download_from_google_drive('file-id', cache=cache)
+
+    df, fetch = onedrive.load_sqlite_data('file-id', cache=cache)
+
+    # 503 se jednou zopakuje, pak se použije poslední stažená kopie
+    assert len(drive.requests) == 3
+    assert fetch['stale'] and df['netPL'].tolist() == [12.5]
+    assert 'server nedostupný' in onedrive.format_fetch_info(fetch)
+    with pytest.raises(Exception, match='503'):
+        onedrive.download_from_google_drive('file-id')
+
+
+def test_combine_sources_matches_trades_with_time_of_day():
+    trade = {'strategy': 'A', 'ticker': 'ES', 'quantity': 1.0, 'entryPrice': 4700.0, 'exitPrice': 4702.5, 'netPL': 12.5}
+    sqlite = pd.DataFrame([{**trade, 'entryDate': '2024-01-02 10:00:00', 'exitDate': '2024-01-02 15:30:00',
+                            'source': 'SQLite-GoogleDrive'}])
+    excel = pd.DataFrame([{**trade, 'entryDate': pd.Timestamp('2024-01-02'), 'exitDate': pd.Timestamp('2024-01-02'),
+                           'source': 'Excel-OneDrive-Portfolio 1'}])
+
+    combined, dedup = onedrive.combine_sources(pd.concat([sqlite, excel], ignore_index=True))
+
+    assert combined['source'].astype(str).tolist() == ['SQLite-GoogleDrive']
+    assert dedup.dropped == 1
@@ -0,0 +1,79 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_trades, write_diary
+from trade_pipeline import SPOOL_COLUMNS, DiaryLoader, TradeSpool
+
+
+def _trades():
+    return pd.DataFrame({
+        'strategy': ['A', 'B', 'A'],
+        'exitDate': pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-05']),
+        'netPL': [10.0, -5.0, 7.5],
+        'source': ['SQLite', 'SQLite', 'Excel-Portfolio 1'],
+    })
+
+
+def test_spool_select_filters_slice(tmp_path):
+    spool = TradeSpool(str(tmp_path / 'spool.parquet'))
+    assert spool.rebuild([_trades()]) == 3
+
+    selected = spool.select(pd.Timestamp('2024-01-03'), None, ['A'])
+
+    assert selected['netPL'].tolist() == [7.5]
+
+
+def test_spool_select_empty_strategies(tmp_path):
+    spool = TradeSpool(str(tmp_path / 'spool.parquet'))
+    spool.rebuild([_trades()])
+
+    selected = spool.select(strategies=[])
+
+    assert selected.empty
+    assert list(selected.columns) == SPOOL_COLUMNS
+    assert pd.api.types.is_datetime64_any_dtype(selected['exitDate'])
+
+
+@pytest.mark.parametrize('statement', [
+    "UPDATE diary SET ticker = 'XX' WHERE rowid = 2",
+    'UPDATE diary SET commission = commission + 1 WHERE rowid = 3',
+    # Prohození P&L mezi dvěma řádky - součet se nezmění
+    'UPDATE diary SET "NetP/L" = CASE rowid WHEN 2 THEN (SELECT "NetP/L" FROM diary WHERE rowid = 5)'
+    ' ELSE (SELECT "NetP/L" FROM diary WHERE rowid = 2) END WHERE rowid IN (2, 5)',
+    # Přejmenování strategie na stejně dlouhý název
+    "UPDATE diary SET strategy = substr(strategy, 1, length(strategy) - 1) || '#' WHERE rowid = 1",
+    'DELETE FROM diary WHERE rowid = 4',
+], ids=['ticker', 'commission', 'swap', 'rename', 'delete'])
+def test_diary_loader_reloads_on_historical_change(tmp_path, statement):
+    db_path = str(tmp_path / 'tradebook.db3')
+    write_diary(db_path, make_trades(50, seed=3), seed=3)
+    loader = DiaryLoader(db_path)
+    loader.load()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute(statement)
+    conn.commit()
+    conn.close()
+    reloaded = loader.load()
+
+    assert loader.last_mode == 'full'
+    pd.testing.assert_frame_equal(reloaded.reset_index(drop=True), DiaryLoader(db_path).load().reset_index(drop=True))
+
+
+def test_diary_loader_appends_new_rows(tmp_path):
+    db_path = str(tmp_path / 'tradebook.db3')
+    write_diary(db_path, make_trades(50, seed=3), seed=3)
+    loader = DiaryLoader(db_path)
+    first = loader.load()
+
+    conn = sqlite3.connect(db_path)
+    conn.execute('INSERT INTO diary SELECT * FROM diary WHERE rowid = 1')
+    conn.commit()
+    conn.close()
+    appended = loader.load()
+
+    assert loader.last_mode == 'incremental' and loader.last_new_rows == 1
+    assert len(appended) == len(first) + 1
+    assert appended.dtypes.equals(first.dtypes)
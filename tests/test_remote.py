@@ -0,0 +1,101 @@
+import itertools
+import sqlite3
+import time
+import types
+
+import pytest
+
+import trade_remote
+from conftest import reply
+from trade_remote import Download, DownloadCache, HttpPool, open_sqlite, run_sources, spool_chunks
+
+
+def make_diary(path, journal_mode):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        conn.execute("CREATE TABLE diary (strategy text, netPL real)")
+        conn.executemany("INSERT INTO diary VALUES (?, ?)", [('A', 1.5), ('B', -2.0)])
+        conn.commit()
+    finally:
+        conn.close()
+    with open(path, 'rb') as f:
+        data = f.read()
+    return Download(str(path), data[:512], len(data), temporary=False)
+
+
+@pytest.mark.parametrize('in_memory_max', [1 << 30, 0], ids=['deserialize', 'immutable'])
+@pytest.mark.parametrize('journal_mode', ['WAL', 'DELETE'])
+def test_open_sqlite_reads_database(tmp_path, journal_mode, in_memory_max):
+    download = make_diary(tmp_path / 'tradebook.db3', journal_mode)
+    if journal_mode == 'WAL':
+        assert download.head[18:20] == b'\x02\x02'
+
+    conn = open_sqlite(download, in_memory_max=in_memory_max)
+    try:
+        rows = conn.execute("SELECT strategy, netPL FROM diary ORDER BY strategy").fetchall()
+    finally:
+        conn.close()
+
+    assert rows == [('A', 1.5), ('B', -2.0)]
+
+
+def test_download_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    # Deterministické hodiny - pořadí použití nezávisí na rozlišení time.time
+    monkeypatch.setattr(trade_remote, 'time', types.SimpleNamespace(time=itertools.count(1).__next__))
+    cache = DownloadCache(str(tmp_path), max_bytes=2500)
+
+    def store(key, fill):
+        download = spool_chunks([fill * 1000], suffix='.db3', spool_dir=cache.spool_dir)
+        return cache.store(key, download, {'ETag': f'"{key}"'})
+
+    store('a', b'a')
+    store('b', b'b')
+    cache.hit('a')
+    store('c', b'c')
+
+    assert cache.validators('b') == {}
+    assert cache.fallback('b') is None
+    assert cache.fallback('a').read_bytes() == b'a' * 1000
+    assert cache.stats() == {'entries': 2, 'files': 2, 'MB': 0.002}
+
+
+def test_http_pool_retries_transient_errors(http_server):
+    http_server.routes['/file'] = [reply(status=503), reply(status=502), reply(b'data')]
+    session = HttpPool(retries=2, backoff=0).session()
+
+    response = session.get(f'{http_server.url}/file', timeout=5)
+
+    assert response.status_code == 200 and response.content == b'data'
+    assert len(http_server.requests) == 3
+
+
+def test_run_sources_reports_timeout_and_failure_per_source(http_server):
+    http_server.routes['/fast'] = [reply(b'x' * 100_000)]
+    http_server.routes['/missing'] = [reply(status=404)]
+    # Server neodpoví ani hlavičkou - limit musí platit i mimo smyčku bloků
+    http_server.routes['/slow'] = [reply(b'x', delay=3)]
+    pool = HttpPool(retries=0)
+
+    def fetch(path):
+        def job(progress):
+            response = pool.session().get(f'{http_server.url}{path}', stream=True, timeout=10)
+            with response:
+                response.raise_for_status()
+                with spool_chunks(response.iter_content(1 << 14), progress=progress) as download:
+                    return download.size
+        return job
+
+    ticks = []
+    started = time.monotonic()
+    results = run_sources(
+        {name: fetch(f'/{name}') for name in ('fast', 'missing', 'slow')},
+        {'fast': 5, 'missing': 5, 'slow': 0.5},
+        on_tick=ticks.append, poll_interval=0.05,
+    )
+
+    assert time.monotonic() - started < 2
+    assert results['fast'] == (100_000, None)
+    assert results['missing'][0] is None and '404' in str(results['missing'][1])
+    assert results['slow'][0] is None and isinstance(results['slow'][1], TimeoutError)
+    assert ticks[-1]['fast'] == (100_000, None)
@@ -0,0 +1,32 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.synthetic import make_trades, write_diary, write_workbook
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Streamlit se nesmí ani importovat - report běží bez něj
+HEADLESS = "import sys; sys.modules['streamlit'] = None; import trade_report; sys.exit(trade_report.main(sys.argv[1:]))"
+
+
+def test_report_runs_without_streamlit(tmp_path):
+    trades = make_trades(300, seed=7)
+    db_path, excel_path = tmp_path / 'tradebook.db3', tmp_path / 'portfolio.xlsx'
+    write_workbook(excel_path, trades.iloc[:100])
+    write_diary(db_path, trades.iloc[100:].reset_index(drop=True), seed=7)
+    output = tmp_path / 'report'
+
+    result = subprocess.run(
+        [sys.executable, '-c', HEADLESS, '--db', str(db_path), '--excel', str(excel_path),
+         '--cache-dir', str(tmp_path / 'cache'), '--output', str(output), '--workers', '1'],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+
+    assert result.returncode == 0, result.stderr
+    with open(output / 'report.json', encoding='utf-8') as f:
+        summary = json.load(f)
+    assert summary['rows'] > 0 and summary['metrics']['total_trades'] == summary['rows']
+    assert (output / 'index.html').exists()
+    assert os.listdir(tmp_path / 'cache')
@@ -0,0 +1,131 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_trades, write_diary, write_workbook
+from trade_analytics import TradeAggregator, TradeCube
+from trade_pipeline import DiaryLoader, TradeMirror, TradeSpool, index_by_exit_date, normalize_trades
+from trade_views import INITIAL_CAPITAL, filter_by_time, load_combined_data, time_filter_bounds
+
+
+@pytest.fixture
+def sources(tmp_path):
+    trades = make_trades(300, seed=5)
+    db_path, excel_path = tmp_path / 'tradebook.db3', tmp_path / 'portfolio.xlsx'
+    write_workbook(excel_path, trades.iloc[:100])
+    write_diary(db_path, trades.iloc[100:].reset_index(drop=True), seed=5)
+    return trades, str(db_path), tmp_path
+
+
+def append_diary(db_path, trades):
+    rows = pd.DataFrame({
+        'strategy': trades['strategy'],
+        'exitDate': trades['exitDate'].dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'NetP/L': trades['netPL'],
+        'entryDate': trades['entryDate'].dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'ticker': trades['ticker'],
+        'quantity': trades['quantity'].astype(float),
+        'entryPrice': trades['entryPrice'],
+        'exitPrice': trades['exitPrice'],
+        'commission': trades['commission'],
+    })
+    conn = sqlite3.connect(db_path)
+    try:
+        rows.to_sql('diary', conn, if_exists='append', index=False)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load(tmp_path, cache_name, loader):
+    return load_combined_data(str(tmp_path / 'tradebook.db3'), str(tmp_path / 'portfolio.xlsx'),
+                              str(tmp_path / cache_name), loader)
+
+
+def trade_sources(df):
+    return sorted(zip(df['fingerprint'].tolist(), df['source'].astype(str).tolist()))
+
+
+def test_incremental_load_matches_fresh_load_on_overlap(sources):
+    trades, db_path, tmp_path = sources
+    loader = DiaryLoader(db_path)
+    first = load(tmp_path, 'cache', loader)
+    assert first.attrs['overlap'] == {}
+
+    # Nový obchod deníku, který už je v Excelu - deník má přednost
+    append_diary(db_path, trades.iloc[[10]])
+    incremental = load(tmp_path, 'cache', loader)
+    fresh = load(tmp_path, 'fresh', DiaryLoader(db_path))
+
+    assert len(incremental) == len(first)
+    assert trade_sources(incremental) == trade_sources(fresh)
+    assert incremental.attrs['overlap'] == fresh.attrs['overlap'] == {'Excel-Portfolio 1': {'SQLite': 1}}
+
+
+def test_incremental_load_without_overlap_only_adds_new_rows(sources):
+    trades, db_path, tmp_path = sources
+    loader = DiaryLoader(db_path)
+    first = load(tmp_path, 'cache', loader)
+
+    extra = trades.iloc[[150]].assign(netPL=trades['netPL'].iloc[150] + 1)
+    append_diary(db_path, extra)
+    incremental = load(tmp_path, 'cache', loader)
+    fresh = load(tmp_path, 'fresh', DiaryLoader(db_path))
+
+    assert loader.last_mode == 'incremental'
+    assert len(incremental) == len(first) + 1
+    assert trade_sources(incremental) == trade_sources(fresh)
+
+
+@pytest.fixture
+def recent_trades():
+    # Obchody každých 5 hodin - první den relativního období je vždy neúplný
+    now = pd.Timestamp.now()
+    exits = pd.date_range((now - pd.Timedelta(days=40)).floor('D'), now, freq='5h')
+    df = pd.DataFrame({
+        'strategy': np.where(np.arange(len(exits)) % 3, 'A', 'B'),
+        'exitDate': exits,
+        'netPL': np.arange(len(exits)) % 7 - 3.5,
+        'ticker': 'ES',
+        'source': 'SQLite',
+    })
+    return normalize_trades(df)[0]
+
+
+@pytest.mark.parametrize('time_filter', ['Posledních 30 dní', 'Týden'])
+def test_modes_agree_on_relative_period(recent_trades, tmp_path, time_filter):
+    start, end = time_filter_bounds(time_filter)
+    strategies = ['A', 'B']
+
+    memory_trades = filter_by_time(index_by_exit_date(recent_trades), time_filter)
+    memory = TradeCube.from_trades(recent_trades).slice(start, end, strategies)
+
+    spool, aggregator = TradeSpool(str(tmp_path / 'spool.parquet')), TradeAggregator()
+    spool.rebuild(aggregator.fold([recent_trades]))
+    stream = aggregator.cube().slice(start, end, strategies)
+
+    mirror = TradeMirror(str(tmp_path / 'mirror.db3'), {})
+    mirror.rebuild([recent_trades])
+    sql = TradeCube.from_daily(mirror.daily(start, end, strategies), strategies)
+
+    expected = memory.metrics(INITIAL_CAPITAL)
+    assert expected['total_trades'] == len(memory_trades)
+    for cube in (stream, sql):
+        metrics = cube.metrics(INITIAL_CAPITAL)
+        assert metrics['total_trades'] == expected['total_trades']
+        assert metrics['total_pl'] == pytest.approx(expected['total_pl'])
+    assert len(spool.select(start, end, strategies)) == len(memory_trades)
+    assert len(mirror.trade_points(start, end, strategies)) == len(memory_trades)
+
+
+def test_mirror_daily_skips_partial_first_day(recent_trades, tmp_path):
+    mirror = TradeMirror(str(tmp_path / 'mirror.db3'), {})
+    mirror.rebuild([recent_trades])
+    start = pd.Timestamp.now() - pd.Timedelta(days=30)
+
+    sql = TradeCube.from_daily(mirror.daily(start), ['A', 'B'])
+    memory = TradeCube.from_trades(recent_trades).slice(start)
+
+    assert sql.metrics(INITIAL_CAPITAL) == memory.metrics(INITIAL_CAPITAL)
@@ -0,0 +1,649 @@
+"""
+Trade Analytics - předpočítané agregace obchodů
+===============================================
+Hustá kostka strategie × kalendářní den, ze které se čtou metriky,
+klouzavé (rolling) metriky a agregované grafy, a pomocné nástroje pro
+vykreslování grafů.
+Modul nezávisí na Streamlitu.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from trade_perf import PERF
+
+
+class TradeCube:
+    """Hustá kostka strategie × kalendářní den
+
+    Pro každou dvojici (strategie, den) drží součet P&L, počet obchodů,
+    počet vítězných a ztrátových obchodů a hrubý zisk/ztrátu. Časový
+    a strategický filtr jsou jen řezy polí, cena agregace tak roste
+    s počtem dní × strategií místo s počtem obchodů.
+    """
+
+    FIELDS = ('pl', 'trades', 'wins', 'losses', 'gross_profit', 'gross_loss')
+
+    def __init__(self, strategies, days, arrays):
+        self.strategies = list(strategies)
+        self.days = days
+        self.arrays = arrays
+        self._strategy_index = {name: i for i, name in enumerate(self.strategies)}
+        self._monthly = None
+        self._rolling = {}
+
+    @classmethod
+    def from_trades(cls, df):
+        """Sestaví kostku z obchodů (sloupce strategy, exitDate, netPL)"""
+        if df.empty:
+            days = pd.DatetimeIndex([], dtype='datetime64[ns]')
+            return cls([], days, {field: np.zeros((0, 0)) for field in cls.FIELDS})
+
+        strategy = df['strategy'].astype('category').cat.remove_unused_categories()
+        codes = strategy.cat.codes.to_numpy()
+        exit_days = df['exitDate'].dt.normalize().to_numpy()
+        day0 = exit_days.min()
+        days = pd.date_range(day0, exit_days.max(), freq='D')
+        day_idx = ((exit_days - day0) // np.timedelta64(1, 'D')).astype(np.int64)
+
+        n_strat, n_days = len(strategy.cat.categories), len(days)
+        flat = codes.astype(np.int64) * n_days + day_idx
+        pl = df['netPL'].to_numpy(dtype=np.float64)
+        win, loss = pl > 0, pl < 0
+
+        def dense(weights=None, mask=None):
+            idx = flat if mask is None else flat[mask]
+            w = weights if mask is None or weights is None else weights[mask]
+            return np.bincount(idx, weights=w, minlength=n_strat * n_days).reshape(n_strat, n_days)
+
+        arrays = {
+            'pl': dense(pl),
+            'trades': dense().astype(np.int32),
+            'wins': dense(mask=win).astype(np.int32),
+            'losses': dense(mask=loss).astype(np.int32),
+            'gross_profit': dense(pl, win),
+            'gross_loss': dense(pl, loss),
+        }
+        return cls([str(name) for name in strategy.cat.categories], days, arrays)
+
+    @classmethod
+    def from_daily(cls, daily, strategies=None):
+        """Sestaví kostku z denních součtů (sloupce strategy, day a FIELDS)
+
+        day je počet dní od epochy, jak ho vrací TradeMirror.daily.
+        Pořadí řádků určuje strategies (chybějící strategie se vynechají),
+        řádky strategií, které ve strategies nejsou, se zahodí.
+        """
+        if daily.empty:
+            days = pd.DatetimeIndex([], dtype='datetime64[ns]')
+            return cls([], days, {field: np.zeros((0, 0)) for field in cls.FIELDS})
+
+        present = set(daily['strategy'])
+        names = [s for s in (strategies if strategies is not None else pd.unique(daily['strategy'])) if s in present]
+        # Řádky strategií mimo strategies by dostaly kód -1 a zapsaly se do posledního řádku kostky
+        selected = daily['strategy'].isin(names)
+        if not selected.all():
+            daily = daily[selected]
+            if daily.empty:
+                days = pd.DatetimeIndex([], dtype='datetime64[ns]')
+                return cls([], days, {field: np.zeros((0, 0)) for field in cls.FIELDS})
+        codes = pd.Categorical(daily['strategy'], categories=names).codes
+        day = daily['day'].to_numpy(dtype=np.int64)
+        day0 = day.min()
+        days = pd.date_range(pd.Timestamp(day0 * 86400, unit='s'), periods=day.max() - day0 + 1, freq='D')
+
+        arrays = {}
+        for field in cls.FIELDS:
+            dtype = np.int32 if field in ('trades', 'wins', 'losses') else np.float64
+            values = np.zeros((len(names), len(days)), dtype=dtype)
+            values[codes, day - day0] = daily[field].to_numpy(dtype=dtype)
+            arrays[field] = values
+        return cls(names, days.as_unit('ns'), arrays)
+
+    def slice(self, start=None, end=None, strategies=None):
+        """Řez kostkou - dny v intervalu [start, end] a vybrané strategie"""
+        lo = 0 if start is None else self.days.searchsorted(pd.Timestamp(start), 'left')
+        hi = len(self.days) if end is None else self.days.searchsorted(pd.Timestamp(end), 'right')
+        if strategies is None:
+            rows = np.arange(len(self.strategies))
+        else:
+            rows = np.array(
+                [self._strategy_index[s] for s in strategies if s in self._strategy_index], dtype=np.int64
+            )
+        arrays = {field: values[rows, lo:hi] for field, values in self.arrays.items()}
+        return TradeCube([self.strategies[i] for i in rows], self.days[lo:hi], arrays)
+
+    def daily(self):
+        """Denní P&L portfolia (jen dny s obchody) - sloupce exitDate, netPL"""
+        active = self.arrays['trades'].sum(axis=0) > 0
+        return pd.DataFrame({
+            'exitDate': self.days[active],
+            'netPL': self.arrays['pl'].sum(axis=0)[active],
+        })
+
+    def strategy_totals(self):
+        """Celkové P&L strategií s alespoň jedním obchodem - sloupce strategy, netPL"""
+        active = self.arrays['trades'].sum(axis=1) > 0
+        return pd.DataFrame({
+            'strategy': np.array(self.strategies, dtype=object)[active],
+            'netPL': self.arrays['pl'].sum(axis=1)[active],
+        })
+
+    def strategy_metrics(self, initial_capital):
+        """Metriky strategií s alespoň jedním obchodem ve tvaru grouped_metrics
+
+        Max drawdown se počítá z denní kumulativní křivky každé strategie.
+        """
+        trades = self.arrays['trades']
+        active = trades.sum(axis=1) > 0
+        pl = self.arrays['pl'][active]
+        counts = trades[active].sum(axis=1).astype(np.int64)
+        wins = self.arrays['wins'][active].sum(axis=1).astype(np.int64)
+        losses = self.arrays['losses'][active].sum(axis=1).astype(np.int64)
+        total_pl = pl.sum(axis=1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_win = np.where(wins > 0, self.arrays['gross_profit'][active].sum(axis=1) / wins, 0)
+            avg_loss = np.where(losses > 0, self.arrays['gross_loss'][active].sum(axis=1) / losses, 0)
+            profit_factor = np.where(avg_loss != 0, np.abs(avg_win / avg_loss), 0)
+
+        # Křivka začíná prvním dnem s obchodem, dřívější dny nesmí být vrcholem
+        # Kostka bez dní (prázdný výběr v SQL režimu) - argmax prázdné osy selže
+        if pl.shape[1]:
+            before_first = np.arange(pl.shape[1]) < np.argmax(trades[active] > 0, axis=1)[:, None]
+            cum = np.cumsum(pl, axis=1)
+            running_max = np.maximum.accumulate(np.where(before_first, -np.inf, cum), axis=1)
+            max_dd = np.where(before_first, 0, cum - running_max).min(axis=1)
+        else:
+            max_dd = np.zeros(0)
+
+        return pd.DataFrame({
+            'strategy': np.array(self.strategies, dtype=object)[active],
+            'total_pl': total_pl,
+            'total_pl_percent': total_pl / initial_capital * 100,
+            'total_capital': initial_capital + total_pl,
+            'total_trades': counts,
+            'winning_trades': wins,
+            'losing_trades': losses,
+            'win_rate': wins / np.maximum(counts, 1) * 100,
+            'avg_win': avg_win,
+            'avg_loss': avg_loss,
+            'profit_factor': profit_factor,
+            'max_drawdown': max_dd,
+        })
+
+    def monthly(self):
+        """P&L po (strategie, rok, měsíc) jako husté pole
+
+        Vrací (roky, pl, trades), kde pl a trades mají tvar
+        [strategie, rok, 12]. Roky bez obchodů se vynechají. Všechny
+        měsíční heat mapy jsou jen součty přes osu tohoto pole, počítá
+        se jednou na kostku.
+        """
+        if self._monthly is not None:
+            return self._monthly
+
+        n_strat = len(self.strategies)
+        if len(self.days) == 0:
+            pl = np.zeros((n_strat, 0, 12))
+            self._monthly = (np.array([], dtype=np.int64), pl, pl.astype(np.int32))
+            return self._monthly
+
+        years = self.days.year.to_numpy().astype(np.int64)
+        month_id = (years - years[0]) * 12 + self.days.month.to_numpy() - 1
+        starts = np.flatnonzero(np.diff(month_id, prepend=-1))
+        n_years = years[-1] - years[0] + 1
+
+        def dense(values):
+            out = np.zeros((n_strat, n_years * 12), dtype=values.dtype)
+            out[:, month_id[starts]] = np.add.reduceat(values, starts, axis=1)
+            return out.reshape(n_strat, n_years, 12)
+
+        pl, trades = dense(self.arrays['pl']), dense(self.arrays['trades'])
+        active = trades.sum(axis=(0, 2)) > 0
+        self._monthly = (np.arange(years[0], years[-1] + 1)[active], pl[:, active], trades[:, active])
+        return self._monthly
+
+    def rolling(self, window):
+        """Klouzavé metriky portfolia a všech strategií s obchody přes window obchodních dní
+
+        Obchodní den je den, kdy portfolio v řezu obchodovalo - strategie
+        má v takový den bez vlastního obchodu nulové P&L. Vrací dlouhou
+        tabulku (series, exitDate, ROLLING_METRICS) jen pro dny s plným
+        oknem, portfolio je řada ROLLING_PORTFOLIO. Počítá se jednou
+        na kostku a okno.
+        """
+        if window in self._rolling:
+            return self._rolling[window]
+
+        active_days = self.arrays['trades'].sum(axis=0) > 0
+        active = self.arrays['trades'].sum(axis=1) > 0
+        names = [ROLLING_PORTFOLIO] + [name for name, keep in zip(self.strategies, active) if keep]
+        arrays = {
+            field: np.vstack([values[:, active_days].sum(axis=0), values[active][:, active_days]])
+            for field, values in self.arrays.items()
+        }
+        with PERF.stage('rolling', rows=len(names) * int(active_days.sum()), window=window):
+            metrics = rolling_metrics(arrays, window)
+
+        days = self.days[active_days]
+        full = slice(window - 1, None)
+        n_days = len(days[full])
+        frame = pd.DataFrame({
+            'series': np.repeat(np.array(names, dtype=object), n_days),
+            'exitDate': np.tile(days[full].to_numpy(), len(names)),
+            **{name: values[:, full].ravel() for name, values in metrics.items()},
+        })
+        self._rolling[window] = frame
+        return frame
+
+    def metrics(self, initial_capital):
+        """Portfolio metriky ve stejném tvaru jako calc_metrics
+
+        Max drawdown se počítá z denní kumulativní křivky.
+        """
+        total_trades = int(self.arrays['trades'].sum())
+        if total_trades == 0:
+            return {}
+
+        total_pl = self.arrays['pl'].sum()
+        wins = int(self.arrays['wins'].sum())
+        losses = int(self.arrays['losses'].sum())
+        avg_win = self.arrays['gross_profit'].sum() / wins if wins > 0 else 0
+        avg_loss = self.arrays['gross_loss'].sum() / losses if losses > 0 else 0
+
+        cum_pl = self.daily()['netPL'].cumsum().to_numpy()
+        max_dd = (cum_pl - np.maximum.accumulate(cum_pl)).min()
+
+        return {
+            'total_pl': total_pl,
+            'total_pl_percent': (total_pl / initial_capital) * 100,
+            'total_capital': initial_capital + total_pl,
+            'total_trades': total_trades,
+            'winning_trades': wins,
+            'losing_trades': losses,
+            'win_rate': (wins / total_trades) * 100,
+            'avg_win': avg_win,
+            'avg_loss': avg_loss,
+            'profit_factor': abs(avg_win / avg_loss) if avg_loss != 0 else 0,
+            'max_drawdown': max_dd
+        }
+
+
+class TradeAggregator:
+    """Průběžné součty strategie × den z bloků obchodů
+
+    Každý blok se sečte po (strategie, den) a přičte k dosavadním
+    součtům - v paměti jsou jen agregace a aktuální blok, ne všechny
+    obchody. Výsledek má stejný tvar jako TradeMirror.daily, kostka se
+    z něj sestaví přes TradeCube.from_daily.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.by_source = {}
+        # Překryvy zdrojů odstraněné před agregací - doplní volající s TradeDeduplicator
+        self.overlap = {}
+        self._totals = None
+        self._cube = None
+
+    def add(self, df):
+        """Přičte blok normalizovaných obchodů (sloupce strategy, exitDate, netPL, source)"""
+        if df.empty:
+            return
+        pl = df['netPL'].to_numpy(dtype=np.float64)
+        win, loss = pl > 0, pl < 0
+        chunk = pd.DataFrame({
+            'strategy': df['strategy'].astype(str).to_numpy(),
+            'day': df['exitDate'].to_numpy('datetime64[D]').astype(np.int64),
+            'pl': pl,
+            'trades': 1,
+            'wins': win.astype(np.int64),
+            'losses': loss.astype(np.int64),
+            'gross_profit': np.where(win, pl, 0.0),
+            'gross_loss': np.where(loss, pl, 0.0),
+        }).groupby(['strategy', 'day'], sort=False).sum()
+        self._totals = chunk if self._totals is None else self._totals.add(chunk, fill_value=0)
+
+        self.rows += len(df)
+        if 'source' in df.columns:
+            for source, count in df['source'].value_counts(sort=False).items():
+                if count:
+                    self.by_source[str(source)] = self.by_source.get(str(source), 0) + int(count)
+        self._cube = None
+
+    def fold(self, frames):
+        """Přičítá bloky a dál je propouští - pro zpracování jedním průchodem"""
+        for df in frames:
+            self.add(df)
+            yield df
+
+    def daily(self):
+        """Denní součty - sloupce strategy, day (dny od epochy) a TradeCube.FIELDS"""
+        if self._totals is None:
+            return pd.DataFrame(columns=['strategy', 'day', *TradeCube.FIELDS])
+        daily = self._totals.reset_index()
+        counts = ['trades', 'wins', 'losses']
+        daily[counts] = daily[counts].astype(np.int64)
+        return daily
+
+    def strategies(self):
+        """Strategie v pořadí prvního obchodu (stejně jako TradeMirror.strategies)"""
+        if self._totals is None:
+            return []
+        first = self._totals.reset_index().groupby('strategy')['day'].min()
+        return list(first.reset_index().sort_values(['day', 'strategy'])['strategy'])
+
+    def cube(self):
+        """Kostka ze součtů - sestaví se jednou po posledním bloku"""
+        if self._cube is None:
+            self._cube = TradeCube.from_daily(self.daily(), self.strategies())
+        return self._cube
+
+    def summary(self):
+        """Počet obchodů, po zdrojích a rozsah dní - ve tvaru TradeMirror.summary"""
+        if self._totals is None:
+            return {'rows': 0, 'by_source': {}, 'overlap': self.overlap}
+        days = self._totals.index.get_level_values('day')
+        return {
+            'rows': self.rows,
+            'by_source': dict(self.by_source),
+            'overlap': self.overlap,
+            'first': pd.Timestamp(days.min() * 86400, unit='s').value,
+            'last': pd.Timestamp(days.max() * 86400, unit='s').value,
+            'MB': self._totals.memory_usage(deep=True).sum() / 1e6,
+        }
+
+
+# Klouzavé metriky - délky oken v obchodních dnech, anualizace Sharpe / Sortino
+ROLLING_WINDOWS = (20, 60, 250)
+ROLLING_METRICS = ('win_rate', 'profit_factor', 'sharpe', 'sortino', 'drawdown')
+ROLLING_PORTFOLIO = 'Portfolio'
+TRADING_DAYS_PER_YEAR = 252
+
+
+def rolling_sum(values, window):
+    """Klouzavé součty přes poslední osu z kumulativního součtu - O(n), NaN před plným oknem"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(values.shape, np.nan)
+    if values.shape[-1] < window:
+        return out
+    csum = np.cumsum(values, axis=-1)
+    out[..., window - 1:] = csum[..., window - 1:]
+    out[..., window:] -= csum[..., :-window]
+    return out
+
+
+def rolling_max(values, window):
+    """Klouzavé maximum přes poslední osu - O(n) bez ohledu na délku okna, NaN před plným oknem
+
+    Blokový (van Herk / Gil-Werman) protějšek monotónní fronty: řada se
+    rozdělí na bloky délky window a maximum okna [t - window + 1, t] je
+    maximum suffixového maxima bloku, kde okno začíná, a prefixového
+    maxima bloku, kde končí. Všechny řady (řádky) najednou ve vektorech.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[-1]
+    out = np.full(values.shape, np.nan)
+    if n < window:
+        return out
+    pad = np.full(values.shape[:-1] + ((-n) % window,), -np.inf)
+    blocks = np.concatenate([values, pad], axis=-1).reshape(values.shape[:-1] + (-1, window))
+    prefix = np.maximum.accumulate(blocks, axis=-1).reshape(values.shape[:-1] + (-1,))
+    suffix = np.maximum.accumulate(blocks[..., ::-1], axis=-1)[..., ::-1].reshape(values.shape[:-1] + (-1,))
+    out[..., window - 1:] = np.maximum(suffix[..., :n - window + 1], prefix[..., window - 1:n])
+    return out
+
+
+def rolling_metrics(arrays, window):
+    """Klouzavé metriky z denních polí ve tvaru TradeCube.arrays (řady × obchodní dny)
+
+    Každá metrika je O(n) na řadu - součty oken z kumulativních součtů
+    a klouzavé maximum křivky, žádný přepočet okna od nuly. Definice
+    odpovídají calc_metrics (win rate v %, profit factor jako |průměrný
+    zisk / průměrná ztráta|), Sharpe a Sortino z denního P&L anualizované
+    přes TRADING_DAYS_PER_YEAR, drawdown je pokles od nejvyššího stavu
+    kumulativního P&L za posledních window dní (včetně stavu před oknem).
+    Hodnoty před plným oknem a bez obchodů v okně jsou NaN.
+    """
+    pl = np.asarray(arrays['pl'], dtype=np.float64)
+    trades, wins, losses = (rolling_sum(arrays[field], window) for field in ('trades', 'wins', 'losses'))
+    gross_profit, gross_loss = rolling_sum(arrays['gross_profit'], window), rolling_sum(arrays['gross_loss'], window)
+
+    sum_pl = rolling_sum(pl, window)
+    sum_sq = rolling_sum(pl ** 2, window)
+    sum_down = rolling_sum(np.minimum(pl, 0) ** 2, window)
+    mean = sum_pl / window
+    annual = np.sqrt(TRADING_DAYS_PER_YEAR)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_rate = np.where(trades > 0, wins / trades * 100, np.nan)
+        avg_win = np.where(wins > 0, gross_profit / wins, 0)
+        avg_loss = np.where(losses > 0, gross_loss / losses, 0)
+        profit_factor = np.where(trades > 0, np.where(avg_loss != 0, np.abs(avg_win / avg_loss), 0), np.nan)
+        # Výběrová směrodatná odchylka; rozdíl součtů může být lehce záporný zaokrouhlením
+        std = np.sqrt(np.maximum(sum_sq - sum_pl * mean, 0) / max(window - 1, 1))
+        sharpe = np.where(std > 0, mean / std * annual, np.nan)
+        downside = np.sqrt(sum_down / window)
+        sortino = np.where(downside > 0, mean / downside * annual, np.nan)
+
+    # Křivka s počátečním stavem 0 - vrchol okna může být i stav před jeho prvním dnem
+    equity = np.concatenate([np.zeros(pl.shape[:-1] + (1,)), np.cumsum(pl, axis=-1)], axis=-1)
+    drawdown = (equity - rolling_max(equity, window + 1))[..., 1:]
+
+    return {
+        'win_rate': win_rate,
+        'profit_factor': profit_factor,
+        'sharpe': sharpe,
+        'sortino': sortino,
+        'drawdown': drawdown,
+    }
+
+
+def grouped_metrics(df, initial_capital, by='strategy'):
+    """Metriky všech skupin (strategií) najednou v jednom seřazeném průchodu
+
+    Vrací tabulku s řádkem na skupinu ve stejném pořadí jako
+    df[by].unique() a se stejnými metrikami jako calc_metrics.
+    """
+    columns = ['total_pl', 'total_pl_percent', 'total_capital', 'total_trades', 'winning_trades',
+               'losing_trades', 'win_rate', 'avg_win', 'avg_loss', 'profit_factor', 'max_drawdown']
+    if df.empty:
+        return pd.DataFrame(columns=[by] + columns)
+
+    groups = df[by].astype('category').cat.remove_unused_categories()
+    codes = groups.cat.codes.to_numpy()
+    n_groups = len(groups.cat.categories)
+    pl = df['netPL'].to_numpy(dtype=np.float64)
+    exit_dates = df['exitDate'].to_numpy()
+
+    # Jediné řazení: skupina, v ní datum výstupu
+    order = np.lexsort((exit_dates, codes))
+    codes, pl = codes[order], pl[order]
+    counts = np.bincount(codes, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    win, loss = pl > 0, pl < 0
+    total_pl = np.bincount(codes, weights=pl, minlength=n_groups)
+    wins = np.bincount(codes, weights=win, minlength=n_groups)
+    losses = np.bincount(codes, weights=loss, minlength=n_groups)
+    gross_profit = np.bincount(codes, weights=np.where(win, pl, 0), minlength=n_groups)
+    gross_loss = np.bincount(codes, weights=np.where(loss, pl, 0), minlength=n_groups)
+
+    # Kumulativní P&L v rámci skupiny
+    cum = np.cumsum(pl)
+    cum -= np.repeat(cum[starts] - pl[starts], counts)
+
+    # Běžné maximum po skupinách jedním accumulate - každá skupina se posune
+    # nad maximum předchozích, takže se maximum na hranici skupin "resetuje"
+    group_min = np.minimum.reduceat(cum, starts)
+    group_max = np.maximum.reduceat(cum, starts)
+    base = np.concatenate(([0], np.cumsum(group_max - group_min + 1)[:-1]))
+    shift = np.repeat(base - group_min, counts)
+    running_max = np.maximum.accumulate(cum + shift) - shift
+    max_dd = np.minimum.reduceat(cum - running_max, starts)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_win = np.where(wins > 0, gross_profit / wins, 0)
+        avg_loss = np.where(losses > 0, gross_loss / losses, 0)
+        profit_factor = np.where(avg_loss != 0, np.abs(avg_win / avg_loss), 0)
+
+    table = pd.DataFrame({
+        by: np.asarray(groups.cat.categories, dtype=object),
+        'total_pl': total_pl,
+        'total_pl_percent': total_pl / initial_capital * 100,
+        'total_capital': initial_capital + total_pl,
+        'total_trades': counts,
+        'winning_trades': wins.astype(np.int64),
+        'losing_trades': losses.astype(np.int64),
+        'win_rate': wins / counts * 100,
+        'avg_win': avg_win,
+        'avg_loss': avg_loss,
+        'profit_factor': profit_factor,
+        'max_drawdown': max_dd,
+    })
+
+    # Pořadí podle prvního výskytu, jako df[by].unique()
+    first_seen = pd.unique(groups.cat.codes.to_numpy())
+    return table.iloc[first_seen].reset_index(drop=True)
+
+
+def format_usd_labels(values):
+    """Popisky buněk "$1,234" pro celé pole najednou, nuly jako prázdný řetězec
+
+    Odpovídá f"${val:,.0f}" po prvcích - tisíce se skládají
+    po skupinách třech číslic přes np.char.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.rint(values).astype(np.int64)
+    rest = np.abs(rounded)
+
+    def group(rest):
+        # Skupina za vyšší skupinou potřebuje úvodní nuly
+        return np.where(rest >= 1000, np.char.mod('%03d', rest % 1000), np.char.mod('%d', rest % 1000))
+
+    text = group(rest)
+    rest = rest // 1000
+    while rest.any():
+        text = np.where(rest > 0, np.char.add(np.char.add(group(rest), ','), text), text)
+        rest = rest // 1000
+
+    text = np.char.add(np.where(values < 0, '$-', '$'), text)
+    return np.where(values != 0, text, '')
+
+
+def downsample_minmax(x, y, point_budget):
+    """Indexy bodů pro vykreslení řady v rámci point_budget (min-max / M4)
+
+    Osa x (seřazená) se rozdělí na point_budget // 4 stejně širokých
+    sloupců a z každého se ponechá první, poslední, minimální a maximální
+    bod. Křivka i její extrémy (vrcholy a dna drawdownu) tak zůstanou
+    v rozlišení grafu vizuálně stejné. Pro krátké řady vrací všechny indexy.
+    """
+    n = len(y)
+    n_buckets = max(point_budget // 4, 1)
+    if n <= point_budget:
+        return np.arange(n)
+
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').astype(np.int64)
+    x = x.astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    span = x[-1] - x[0]
+    if span > 0:
+        bucket = np.minimum(((x - x[0]) / span * n_buckets).astype(np.int64), n_buckets - 1)
+    else:
+        bucket = np.arange(n) * n_buckets // n
+
+    starts = np.flatnonzero(np.diff(bucket, prepend=-1))
+    ends = np.append(starts[1:], n) - 1
+    by_value = np.lexsort((y, bucket))
+    keep = np.concatenate((starts, ends, by_value[starts], by_value[ends]))
+    return np.unique(keep)
+
+
+def _value_bytes(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_value_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_value_bytes(item) for item in value)
+    return 8
+
+
+def figure_bytes(fig):
+    """Odhad velikosti grafu z polí stop a layoutu - bez serializace do JSON
+
+    Stopy se čtou po jedné, Figure.to_dict by pole převedl do base64.
+    """
+    return sum(_value_bytes(trace.to_plotly_json()) for trace in fig.data) + _value_bytes(fig.layout.to_plotly_json())
+
+
+class FigureCache:
+    """LRU cache hotových grafů omezená počtem položek i pamětí
+
+    Klíčem je levný otisk vstupu (verze dat, řez filtrů, strategie),
+    velikost položky je odhad z nbytes polí grafu (figure_bytes). Počítadla hits/misses slouží
+    k ověření účinnosti v provozu.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=256 * 2**20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """Vrátí graf pro klíč, při chybění ho postaví voláním build()"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        started = time.perf_counter()
+        fig = build()
+        size = figure_bytes(fig)
+        # Fáze podle druhu grafu (první prvek klíče), bajty = odhad velikosti grafu
+        PERF.record(f"figure.{key[0]}", time.perf_counter() - started, nbytes=size)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (fig, size)
+            self._bytes += size
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return fig
+
+    def stats(self):
+        """Počítadla a obsazenost cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total * 100 if total else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'MB': self._bytes / 1e6,
+            }
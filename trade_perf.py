@@ -0,0 +1,100 @@
+"""
+Trade Perf - měření fází zpracování
+===================================
+Levné strukturované záznamy trvání, počtu řádků a bajtů jednotlivých
+fází (dotaz SQLite, sheety Excelu, normalizace, filtry, metriky, grafy)
+pro panel ⏱ Performance a export do JSON. Modul nezávisí na Streamlitu.
+"""
+
+import json
+import platform
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+PERF_MAX_RECORDS = 2000
+
+
+class PerfLog:
+    """Kruhový záznam měření fází - sdílený mezi vlákny i session
+
+    Záznam stojí dvě volání perf_counter a jedno append pod zámkem,
+    drží se posledních max_records měření. Ke každému záznamu lze
+    přidat libovolné údaje (sheet, režim načtení, počet zamítnutých).
+    """
+
+    def __init__(self, max_records=PERF_MAX_RECORDS):
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, rows=None, nbytes=None, **info):
+        """Uloží jedno měření fáze stage trvající seconds"""
+        entry = {'stage': stage, 'ms': seconds * 1000, 'rows': rows, 'bytes': nbytes, 'at': time.time(), **info}
+        with self._lock:
+            self._records.append(entry)
+        return entry
+
+    @contextmanager
+    def stage(self, stage, rows=None, nbytes=None, **info):
+        """Změří blok with - počty lze doplnit do vráceného slovníku (rec['rows'] = ...)"""
+        entry = {'rows': rows, 'nbytes': nbytes, **info}
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            self.record(stage, time.perf_counter() - start, **entry)
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def summary(self):
+        """Souhrn po fázích v pořadí prvního výskytu - počet, poslední, průměr a maximum ms"""
+        records = self.records()
+        if not records:
+            return pd.DataFrame(columns=['stage', 'calls', 'last_ms', 'mean_ms', 'max_ms', 'total_ms', 'rows', 'MB'])
+        df = pd.DataFrame(records, columns=['stage', 'ms', 'rows', 'bytes'])
+        grouped = df.groupby('stage', sort=False)
+        table = grouped['ms'].agg(calls='size', last_ms='last', mean_ms='mean', max_ms='max', total_ms='sum')
+        table['rows'] = grouped['rows'].last()
+        table['MB'] = grouped['bytes'].last() / 1e6
+        return table.reset_index()
+
+    def summary_records(self):
+        """Souhrn jako seznam slovníků pro JSON - chybějící hodnoty jako None"""
+        summary = self.summary().astype(object)
+        return summary.where(summary.notna(), None).to_dict(orient='records')
+
+    def to_json(self, meta=None):
+        """Export měření do JSON - souhrn, jednotlivé záznamy a verze prostředí"""
+        payload = {
+            'exported_at': datetime.now().isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+            },
+            'meta': meta or {},
+            'summary': self.summary_records(),
+            'records': self.records(),
+        }
+        return json.dumps(payload, ensure_ascii=False, indent=1, default=str)
+
+
+def frame_bytes(df):
+    """Mělká velikost DataFrame / Series v bajtech - bez procházení textových hodnot"""
+    return int(df.memory_usage(index=False).sum()) if isinstance(df, pd.DataFrame) else int(df.memory_usage(index=False))
+
+
+# Sdílený záznam procesu - plní ho pipeline, analytika i aplikace
+PERF = PerfLog()
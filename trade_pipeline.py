@@ -0,0 +1,1051 @@
+"""
+Trade Pipeline - sdílené zpracování obchodů
+===========================================
+Vektorové zpracování dat pro trading_dashboard.py i onedrive_integration.py.
+Modul nezávisí na Streamlitu, lze ho použít i mimo aplikaci.
+"""
+
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from trade_perf import PERF, frame_bytes
+
+# Rozumný rozsah datumů obchodů
+DATE_MIN = pd.Timestamp('2020-01-01')
+DATE_MAX = pd.Timestamp('2030-12-31')
+
+
+def normalize_dates(values, start=DATE_MIN, end=DATE_MAX):
+    """Vektorová konverze na datum bez času - vrací (Series, statistiky zamítnutých řádků)
+
+    Odpovídá původní řádkové konverzi: odstranění timezone, zahození
+    datumů roku 1900, omezení na rozsah start-end a zkrácení na datum.
+    """
+    started = time.perf_counter()
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    total = len(series)
+
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        # Už jde o datetime sloupec - stačí odstranit timezone
+        parsed = series
+        if parsed.dt.tz is not None:
+            parsed = parsed.dt.tz_localize(None)
+        empty = parsed.isna()
+        sentinel = parsed.dt.year.eq(1900)
+        parsed = parsed.mask(sentinel)
+        unparsed = pd.Series(False, index=series.index)
+    else:
+        text = series.astype('string').str.strip()
+        empty = (text.isna() | text.eq('')).astype(bool)
+        sentinel = text.str.contains('1900-', regex=False).fillna(False).astype(bool) & ~empty
+        cleaned = text.mask(empty | sentinel)
+
+        # Odstranění timezone značek (+HH:MM, -HH:MM, Z) a času
+        plus = cleaned.str.contains('+', regex=False).fillna(False).astype(bool)
+        cleaned = cleaned.mask(plus, cleaned.str.replace(r'\+.*$', '', regex=True))
+        minus_tz = ~plus & cleaned.str.count('-').fillna(0).gt(2).astype(bool)
+        cleaned = cleaned.mask(
+            minus_tz, cleaned.str.replace(r'^([^-]*-[^-]*-[^-]*)-.*$', r'\1', regex=True)
+        )
+        cleaned = cleaned.str.replace(r'Z$', '', regex=True).str.replace(r' .*$', '', regex=True)
+
+        # Rychlá ISO cesta, zbytek (jiné formáty) se parsuje zvlášť
+        parsed = pd.to_datetime(cleaned, errors='coerce', format='ISO8601')
+        retry = (parsed.isna() & cleaned.notna()).astype(bool)
+        if retry.any():
+            parsed = parsed.astype('datetime64[ns]')
+            parsed[retry] = pd.to_datetime(cleaned[retry], errors='coerce', format='mixed')
+        unparsed = (parsed.isna() & cleaned.notna()).astype(bool)
+
+    dates = parsed.dt.normalize()
+    in_range = dates.between(start, end).fillna(False).astype(bool)
+    out_of_range = dates.notna() & ~in_range
+    result = dates.where(in_range).astype('datetime64[ns]')
+
+    stats = {
+        'total': total,
+        'valid': int(in_range.sum()),
+        'empty': int(empty.sum()),
+        'sentinel_1900': int(sentinel.sum()),
+        'unparsed': int(unparsed.sum()),
+        'out_of_range': int(out_of_range.sum()),
+    }
+    PERF.record('dates.normalize', time.perf_counter() - started, rows=total, nbytes=frame_bytes(result),
+                rejected=total - stats['valid'])
+    return result, stats
+
+
+def format_date_stats(stats):
+    """Souhrnný text ke statistikám z normalize_dates"""
+    return (
+        f"platných {stats['valid']}/{stats['total']} "
+        f"(prázdné: {stats['empty']}, rok 1900: {stats['sentinel_1900']}, "
+        f"neparsovatelné: {stats['unparsed']}, mimo rozsah: {stats['out_of_range']})"
+    )
+
+
+# Pole otisku obchodu - (sloupec, zaokrouhlení číselných hodnot)
+FINGERPRINT_TEXT = ['strategy', 'ticker']
+FINGERPRINT_DATES = ['entryDate', 'exitDate']
+FINGERPRINT_NUMBERS = {'quantity': 4, 'entryPrice': 4, 'exitPrice': 4, 'netPL': 2}
+
+
+def _fingerprint_dates(df, column):
+    if column not in df.columns:
+        return np.full(len(df), np.iinfo(np.int64).min)
+    values = df[column]
+    if not pd.api.types.is_datetime64_any_dtype(values.dtype):
+        # Surový text (mix timezone značek) - stejný převod jako při normalizaci
+        values, _ = normalize_dates(values)
+    if values.dt.tz is not None:
+        values = values.dt.tz_localize(None)
+    return values.to_numpy('datetime64[ns]').view(np.int64)
+
+
+def trade_fingerprints(df):
+    """Stabilní 64bitové otisky obchodů (uint64) - vektorově přes hash_pandas_object
+
+    Text se ořízne, datumy se berou v ns, množství a ceny se zaokrouhlí na
+    4 desetinná místa a P&L na centy - stejný obchod ze SQLite i Excelu dá
+    stejný otisk bez ohledu na dtype (float32 / float64, kategorie / text).
+    Chybějící sloupec se bere jako prázdná hodnota.
+    """
+    canonical = {}
+    for column in FINGERPRINT_TEXT:
+        values = df[column] if column in df.columns else pd.Series(pd.NA, index=df.index)
+        canonical[column] = values.astype('string').str.strip().fillna('').to_numpy(dtype=object)
+    for column in FINGERPRINT_DATES:
+        canonical[column] = _fingerprint_dates(df, column)
+    for column, decimals in FINGERPRINT_NUMBERS.items():
+        if column in df.columns:
+            values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            values = np.full(len(df), np.nan)
+        # + 0.0 sjednotí -0.0 a 0.0
+        canonical[column] = np.round(values, decimals) + 0.0
+    return pd.util.hash_pandas_object(pd.DataFrame(canonical), index=False).to_numpy()
+
+
+def normalize_trades(df):
+    """Normalizace obchodů - datumy, číselné P&L, odstranění neplatných řádků a otisk
+
+    Vrací (DataFrame, statistiky).
+    """
+    df = df.copy()
+    stats = {'rows_in': len(df)}
+
+    df['exitDate'], stats['exitDate'] = normalize_dates(df['exitDate'])
+    if 'entryDate' in df.columns:
+        df['entryDate'], stats['entryDate'] = normalize_dates(df['entryDate'])
+    with PERF.stage('numeric.coerce', rows=len(df)) as rec:
+        df['netPL'] = pd.to_numeric(df['netPL'], errors='coerce')
+        rec['nbytes'] = frame_bytes(df['netPL'])
+
+    df = df.dropna(subset=['exitDate', 'netPL', 'strategy'])
+    stats['rows_out'] = len(df)
+    # Otisk se počítá jednou při normalizaci a ukládá se s daty (snapshot, stav DiaryLoaderu)
+    with PERF.stage('dedup.fingerprint', rows=len(df)):
+        df['fingerprint'] = trade_fingerprints(df)
+    return df, stats
+
+
+# Mapování českých hlaviček Excelu na názvy sloupců
+EXCEL_COLUMN_MAP = {
+    'Systém': 'strategy',
+    'Symbol': 'ticker',
+    'Typ': 'possition',
+    'Datum': 'entryDate',
+    'Datum.1': 'exitDate',
+    'Počet': 'quantity',
+    'Cena': 'entryPrice',
+    'Cena.1': 'exitPrice',
+    '% změna': 'chg_percent',
+    'Komise': 'commission',
+    'Profit/Loss': 'netPL'
+}
+REQUIRED_COLUMNS = ['strategy', 'exitDate', 'netPL']
+
+# Paralelní parsování se vyplatí až od určitého počtu řádků
+PARALLEL_MIN_ROWS = 20000
+
+
+def _open_workbook(source):
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return openpyxl.load_workbook(source, read_only=True, data_only=True)
+
+
+def _sheet_header(row):
+    # Stejné pojmenování jako pandas: duplicity .1, .2 ..., prázdné jako "Unnamed: i"
+    header, seen = [], {}
+    for i, value in enumerate(row):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        header.append(name)
+    return header
+
+
+def _sheet_body(ws, header, column_map, sheet_name, source_prefix):
+    rows = [row for row in ws.iter_rows(min_row=2, values_only=True) if any(v is not None for v in row)]
+    df = pd.DataFrame.from_records(rows, columns=header)
+    unnamed = [col for col in df.columns if col.startswith('Unnamed: ') and df[col].isna().all()]
+    df = df.drop(columns=unnamed).rename(columns=column_map)
+    df['source'] = f'{source_prefix}{sheet_name}'
+    df['sheet_name'] = sheet_name
+    return df
+
+
+def _timed_sheet_body(ws, header, column_map, sheet_name, source_prefix):
+    # Čas se měří u parsování, ve workeru se vrací spolu s daty
+    started = time.perf_counter()
+    df = _sheet_body(ws, header, column_map, sheet_name, source_prefix)
+    return df, time.perf_counter() - started
+
+
+def _parse_sheet(source, sheet_name, header, column_map, source_prefix):
+    """Worker procesního poolu - otevře sešit a streamuje jeden sheet"""
+    wb = _open_workbook(source)
+    try:
+        return _timed_sheet_body(wb[sheet_name], header, column_map, sheet_name, source_prefix)
+    finally:
+        wb.close()
+
+
+def read_excel_trades(source, column_map=EXCEL_COLUMN_MAP, source_prefix='Excel-', max_workers=None):
+    """Načte obchody ze všech sheetů sešitu (cesta nebo bytes)
+
+    Sešit se otevře jednou v read-only režimu, o přijetí sheetu se
+    rozhoduje podle hlavičky ještě před čtením těla. Větší sešity se
+    parsují paralelně v procesním poolu, výsledek se spojí jedním concat.
+    Vrací (DataFrame, report po sheetech).
+    """
+    report, accepted = [], []
+    wb = _open_workbook(source)
+    order = wb.sheetnames
+    try:
+        for ws in wb.worksheets:
+            first = next(ws.iter_rows(max_row=1, values_only=True), None)
+            if not first or all(v is None for v in first):
+                report.append({'sheet': ws.title, 'status': 'prázdný', 'rows': 0})
+                continue
+            header = _sheet_header(first)
+            mapped = {column_map.get(col, col) for col in header}
+            missing = [col for col in REQUIRED_COLUMNS if col not in mapped]
+            if missing:
+                report.append({'sheet': ws.title, 'status': 'zamítnut', 'rows': 0, 'missing': missing})
+                continue
+            accepted.append((ws.title, header, max((ws.max_row or 1) - 1, 0)))
+
+        total_rows = sum(rows for _, _, rows in accepted)
+        workers = min(len(accepted), max_workers or os.cpu_count() or 1)
+        frames = {}
+        if workers > 1 and total_rows >= PARALLEL_MIN_ROWS:
+            # spawn - fork běžícího Streamlit serveru s vlákny není bezpečný
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                futures = {
+                    name: pool.submit(_parse_sheet, source, name, header, column_map, source_prefix)
+                    for name, header, _ in accepted
+                }
+                for name, future in futures.items():
+                    try:
+                        frames[name] = future.result()
+                    except Exception as e:
+                        frames[name] = e
+        else:
+            for name, header, _ in accepted:
+                try:
+                    frames[name] = _timed_sheet_body(wb[name], header, column_map, name, source_prefix)
+                except Exception as e:
+                    frames[name] = e
+    finally:
+        wb.close()
+
+    parsed = []
+    for name, result in frames.items():
+        if isinstance(result, Exception):
+            report.append({'sheet': name, 'status': 'chyba', 'rows': 0, 'error': str(result)})
+            continue
+        result, seconds = result
+        PERF.record('excel.sheet', seconds, rows=len(result), nbytes=frame_bytes(result), sheet=name)
+        if len(result) == 0:
+            report.append({'sheet': name, 'status': 'prázdný', 'rows': 0})
+        else:
+            report.append({'sheet': name, 'status': 'přijat', 'rows': len(result)})
+            parsed.append(result)
+    report.sort(key=lambda sheet: order.index(sheet['sheet']))
+
+    combined = pd.concat(parsed, ignore_index=True) if parsed else pd.DataFrame()
+    return combined, report
+
+
+# Typové schéma obchodů - textové sloupce s malou kardinalitou jako kategorie
+TRADE_SCHEMA = {
+    'strategy': 'category',
+    'ticker': 'category',
+    'source': 'category',
+    'sheet_name': 'category',
+    'possition': 'category',
+    'position': 'category',
+    'exitDate': 'datetime64[ns]',
+    'entryDate': 'datetime64[ns]',
+    'netPL': 'float64',
+    'entryPrice': 'float64',
+    'exitPrice': 'float64',
+    'commission': 'float64',
+    'quantity': 'float32',
+    'chg_percent': 'float32',
+}
+
+
+def apply_trade_schema(df):
+    """Převede známé sloupce na kompaktní typy podle TRADE_SCHEMA"""
+    df = df.copy()
+    for col, dtype in TRADE_SCHEMA.items():
+        if col not in df.columns:
+            continue
+        if dtype == 'category':
+            values = df[col].where(df[col].isna(), df[col].astype(str))
+            df[col] = values.astype('category').cat.remove_unused_categories()
+        elif dtype.startswith('datetime64'):
+            df[col] = pd.to_datetime(df[col], errors='coerce').astype(dtype)
+        else:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+    return df
+
+
+def index_by_exit_date(df):
+    """Seřadí obchody podle exitDate a nastaví z něj DatetimeIndex pro rychlé časové řezy"""
+    if not df['exitDate'].is_monotonic_increasing:
+        df = df.sort_values('exitDate', kind='stable')
+    df = df.copy(deep=False)
+    df.index = pd.DatetimeIndex(df['exitDate'].to_numpy())
+    return df
+
+
+def slice_by_exit_date(df, start=None, end=None):
+    """Obchody s exitDate v intervalu [start, end]
+
+    Nad seřazeným indexem z index_by_exit_date jde o binární vyhledání
+    hranic a řez bez kopie dat, jinak se použije maska.
+    """
+    if start is None and end is None:
+        return df
+    index = df.index
+    if isinstance(index, pd.DatetimeIndex) and index.is_monotonic_increasing:
+        lo = 0 if start is None else index.searchsorted(pd.Timestamp(start), 'left')
+        hi = len(index) if end is None else index.searchsorted(pd.Timestamp(end), 'right')
+        return df.iloc[lo:hi]
+
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df['exitDate'] >= start
+    if end is not None:
+        mask &= df['exitDate'] <= end
+    return df[mask]
+
+
+def memory_report(df):
+    """Paměť po sloupcích v MB (včetně obsahu stringů)"""
+    usage = df.memory_usage(deep=True, index=False)
+    return pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'MB': (usage / 1e6).round(3),
+    }).sort_values('MB', ascending=False)
+
+
+class TradeDeduplicator:
+    """Deduplikace obchodů napříč zdroji podle otisků z trade_fingerprints
+
+    Viděné otisky se drží jako seřazené pole uint64 s kódem zdroje, který
+    obchod přinesl jako první - pořadí načtení je priorita (deník před
+    Excelem). Řádek, jehož otisk patří jinému zdroji, se zahodí a započte
+    do překryvů; opakování v rámci jednoho zdroje zůstává (dva stejné
+    obchody v deníku jsou legitimní). Kontroluje se jen to, co přijde
+    do filter - už zpracované obchody se převezmou přes seed.
+    """
+
+    def __init__(self):
+        self._keys = np.empty(0, dtype=np.uint64)
+        self._owners = np.empty(0, dtype=np.int32)
+        self._sources = []
+        self.overlap = {}
+        self.dropped = 0
+
+    def seed(self, df, overlap=None):
+        """Převezme otisky už deduplikovaných obchodů (např. ze snapshotu) a dřívější překryvy"""
+        keys = df['fingerprint'].to_numpy(np.uint64)
+        _, first = np.unique(keys, return_index=True)
+        self._insert(keys[first], self._codes(df['source'])[first])
+        for source, owners in (overlap or {}).items():
+            counts = self.overlap.setdefault(source, {})
+            for owner, count in owners.items():
+                counts[owner] = counts.get(owner, 0) + count
+                self.dropped += count
+
+    def filter(self, df):
+        """Obchody bez překryvů s ostatními zdroji; otisky chybějící ve sloupci fingerprint se dopočítají"""
+        if df.empty:
+            return df
+        with PERF.stage('dedup', rows=len(df)) as rec:
+            keys = self._keys_of(df)
+            codes = self._codes(df['source'])
+
+            # Vlastník z dřívějších bloků, jinak první výskyt otisku v tomto bloku
+            known, previous = self._lookup(keys)
+            uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            owners = np.where(known, previous, codes[first][inverse])
+            keep = owners == codes
+
+            new = ~known[first]
+            self._insert(uniq[new], codes[first][new])
+            self._count(codes[~keep], owners[~keep])
+            rec['dropped'] = int((~keep).sum())
+        return df if keep.all() else df[keep]
+
+    def conflicts(self, df):
+        """Počet obchodů, jejichž otisk už patří jinému zdroji - filter by je zahodil"""
+        if df.empty:
+            return 0
+        known, previous = self._lookup(self._keys_of(df))
+        return int((known & (previous != self._codes(df['source']))).sum())
+
+    def frames(self, frames):
+        """Deduplikuje iteraci DataFrame bloků - pro streamované načtení"""
+        for frame in frames:
+            yield self.filter(frame)
+
+    @staticmethod
+    def _keys_of(df):
+        return df['fingerprint'].to_numpy(np.uint64) if 'fingerprint' in df.columns else trade_fingerprints(df)
+
+    def _lookup(self, keys):
+        # (je otisk známý, kód vlastníka nebo -1)
+        if len(self._keys) == 0:
+            return np.zeros(len(keys), dtype=bool), np.full(len(keys), -1, dtype=np.int32)
+        pos = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        known = self._keys[pos] == keys
+        return known, np.where(known, self._owners[pos], -1)
+
+    def _codes(self, sources):
+        labels, names = pd.factorize(sources.astype(str))
+        for name in names:
+            if name not in self._sources:
+                self._sources.append(name)
+        lookup = np.array([self._sources.index(name) for name in names], dtype=np.int32)
+        return lookup[labels] if len(lookup) else np.zeros(len(labels), dtype=np.int32)
+
+    def _insert(self, keys, owners):
+        # Zatřídění do seřazeného pole - O(n + m) místo nového řazení všeho
+        order = np.argsort(keys, kind='stable')
+        positions = np.searchsorted(self._keys, keys[order])
+        self._keys = np.insert(self._keys, positions, keys[order])
+        self._owners = np.insert(self._owners, positions, owners[order])
+
+    def _count(self, codes, owners):
+        if len(codes) == 0:
+            return
+        pairs, counts = np.unique(np.stack([codes, owners]), axis=1, return_counts=True)
+        for (code, owner), count in zip(pairs.T, counts):
+            source_counts = self.overlap.setdefault(self._sources[code], {})
+            source_counts[self._sources[owner]] = source_counts.get(self._sources[owner], 0) + int(count)
+        self.dropped += len(codes)
+
+
+def overlap_report(overlap):
+    """Překryvy zdrojů jako tabulka - zdroj, duplicitní se zdrojem, počet obchodů"""
+    rows = [
+        {'source': source, 'duplicate_of': owner, 'trades': count}
+        for source, owners in overlap.items() for owner, count in owners.items()
+    ]
+    return pd.DataFrame(rows, columns=['source', 'duplicate_of', 'trades'])
+
+
+# Dotaz na uzavřené obchody v tabulce diary
+DIARY_COLUMNS = """strategy, exitDate, "NetP/L" as netPL, entryDate, ticker,
+       quantity, entryPrice, exitPrice, commission"""
+DIARY_FILTER = 'exitDate IS NOT NULL AND "NetP/L" IS NOT NULL AND strategy IS NOT NULL'
+
+# Otisk historických řádků - textové sloupce přes kontrolní součet řádku (včetně rowid),
+# číselné přes součty vážené rowid. Změní se při editaci libovolného sloupce DIARY_COLUMNS,
+# prohození hodnot mezi řádky i smazání. Vestavěné TOTAL je řádově rychlejší než Python funkce.
+DIARY_NUMERIC_COLUMNS = ['"NetP/L"', 'quantity', 'entryPrice', 'exitPrice', 'commission']
+DIARY_FINGERPRINT = f"""
+SELECT COUNT(*), SUM(diary_row_hash(rowid, strategy, exitDate, entryDate, ticker)),
+       {', '.join(f'TOTAL(rowid * {column})' for column in DIARY_NUMERIC_COLUMNS)}
+FROM diary
+WHERE {DIARY_FILTER} AND rowid <= ? AND exitDate <= ?
+"""
+
+
+def _diary_row_hash(rowid, strategy, exit_date, entry_date, ticker):
+    return zlib.crc32(f'{rowid}\x1f{strategy}\x1f{exit_date}\x1f{entry_date}\x1f{ticker}'.encode('utf-8'))
+
+
+class DiaryLoader:
+    """Inkrementální načítání tabulky diary podle watermarku (rowid, exitDate)
+
+    Tradebook uzavřené obchody jen přidává, takže se dotahují jen řádky
+    za watermarkem a normalizuje se jen přírůstek. Pokud se změní otisk
+    už načtených řádků (editace, smazání), načte se vše znovu. Načtená
+    data se drží v kompaktních typech TRADE_SCHEMA.
+    """
+
+    def __init__(self, db_path, source='SQLite'):
+        self.db_path = db_path
+        self.source = source
+        self.frame = None
+        self.watermark = None
+        self.fingerprint = None
+        self.last_mode = None
+        self.last_new_rows = 0
+        self.last_new_frame = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Vrátí normalizovaná data, z databáze čte jen nové řádky"""
+        with self._lock:
+            conn = sqlite3.connect(self.db_path)
+            conn.create_function('diary_row_hash', 5, _diary_row_hash, deterministic=True)
+            try:
+                if self.frame is None or self._fingerprint(conn, self.watermark) != self.fingerprint:
+                    self._full_reload(conn)
+                else:
+                    self._append_new(conn)
+            finally:
+                conn.close()
+            return self.frame
+
+    def reset(self):
+        """Zahodí stav, další load načte vše znovu"""
+        with self._lock:
+            self.frame = None
+            self.watermark = None
+            self.fingerprint = None
+
+    def seed(self, frame, watermark, fingerprint):
+        """Převezme dříve uložený stav (např. ze snapshotu), další load ho jen ověří a doplní"""
+        with self._lock:
+            if self.frame is None:
+                self.frame = frame
+                self.watermark = tuple(watermark)
+                self.fingerprint = tuple(fingerprint)
+
+    def state(self):
+        """Watermark a otisk pro uložení vedle dat"""
+        return {'watermark': list(self.watermark), 'fingerprint': list(self.fingerprint)}
+
+    def _fingerprint(self, conn, watermark):
+        return tuple(conn.execute(DIARY_FINGERPRINT, watermark).fetchone())
+
+    def _read(self, conn, where='', params=()):
+        query = f"SELECT rowid AS _rowid, {DIARY_COLUMNS} FROM diary WHERE {DIARY_FILTER} {where}"
+        with PERF.stage('sqlite.query', mode='incremental' if where else 'full') as rec:
+            raw = pd.read_sql_query(query, conn, params=params)
+            rec['rows'], rec['nbytes'] = len(raw), frame_bytes(raw)
+        return raw
+
+    def _normalize(self, raw):
+        raw = raw.drop(columns='_rowid')
+        raw['source'] = self.source
+        df, _ = normalize_trades(raw)
+        return apply_trade_schema(df)
+
+    def _advance(self, conn, raw):
+        # Watermark se počítá ze surových hodnot, ne z normalizovaných datumů
+        if len(raw) > 0:
+            rowid, exit_date = self.watermark
+            self.watermark = (
+                max(rowid, int(raw['_rowid'].max())),
+                max(exit_date, str(raw['exitDate'].astype(str).max())),
+            )
+        self.fingerprint = self._fingerprint(conn, self.watermark)
+
+    def _full_reload(self, conn):
+        raw = self._read(conn)
+        self.watermark = (0, '')
+        self.frame = self._normalize(raw).sort_values('exitDate')
+        self._advance(conn, raw)
+        self.last_mode = 'full'
+        self.last_new_rows = len(raw)
+        self.last_new_frame = self.frame
+
+    def _append_new(self, conn):
+        raw = self._read(conn, 'AND (rowid > ? OR exitDate > ?)', self.watermark)
+        self.last_mode = 'incremental'
+        self.last_new_rows = len(raw)
+        self.last_new_frame = self.frame.iloc[:0]
+        if len(raw) == 0:
+            return
+        new_rows = self.last_new_frame = self._normalize(raw)
+        # Kategorie starých a nových řádků se liší - concat vrátí object, schéma se použije znovu
+        self.frame = apply_trade_schema(pd.concat([self.frame, new_rows], ignore_index=True)).sort_values('exitDate')
+        self._advance(conn, raw)
+
+
+def iter_diary_chunks(db_path, chunk_rows=100_000, source='SQLite'):
+    """Normalizované obchody z diary po blocích chunk_rows řádků
+
+    V paměti je vždy jen jeden blok - pro zpracování tradebooků,
+    které se celé do procesu nevejdou.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        query = f"SELECT {DIARY_COLUMNS} FROM diary WHERE {DIARY_FILTER}"
+        started = time.perf_counter()
+        for raw in pd.read_sql_query(query, conn, chunksize=chunk_rows):
+            PERF.record('sqlite.chunk', time.perf_counter() - started, rows=len(raw), nbytes=frame_bytes(raw))
+            raw['source'] = source
+            df, _ = normalize_trades(raw)
+            yield df
+            started = time.perf_counter()
+    finally:
+        conn.close()
+
+
+def _hash_file(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path, known=None):
+    """Otisk souboru - velikost, mtime a hash obsahu
+
+    Hash se přepočítá jen pokud se velikost nebo mtime liší od known.
+    Pro neexistující soubor vrací None.
+    """
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+        fingerprint['hash'] = known['hash']
+    else:
+        fingerprint['hash'] = _hash_file(path)
+    return fingerprint
+
+
+def _same_content(a, b):
+    if a is None or b is None:
+        return a is b
+    return a['size'] == b['size'] and a['hash'] == b['hash']
+
+
+class TradeSnapshot:
+    """Lokální Parquet snapshot normalizovaných obchodů klíčovaný otisky zdrojů
+
+    Snapshot je platný, dokud mají všechny zdrojové soubory stejnou
+    velikost a hash obsahu. Samotná změna mtime vede jen k přepočtu hashe.
+    """
+
+    def __init__(self, cache_dir, sources, name='trades'):
+        self.sources = sources
+        self.data_path = os.path.join(cache_dir, f'{name}.parquet')
+        self.manifest_path = os.path.join(cache_dir, f'{name}.json')
+        self.manifest = self._read_manifest()
+        self.fingerprints = {
+            key: file_fingerprint(path, self.manifest.get('sources', {}).get(key))
+            for key, path in sources.items()
+        }
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def is_valid(self):
+        """Odpovídá snapshot aktuálním zdrojům?"""
+        stored = self.manifest.get('sources')
+        if not stored or not os.path.exists(self.data_path):
+            return False
+        return all(_same_content(stored.get(key), fp) for key, fp in self.fingerprints.items())
+
+    def source_unchanged(self, key):
+        """Má daný zdroj stejný obsah jako při uložení snapshotu?"""
+        stored = self.manifest.get('sources', {})
+        return key in stored and _same_content(stored[key], self.fingerprints[key])
+
+    def load(self, stale_ok=False):
+        """Načte snapshot; neplatný vrací jen se stale_ok=True, jinak None"""
+        if not (self.is_valid() or (stale_ok and os.path.exists(self.data_path))):
+            return None
+        try:
+            return pd.read_parquet(self.data_path)
+        except Exception:
+            return None
+
+    def save(self, df, extra=None):
+        """Atomicky uloží data a manifest s otisky zdrojů"""
+        os.makedirs(os.path.dirname(self.data_path), exist_ok=True)
+        tmp_path = self.data_path + '.tmp'
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.data_path)
+
+        self.manifest = {'sources': self.fingerprints, **(extra or {})}
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+
+# Lokální SQL kopie obchodů - datumy jako celé číslo ns od epochy, dny jako dny od epochy
+DAY_NS = 86_400_000_000_000
+MIRROR_COLUMNS = ['strategy', 'exitDate', 'netPL', 'ticker', 'source']
+
+MIRROR_SCHEMA = f"""
+CREATE TABLE trades AS SELECT * FROM staging ORDER BY exitDate;
+CREATE INDEX trades_exit ON trades (exitDate);
+CREATE INDEX trades_strategy_exit ON trades (strategy, exitDate);
+CREATE TABLE daily AS
+SELECT strategy, exitDate / {DAY_NS} AS day,
+       TOTAL(netPL) AS pl, COUNT(*) AS trades,
+       SUM(netPL > 0) AS wins, SUM(netPL < 0) AS losses,
+       TOTAL(CASE WHEN netPL > 0 THEN netPL END) AS gross_profit,
+       TOTAL(CASE WHEN netPL < 0 THEN netPL END) AS gross_loss
+FROM trades GROUP BY strategy, day;
+CREATE INDEX daily_day ON daily (day, strategy);
+DROP TABLE staging;
+"""
+
+
+class TradeMirror:
+    """Indexovaná lokální SQLite kopie obchodů s denními agregacemi
+
+    Tabulka trades (normalizované obchody seřazené podle exitDate) má
+    indexy (exitDate) a (strategy, exitDate), tabulka daily drží součty
+    po (strategie, den) se stejnými poli jako TradeCube. Časový
+    a strategický filtr se vyhodnotí v SQL a do procesu se načtou jen
+    denní agregace nebo omezený výběr obchodů. Kopie se přestaví, když
+    se změní obsah některého zdroje.
+    """
+
+    def __init__(self, path, sources):
+        self.path = path
+        self.sources = sources
+
+    def is_current(self):
+        """Odpovídá kopie aktuálním zdrojům?"""
+        stored = self.summary().get('sources', {})
+        for key, path in self.sources.items():
+            if key not in stored or not _same_content(stored[key], file_fingerprint(path, stored[key])):
+                return False
+        return True
+
+    def rebuild(self, frames, extra=None):
+        """Atomicky přestaví kopii z normalizovaných obchodů (iterace DataFrame bloků)
+
+        extra se uloží do souhrnu - musí být serializovatelné do JSON a
+        vyhodnotí se až po průchodu bloky (např. překryvy deduplikace).
+        """
+        # Otisky se berou před čtením - změna během přestavby se zachytí příště
+        stored = self.summary().get('sources', {})
+        fingerprints = {key: file_fingerprint(path, stored.get(key)) for key, path in self.sources.items()}
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        started = time.perf_counter()
+        try:
+            conn.execute(
+                "CREATE TABLE staging (strategy TEXT, exitDate INTEGER, netPL REAL, ticker TEXT, source TEXT)"
+            )
+            for frame in frames:
+                if frame.empty:
+                    continue
+                chunk = frame.reindex(columns=MIRROR_COLUMNS).astype({'strategy': str, 'source': str})
+                chunk['exitDate'] = chunk['exitDate'].to_numpy('datetime64[ns]').astype(np.int64)
+                chunk['ticker'] = chunk['ticker'].astype(object).where(chunk['ticker'].notna(), None)
+                conn.executemany(
+                    "INSERT INTO staging VALUES (?, ?, ?, ?, ?)", chunk.itertuples(index=False, name=None)
+                )
+            conn.executescript(MIRROR_SCHEMA)
+
+            row = conn.execute("SELECT COUNT(*), MIN(exitDate), MAX(exitDate) FROM trades").fetchone()
+            summary = {
+                'sources': fingerprints,
+                'rows': row[0],
+                'first': row[1],
+                'last': row[2],
+                'by_source': dict(conn.execute("SELECT source, COUNT(*) FROM trades GROUP BY source")),
+                **(extra or {}),
+            }
+            conn.execute("CREATE TABLE meta (summary TEXT)")
+            conn.execute("INSERT INTO meta VALUES (?)", (json.dumps(summary),))
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, self.path)
+        PERF.record('mirror.rebuild', time.perf_counter() - started, rows=summary['rows'],
+                    nbytes=os.path.getsize(self.path))
+
+    def summary(self):
+        """Počty řádků po zdrojích, rozsah exitDate (ns) a otisky zdrojů; prázdné bez kopie"""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            conn = self._connect()
+            try:
+                return json.loads(conn.execute("SELECT summary FROM meta").fetchone()[0])
+            finally:
+                conn.close()
+        except (sqlite3.Error, TypeError, ValueError):
+            return {}
+
+    def strategies(self):
+        """Strategie v pořadí prvního obchodu"""
+        return [name for name, in self._query(
+            "SELECT strategy FROM daily GROUP BY strategy ORDER BY MIN(day), strategy"
+        )]
+
+    def daily(self, start=None, end=None, strategies=None):
+        """Denní součty po strategiích v řezu - sloupce strategy, day + pole TradeCube"""
+        where, params = self._where('day', self._day(start, ceil=True), self._day(end), strategies)
+        conn = self._connect()
+        try:
+            with PERF.stage('mirror.daily') as rec:
+                daily = pd.read_sql_query(
+                    f"SELECT strategy, day, pl, trades, wins, losses, gross_profit, gross_loss FROM daily {where}",
+                    conn, params=params
+                )
+                rec['rows'], rec['nbytes'] = len(daily), frame_bytes(daily)
+        finally:
+            conn.close()
+        return daily
+
+    def trade_points(self, start=None, end=None, strategies=None, point_budget=4000):
+        """Obchody v řezu (exitDate, netPL) omezené na point_budget bodů
+
+        Nad rozpočtem se v SQL vybere min-max (M4) vzorek stejně jako
+        v downsample_minmax - z každého časového sloupce první, poslední,
+        minimální a maximální obchod.
+        """
+        lo = None if start is None else pd.Timestamp(start).value
+        hi = None if end is None else pd.Timestamp(end).value
+        where, params = self._where('exitDate', lo, hi, strategies)
+        conn = self._connect()
+        started = time.perf_counter()
+        try:
+            count, first, last = conn.execute(
+                f"SELECT COUNT(*), MIN(exitDate), MAX(exitDate) FROM trades {where}", params
+            ).fetchone()
+            if count <= point_budget:
+                query = f"SELECT exitDate, netPL FROM trades {where} ORDER BY rowid"
+            else:
+                buckets = max(point_budget // 4, 1)
+                span = max(last - first, 1)
+                query = f"""
+                WITH t AS (
+                    SELECT rowid AS rid, exitDate, netPL,
+                           MIN(CAST((exitDate - {first}) * 1.0 / {span} * {buckets} AS INTEGER), {buckets - 1}) AS bucket
+                    FROM trades {where}
+                )
+                SELECT exitDate, netPL FROM t WHERE rid IN (
+                    SELECT MIN(rid) FROM t GROUP BY bucket
+                    UNION SELECT MAX(rid) FROM t GROUP BY bucket
+                    UNION SELECT rid FROM (SELECT rid, MIN(netPL) FROM t GROUP BY bucket)
+                    UNION SELECT rid FROM (SELECT rid, MAX(netPL) FROM t GROUP BY bucket)
+                )
+                ORDER BY rid
+                """
+            points = pd.read_sql_query(query, conn, params=params)
+        finally:
+            conn.close()
+        points['exitDate'] = pd.to_datetime(points['exitDate'].astype(np.int64), unit='ns')
+        PERF.record('mirror.points', time.perf_counter() - started, rows=len(points), nbytes=frame_bytes(points),
+                    matched=count)
+        return points
+
+    def _connect(self):
+        return sqlite3.connect(f"{pathlib.Path(self.path).resolve().as_uri()}?mode=ro", uri=True)
+
+    def _query(self, query, params=()):
+        conn = self._connect()
+        try:
+            return conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _day(ts, ceil=False):
+        # Začátek uprostřed dne se zaokrouhlí nahoru - neúplný první den se nezapočte (jako TradeCube.slice)
+        if ts is None:
+            return None
+        value = pd.Timestamp(ts).value
+        return -(-value // DAY_NS) if ceil else value // DAY_NS
+
+    @staticmethod
+    def _where(column, lo, hi, strategies):
+        conditions, params = [], []
+        if lo is not None:
+            conditions.append(f"{column} >= ?")
+            params.append(int(lo))
+        if hi is not None:
+            conditions.append(f"{column} <= ?")
+            params.append(int(hi))
+        if strategies is not None:
+            conditions.append(f"strategy IN ({', '.join('?' * len(strategies))})")
+            params.extend(strategies)
+        return ('WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+
+# Odložené obchody streamovaného načtení - jedna row group parquetu na blok
+SPOOL_COLUMNS = ['strategy', 'exitDate', 'netPL', 'source']
+
+
+class TradeSpool:
+    """Normalizované obchody odložené po blocích do parquet souboru
+
+    Zápis drží v paměti jen aktuální blok. Každý blok je jedna row
+    group se statistikami min/max, výběr řezu proto čte jen row groups,
+    které do něj zasahují - obchody se načítají až pro pohled, který je
+    potřebuje, a jen ve výběru.
+    """
+
+    SCHEMA = pa.schema([
+        ('strategy', pa.string()),
+        ('exitDate', pa.timestamp('ns')),
+        ('netPL', pa.float64()),
+        ('source', pa.string()),
+    ])
+
+    def __init__(self, path):
+        self.path = path
+
+    def rebuild(self, frames):
+        """Atomicky přepíše soubor bloky z iterace DataFrame - vrací počet řádků"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        rows = 0
+        started = time.perf_counter()
+        with pq.ParquetWriter(tmp_path, self.SCHEMA) as writer:
+            for frame in frames:
+                if frame.empty:
+                    continue
+                chunk = frame.reindex(columns=SPOOL_COLUMNS).astype({'strategy': str, 'source': str})
+                writer.write_table(pa.Table.from_pandas(chunk, schema=self.SCHEMA, preserve_index=False))
+                rows += len(chunk)
+        os.replace(tmp_path, self.path)
+        PERF.record('spool.rebuild', time.perf_counter() - started, rows=rows, nbytes=os.path.getsize(self.path))
+        return rows
+
+    def select(self, start=None, end=None, strategies=None):
+        """Obchody v řezu seřazené podle exitDate - sloupce SPOOL_COLUMNS"""
+        # Prázdný výběr strategií - pyarrow filtr 'in' s prázdným seznamem odmítne
+        if strategies is not None and len(strategies) == 0:
+            return apply_trade_schema(pd.DataFrame(columns=SPOOL_COLUMNS))
+        filters = []
+        if start is not None:
+            filters.append(('exitDate', '>=', pd.Timestamp(start)))
+        if end is not None:
+            filters.append(('exitDate', '<=', pd.Timestamp(end)))
+        if strategies is not None:
+            filters.append(('strategy', 'in', list(strategies)))
+        with PERF.stage('spool.select') as rec:
+            df = pd.read_parquet(self.path, filters=filters or None)
+            df = df.sort_values('exitDate', kind='stable', ignore_index=True)
+            rec['rows'], rec['nbytes'] = len(df), frame_bytes(df)
+        return df
+
+
+class BackgroundRefresher:
+    """Aktuální verze dat s přestavbou na pozadí při změně zdrojových souborů
+
+    Změna se detekuje levně přes velikost a mtime (nejvýše jednou za
+    check_interval sekund), přestavba běží ve vlákně a nová verze se
+    vymění atomicky. Čtenáři tak vždy dostanou hotová data, na přestavbu
+    se čeká jen při úplně prvním načtení.
+    """
+
+    def __init__(self, build, sources, check_interval=5.0):
+        self.build = build
+        self.sources = sources
+        self.check_interval = check_interval
+        self.built_at = None
+        self.last_error = None
+        self._current = None
+        self._worker = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Vrátí (data, verze) - při změně zdrojů spustí přestavbu na pozadí"""
+        current = self._current
+        if current is None:
+            with self._lock:
+                if self._current is None:
+                    self._rebuild(self._stamps())
+            return self._current[:2]
+
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            stamps = self._stamps()
+            if stamps != current[2]:
+                self._start(stamps)
+        return current[:2]
+
+    @property
+    def is_refreshing(self):
+        """Běží právě přestavba na pozadí?"""
+        return self._worker is not None and self._worker.is_alive()
+
+    def _stamps(self):
+        stamps = {}
+        for key, path in self.sources.items():
+            try:
+                stat = os.stat(path)
+                stamps[key] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                stamps[key] = None
+        return stamps
+
+    def _start(self, stamps):
+        with self._lock:
+            if self.is_refreshing:
+                return
+            self._worker = threading.Thread(
+                target=self._run, args=(stamps,), name='trade-data-refresh', daemon=True
+            )
+            self._worker.start()
+
+    def _run(self, stamps):
+        try:
+            self._rebuild(stamps)
+        except Exception as e:
+            # Stará verze zůstává, při další kontrole se přestavba zkusí znovu
+            self.last_error = str(e)
+
+    def _rebuild(self, stamps):
+        # Otisky se berou před sestavením - změna během přestavby se zachytí příště
+        data = self.build()
+        version = self._current[1] + 1 if self._current else 1
+        self._current = (data, version, stamps)
+        self.built_at = datetime.now()
+        self.last_error = None
@@ -0,0 +1,354 @@
+"""
+Trade Remote - stahování vzdálených zdrojů
+==========================================
+Streamované stahování do dočasného (spool) souboru s pevným stropem
+paměti - v RAM je vždy nejvýš jeden blok - a obsahově adresovaná cache
+stažených souborů s podmíněnou revalidací. Zdroje se stahují souběžně
+přes sdílený pool HTTP spojení. Modul nezávisí na Streamlitu.
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+SNIFF_BYTES = 512
+
+SQLITE_MAGIC = b'SQLite format 3'
+SQLITE_IN_MEMORY_MAX = 512 << 20
+
+HTTP_TIMEOUT = (10, 60)  # s, (spojení, čtení mezi bloky)
+HTTP_RETRIES = 4
+HTTP_BACKOFF = 0.5  # s, čekání 0.5, 1, 2, 4 ...
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+HTTP_POOL_HOSTS = 8
+HTTP_POOL_PER_HOST = 4
+
+
+class HttpPool:
+    """Sdílený pool HTTP spojení s opakováním a exponenciálním backoffem
+
+    Spojení (a TLS handshake) se drží mezi požadavky i mezi session
+    Streamlitu, na jeden host je nejvýš per_host souběžných spojení.
+    Přechodné chyby (výpadek spojení, 429, 5xx) se u GET/HEAD zopakují
+    až retries-krát s rostoucí pauzou, Retry-After serveru se respektuje.
+    """
+
+    def __init__(self, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF, hosts=HTTP_POOL_HOSTS,
+                 per_host=HTTP_POOL_PER_HOST):
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=HTTP_RETRY_STATUSES,
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            raise_on_status=False,
+        )
+        self.adapter = HTTPAdapter(
+            max_retries=retry, pool_connections=hosts, pool_maxsize=per_host, pool_block=True
+        )
+
+    def session(self):
+        """Nová session nad sdíleným poolem - vlastní cookies, společná spojení
+
+        Session se nezavírá (close() by zavřel i sdílený pool), stačí ji zahodit.
+        """
+        session = requests.Session()
+        session.mount('https://', self.adapter)
+        session.mount('http://', self.adapter)
+        return session
+
+
+HTTP_POOL = HttpPool()
+
+
+def is_html(head):
+    """Začátek souboru vypadá jako HTML stránka (chybová / varovná stránka místo souboru)"""
+    return head.startswith(b'<!DOCTYPE') or b'<html' in head[:500]
+
+
+def content_length(response):
+    """Velikost těla z hlavičky Content-Length, None pokud ji server neposlal"""
+    value = response.headers.get('Content-Length')
+    return int(value) if value and value.isdigit() else None
+
+
+class Download:
+    """Stažený soubor uložený ve spool souboru na disku
+
+    head drží prvních SNIFF_BYTES bajtů pro rozpoznání formátu, digest
+    hash obsahu. Dočasný soubor se smaže v close() nebo na konci bloku
+    with, soubor z cache (temporary=False) zůstává. stale označuje kopii
+    z cache použitou bez revalidace, protože server byl nedostupný.
+    """
+
+    def __init__(self, path, head, size, digest=None, temporary=True, fetched_at=None, from_cache=False,
+                 stale=False):
+        self.path = path
+        self.head = head
+        self.size = size
+        self.digest = digest
+        self.temporary = temporary
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+        self.from_cache = from_cache
+        self.stale = stale
+
+    def read_bytes(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def close(self):
+        if not self.temporary:
+            return
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def spool_chunks(chunks, total=None, progress=None, suffix='.part', spool_dir=None):
+    """Zapíše bloky po jednom do spool souboru a vrátí Download
+
+    progress(staženo, celkem) se volá po každém bloku, celkem je
+    None, pokud velikost není známá. Přípona suffix je pro čtečky, které
+    rozlišují formát podle názvu (openpyxl). Při chybě se soubor smaže.
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=spool_dir)
+    head, size = b'', 0
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if len(head) < SNIFF_BYTES:
+                    head += chunk[:SNIFF_BYTES - len(head)]
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+                if progress is not None:
+                    progress(size, total)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return Download(path, head, size, digest.hexdigest())
+
+
+def open_sqlite(download, in_memory_max=SQLITE_IN_MEMORY_MAX):
+    """Otevře stažený SQLite soubor jen pro čtení
+
+    Soubor do in_memory_max se načte jedním sekvenčním čtením jako
+    paměťová databáze (Connection.deserialize), dotazy pak nesahají na
+    disk; databáze ve WAL režimu se přepne na rollback journal. Větší
+    soubor se otevře read-only jako immutable s mmap celého souboru,
+    takže se stránky nečtou po jedné přes read().
+    """
+    if download.size <= in_memory_max:
+        data = bytearray(download.read_bytes())
+        # WAL databáze (verze zápisu / čtení 2 v bajtech 18-19 hlavičky) deserialize odmítne -
+        # kopie bez -wal souboru je konzistentní jen s hlavním souborem, takže jde o rollback journal
+        if data[18:20] == b'\x02\x02':
+            data[18:20] = b'\x01\x01'
+        conn = sqlite3.connect(':memory:')
+        try:
+            conn.deserialize(data)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    uri = f"{pathlib.Path(download.path).resolve().as_uri()}?mode=ro&immutable=1"
+    conn = sqlite3.connect(uri, uri=True)
+    conn.execute(f"PRAGMA mmap_size={download.size}")
+    return conn
+
+
+class DownloadCache:
+    """Obsahově adresovaná cache stažených souborů s revalidací
+
+    Soubory leží v blobs/ pod hashem obsahu (stejný obsah pod více klíči
+    je uložen jednou), index.json mapuje klíč (file ID / URL) na blob
+    a validátory ETag / Last-Modified pro podmíněný GET. Celková velikost
+    je omezená max_bytes, vyřazují se nejdéle nepoužité klíče. Instance
+    je bezpečná pro sdílení mezi vlákny.
+    """
+
+    def __init__(self, cache_dir, max_bytes=1 << 30):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, 'blobs')
+        self.spool_dir = os.path.join(cache_dir, 'spool')
+        self.max_bytes = max_bytes
+        self._index_path = os.path.join(cache_dir, 'index.json')
+        self._lock = threading.Lock()
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._index = self._read_index()
+
+    def validators(self, key):
+        """Hlavičky If-None-Match / If-Modified-Since pro klíč, prázdné bez platné položky"""
+        with self._lock:
+            entry = self._index.get(key)
+        if entry is None or not os.path.exists(self._blob_path(entry['blob'])):
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def hit(self, key, stale=False):
+        """Uložený soubor po odpovědi 304 Not Modified"""
+        with self._lock:
+            entry = self._index[key]
+            entry['used_at'] = time.time()
+            self._write_index()
+        path = self._blob_path(entry['blob'])
+        with open(path, 'rb') as f:
+            head = f.read(SNIFF_BYTES)
+        return Download(path, head, entry['size'], os.path.splitext(entry['blob'])[0], temporary=False,
+                        fetched_at=entry['fetched_at'], from_cache=True, stale=stale)
+
+    def fallback(self, key):
+        """Poslední uložená kopie bez revalidace (server nedostupný), None pokud v cache není"""
+        with self._lock:
+            entry = self._index.get(key)
+        if entry is None or not os.path.exists(self._blob_path(entry['blob'])):
+            return None
+        return self.hit(key, stale=True)
+
+    def store(self, key, download, headers):
+        """Přesune stažený spool soubor do cache a vrátí Download ukazující do ní"""
+        # Přípona zůstává kvůli čtečkám, které podle ní rozlišují formát
+        blob = download.digest + os.path.splitext(download.path)[1]
+        path = self._blob_path(blob)
+        if os.path.exists(path):
+            download.close()
+        else:
+            os.replace(download.path, path)
+
+        now = time.time()
+        with self._lock:
+            self._index[key] = {
+                'blob': blob,
+                'size': download.size,
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'fetched_at': now,
+                'used_at': now,
+            }
+            self._evict(keep=key)
+            self._write_index()
+        return Download(path, download.head, download.size, download.digest, temporary=False, fetched_at=now)
+
+    def stats(self):
+        """Počet klíčů a obsazené místo"""
+        with self._lock:
+            blobs = {entry['blob']: entry['size'] for entry in self._index.values()}
+            return {'entries': len(self._index), 'files': len(blobs), 'MB': sum(blobs.values()) / 1e6}
+
+    def _blob_path(self, blob):
+        return os.path.join(self.blob_dir, blob)
+
+    def _read_index(self):
+        try:
+            with open(self._index_path, encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {key: entry for key, entry in index.items() if os.path.exists(self._blob_path(entry['blob']))}
+
+    def _write_index(self):
+        tmp_path = self._index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+
+    def _evict(self, keep):
+        blobs = {entry['blob']: entry['size'] for entry in self._index.values()}
+        total = sum(blobs.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]['used_at']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            blob = self._index.pop(key)['blob']
+            if any(entry['blob'] == blob for entry in self._index.values()):
+                continue
+            try:
+                os.unlink(self._blob_path(blob))
+            except OSError:
+                pass
+            total -= blobs[blob]
+
+
+def run_sources(jobs, timeouts, on_tick=None, poll_interval=0.25):
+    """Spustí načtení zdrojů souběžně ve vláknech a počká na všechny
+
+    jobs mapuje název zdroje na funkci job(progress), progress(staženo,
+    celkem) předává dál stahování. Každý zdroj má vlastní časový limit
+    v sekundách (timeouts[název]) a uspěje nebo selže samostatně.
+    Limit platí pro celý job včetně navazování spojení, opakování
+    a zpracování - po jeho uplynutí se zdroj hned ohlásí jako
+    TimeoutError, na vlákno se nečeká a stahování se přeruší u dalšího bloku.
+
+    on_tick({název: (staženo, celkem)}) se volá z volajícího vlákna
+    každých poll_interval sekund - tam lze bezpečně kreslit průběh.
+    Vrací {název: (výsledek, None)} nebo {název: (None, výjimka)}.
+    """
+    state = {name: (0, None) for name in jobs}
+    cancelled = {name: threading.Event() for name in jobs}
+
+    def progress_for(name):
+        def update(done, total):
+            if cancelled[name].is_set():
+                raise TimeoutError(f"překročen časový limit {timeouts[name]} s")
+            state[name] = (done, total)
+        return update
+
+    start = time.monotonic()
+    deadlines = {name: start + timeouts[name] for name in jobs}
+    pool = ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix='source')
+    futures = {pool.submit(job, progress_for(name)): name for name, job in jobs.items()}
+    results = {}
+    pending = set(futures)
+    try:
+        while pending:
+            # Probudí se nejpozději v nejbližším termínu, aby se limit neprodloužil o poll_interval
+            nearest = min(deadlines[futures[future]] for future in pending)
+            done, pending = wait(pending, timeout=max(0, min(poll_interval, nearest - time.monotonic())))
+            for future in done:
+                name = futures[future]
+                try:
+                    results[name] = (future.result(), None)
+                except Exception as e:
+                    results[name] = (None, e)
+            if on_tick is not None:
+                on_tick(dict(state))
+
+            now = time.monotonic()
+            for future in list(pending):
+                name = futures[future]
+                if now >= deadlines[name]:
+                    cancelled[name].set()
+                    results[name] = (None, TimeoutError(f"překročen časový limit {timeouts[name]} s"))
+                    pending.discard(future)
+    finally:
+        # Vlákna po limitu se nečekají, skončí sama u dalšího bloku
+        pool.shutdown(wait=False, cancel_futures=True)
+    return {name: results[name] for name in jobs}
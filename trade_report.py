@@ -0,0 +1,258 @@
+"""
+Trade Report - dávkový report z příkazové řádky
+===============================================
+Stejné načtení, časové filtry, metriky a grafy jako trading_dashboard.py
+(sdílené v trade_views.py), ale bez Streamlitu - pro noční reporty.
+Grafy strategií se vykreslují paralelně v procesním poolu, výstupem je
+statický balík: index.html (funguje offline, plotly.js je přiložený),
+report.json s metrikami a tabulkou strategií a figures/*.json
+s jednotlivými grafy.
+
+Spuštění: python trade_report.py [--period "YTD"] [--output report] [--strategy NÁZEV ...]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from html import escape
+
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+import trade_views as views
+from trade_analytics import ROLLING_WINDOWS, TradeCube, grouped_metrics
+from trade_perf import PERF
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="cs">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="plotly.min.js"></script>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; margin-bottom: 1.5em; }}
+th, td {{ padding: 4px 12px; border-bottom: 1px solid #ddd; text-align: right; }}
+th:first-child, td:first-child {{ text-align: left; }}
+.row {{ display: flex; flex-wrap: wrap; }}
+.row > div {{ flex: 1 1 600px; }}
+</style>
+</head>
+<body>
+<h1>📊 {title}</h1>
+<p>{subtitle}</p>
+{body}
+</body>
+</html>
+"""
+
+
+def figure_parts(fig, name):
+    """HTML fragment (bez plotly.js) a JSON grafu pro balík reportu"""
+    return {
+        'name': name,
+        'html': pio.to_html(fig, full_html=False, include_plotlyjs=False, div_id=name),
+        'json': fig.to_json(),
+    }
+
+
+def render_strategy(name, strategy, trades, cube):
+    """Grafy jedné strategie jako v záložce Grafy - worker procesního poolu"""
+    return [
+        figure_parts(views.create_cumulative_chart(trades, f"Kumulativní - {strategy}"), f"{name}_cumulative"),
+        figure_parts(views.create_individual_chart(trades, f"Obchody - {strategy}"), f"{name}_individual"),
+        figure_parts(views.create_monthly_heatmap(cube, f"Heat mapa - {strategy}"), f"{name}_heatmap"),
+    ]
+
+
+def render_strategies(jobs, workers):
+    """Grafy všech strategií - paralelně v procesním poolu, pro jednu strategii nebo worker sériově"""
+    if workers > 1 and len(jobs) > 1:
+        # spawn - stejně jako při čtení Excelu, fork procesu s vlákny není bezpečný
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=context) as pool:
+            futures = [pool.submit(render_strategy, *job) for job in jobs]
+            return [future.result() for future in futures]
+    return [render_strategy(*job) for job in jobs]
+
+
+def figure_name(index, strategy):
+    """Bezpečný název souboru / id grafu strategie"""
+    return f"s{index:03d}_{re.sub(r'[^0-9A-Za-z_-]+', '_', strategy).strip('_')}"
+
+
+def build_report(db_path, excel_path, cache_dir, period, start_date=None, end_date=None, strategies=None,
+                 workers=None, rolling_window=60):
+    """Spočítá report - vrací slovník s metrikami, tabulkou a grafy, None bez dat
+
+    Zdroje jsou db_path a excel_path, snapshot normalizovaných dat se drží v cache_dir.
+    """
+    df = views.load_combined_data(db_path, excel_path, cache_dir)
+    if df.empty:
+        return None
+
+    start_ts, end_ts = views.time_filter_bounds(period, start_date, end_date)
+    all_strategies = list(df['strategy'].unique())
+    selected = [s for s in all_strategies if s in strategies] if strategies else all_strategies
+
+    with PERF.stage('filter', mode='report') as rec:
+        cube = TradeCube.from_trades(df).slice(start_ts, end_ts, selected)
+        filtered = views.filter_by_time(df, period, start_date, end_date)
+        if len(selected) < len(all_strategies):
+            filtered = filtered[filtered['strategy'].isin(selected)]
+        rec['rows'] = len(filtered)
+
+    with PERF.stage('metrics', rows=len(filtered)):
+        metrics = cube.metrics(views.INITIAL_CAPITAL)
+        table = grouped_metrics(filtered, views.INITIAL_CAPITAL)
+
+    with PERF.stage('report.overview'):
+        overview = [
+            figure_parts(views.create_cumulative_chart(cube.daily()), 'cumulative'),
+            figure_parts(views.create_individual_chart(filtered), 'individual'),
+            figure_parts(views.create_strategy_chart(cube.strategy_totals()), 'strategy'),
+            figure_parts(views.create_monthly_heatmap(cube), 'monthly_heatmap'),
+            figure_parts(views.create_strategy_monthly_heatmap(cube), 'strategy_monthly_heatmap'),
+            figure_parts(views.create_rolling_chart(
+                cube.rolling(rolling_window), title=f"Klouzavé metriky portfolia ({rolling_window} dní)"
+            ), 'rolling'),
+        ]
+
+    # Jen strategie s obchody v období, stejně jako tabulka strategií
+    trades_by_strategy = dict(tuple(filtered.groupby('strategy', observed=True, sort=False)))
+    active = [s for s in selected if s in trades_by_strategy]
+    jobs = [
+        (figure_name(i, strategy), strategy, trades_by_strategy[strategy], cube.slice(strategies=[strategy]))
+        for i, strategy in enumerate(active)
+    ]
+    with PERF.stage('report.strategies', rows=len(jobs)):
+        strategy_figures = dict(zip(active, render_strategies(jobs, workers or os.cpu_count() or 1)))
+
+    return {
+        'period': period,
+        'start': None if start_ts is None else start_ts.isoformat(),
+        'end': None if end_ts is None else end_ts.isoformat(),
+        'rows': len(filtered),
+        'metrics': metrics,
+        'table': table,
+        'overview': overview,
+        'strategy_figures': strategy_figures,
+    }
+
+
+def _json_default(value):
+    # numpy skaláry (int64, float64) a časy
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+def metrics_table(metrics):
+    """Souhrnné metriky jako karty dashboardu - dvojice (název, hodnota)"""
+    return [
+        ("💰 Total P&L", f"${metrics.get('total_pl', 0):,.2f}"),
+        ("📈 Výkonnost", f"{metrics.get('total_pl_percent', 0):.2f}%"),
+        ("📊 Kapitál", f"${metrics.get('total_capital', views.INITIAL_CAPITAL):,.2f}"),
+        ("🎯 Win Rate", f"{metrics.get('win_rate', 0):.1f}% "
+                       f"({metrics.get('winning_trades', 0)}/{metrics.get('total_trades', 0)})"),
+        ("📉 Max DD", f"${metrics.get('max_drawdown', 0):,.2f}"),
+        ("Profit Factor", f"{metrics.get('profit_factor', 0):.2f}"),
+    ]
+
+
+def write_bundle(report, output):
+    """Zapíše index.html, report.json, plotly.min.js a figures/*.json do adresáře output"""
+    figures_dir = os.path.join(output, 'figures')
+    os.makedirs(figures_dir, exist_ok=True)
+
+    figures = report['overview'] + [fig for figs in report['strategy_figures'].values() for fig in figs]
+    for fig in figures:
+        with open(os.path.join(figures_dir, f"{fig['name']}.json"), 'w', encoding='utf-8') as f:
+            f.write(fig['json'])
+    with open(os.path.join(output, 'plotly.min.js'), 'w', encoding='utf-8') as f:
+        f.write(get_plotlyjs())
+
+    generated_at = datetime.now()
+    summary = {
+        'generated_at': generated_at.isoformat(timespec='seconds'),
+        'period': report['period'],
+        'start': report['start'],
+        'end': report['end'],
+        'rows': report['rows'],
+        'initial_capital': views.INITIAL_CAPITAL,
+        'metrics': report['metrics'],
+        'strategies': report['table'].astype(object).where(report['table'].notna(), None).to_dict(orient='records'),
+        'figures': [f"figures/{fig['name']}.json" for fig in figures],
+        'performance': PERF.summary_records(),
+    }
+    with open(os.path.join(output, 'report.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=1, default=_json_default)
+
+    metrics_rows = ''.join(
+        f"<tr><td>{escape(label)}</td><td>{escape(value)}</td></tr>" for label, value in metrics_table(report['metrics'])
+    )
+    body = [
+        f"<h2>Portfolio</h2><table>{metrics_rows}</table>",
+        *(fig['html'] for fig in report['overview'][:2]),
+        "<h2>Strategie</h2>",
+        views.format_strategy_table(report['table']).to_html(index=False, escape=True),
+        *(fig['html'] for fig in report['overview'][2:]),
+        "<h2>Grafy jednotlivých strategií</h2>",
+    ]
+    for strategy, (cumulative, individual, heatmap) in report['strategy_figures'].items():
+        body.append(f"<h3>{escape(str(strategy))}</h3>")
+        body.append(f"<div class=\"row\"><div>{cumulative['html']}</div><div>{individual['html']}</div></div>")
+        body.append(heatmap['html'])
+
+    period = report['period']
+    if report['start'] or report['end']:
+        period += f" ({report['start'] or '…'} – {report['end'] or '…'})"
+    subtitle = (f"Období: {escape(period)} | {report['rows']} obchodů | "
+                f"vygenerováno {generated_at:%d.%m.%Y %H:%M}")
+    with open(os.path.join(output, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(HTML_TEMPLATE.format(title="Trading Portfolio Report", subtitle=subtitle, body='\n'.join(body)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Statický report portfolia bez Streamlitu")
+    parser.add_argument('--period', default="All Time", choices=views.TIME_FILTERS,
+                        help="časový filtr jako v sidebaru dashboardu")
+    parser.add_argument('--from', dest='start_date', type=date.fromisoformat,
+                        help="začátek pro 'Vlastní období (OD-DO)' (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='end_date', type=date.fromisoformat,
+                        help="konec pro 'Vlastní období (OD-DO)' (YYYY-MM-DD)")
+    parser.add_argument('--strategy', action='append', help="jen vybrané strategie (lze opakovat)")
+    parser.add_argument('--output', default=f"report_{datetime.now():%Y%m%d}", help="výstupní adresář")
+    parser.add_argument('--rolling-window', type=int, default=60, choices=ROLLING_WINDOWS,
+                        help="okno klouzavých metrik v obchodních dnech")
+    parser.add_argument('--workers', type=int, help="počet procesů pro grafy strategií (výchozí počet CPU)")
+    parser.add_argument('--db', default=views.DB_PATH, help="SQLite tradebook")
+    parser.add_argument('--excel', default=views.EXCEL_PATH, help="Excel portfolio")
+    parser.add_argument('--cache-dir', default=os.path.join(views.CACHE_DIR, 'report'),
+                        help="adresář snapshotu reportu (odděleně od snapshotu dashboardu)")
+    args = parser.parse_args(argv)
+
+    if args.period == "Vlastní období (OD-DO)" and not (args.start_date and args.end_date):
+        parser.error("'Vlastní období (OD-DO)' vyžaduje --from a --to")
+    # Vlastní snapshot (--cache-dir) - report nesmí přepsat snapshot a stav přírůstků běžícího dashboardu
+    report = build_report(args.db, args.excel, args.cache_dir, args.period, args.start_date, args.end_date,
+                          args.strategy, args.workers, args.rolling_window)
+    if report is None:
+        print(f"Nepodařilo se načíst data (SQLite: {args.db}, Excel: {args.excel})", file=sys.stderr)
+        return 1
+    if args.strategy:
+        unknown = sorted(set(args.strategy) - set(report['table']['strategy']))
+        if unknown:
+            print(f"Bez obchodů v období nebo neznámé strategie: {', '.join(unknown)}", file=sys.stderr)
+
+    write_bundle(report, args.output)
+    print(f"Report: {os.path.join(args.output, 'index.html')} ({report['rows']} obchodů, "
+          f"{len(report['strategy_figures'])} strategií)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
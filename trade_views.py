@@ -0,0 +1,553 @@
+"""
+Trade Views - data a grafy dashboardu bez Streamlitu
+====================================================
+Načtení a deduplikace zdrojů, časové filtry, metriky a stavba grafů
+sdílené dashboardem (trading_dashboard.py) a dávkovým reportem
+(trade_report.py). Cesty ke zdrojům a adresář snapshotu se předávají
+parametry (DB_PATH, EXCEL_PATH a CACHE_DIR jsou jen výchozí hodnoty
+aplikací), modul nezávisí na Streamlitu.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from trade_analytics import ROLLING_PORTFOLIO, TradeAggregator, downsample_minmax, format_usd_labels
+from trade_pipeline import (
+    DiaryLoader, TradeDeduplicator, TradeSnapshot, apply_trade_schema, index_by_exit_date, iter_diary_chunks,
+    normalize_dates, normalize_trades, read_excel_trades, slice_by_exit_date
+)
+from trade_perf import PERF, frame_bytes
+
+# Cesty k souborům
+DB_PATH = r"C:\Users\ppola\OneDrive\Komoditni_trhy\Autotrader_LIVE\data\tradebook.db3"
+EXCEL_PATH = r"C:\Users\ppola\OneDrive\Komoditni_trhy\Autotrader_LIVE\data\portfolio_k_30012024_new.xlsx"
+INITIAL_CAPITAL = 50000
+
+# Lokální snapshot normalizovaných dat (rychlý start po restartu)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+# Level-of-detail grafů - maximum vykreslených bodů na řadu, od kolika bodů WebGL
+LOD_POINT_BUDGET = 4000
+WEBGL_MIN_POINTS = 2000
+
+# Časové filtry v sidebaru (hranice viz time_filter_bounds)
+TIME_FILTERS = [
+    "All Time", "Vlastní období (OD-DO)", "YTD", "Kalendářní rok",
+    "Poslední kalendářní rok", "Posledních 12 měsíců", "Posledních 6 měsíců",
+    "Poslední 3 měsíce", "Posledních 30 dní", "MTD", "Týden"
+]
+
+# Velikost bloku deníku pro SQL kopii a stream - určuje špičku paměti při načtení
+SOURCE_CHUNK_ROWS = 100_000
+
+
+def convert_to_date_only(date_series):
+    """Konverze datetime na datum bez času - s filtrováním neplatných dat"""
+    result, _ = normalize_dates(date_series)
+    return result
+
+
+def load_combined_data(db_path, excel_path, cache_dir, loader=None):
+    """Načte, deduplikuje a spojí data z obou zdrojů - fáze se měří do PERF (panel ⏱ Performance)"""
+    frames = []
+    loader = loader or DiaryLoader(db_path)
+
+    # Snapshot - platný se vrací rovnou, neplatný slouží jako základ pro přírůstek
+    snapshot = TradeSnapshot(cache_dir, {'db': db_path, 'excel': excel_path})
+    with PERF.stage('snapshot.load') as rec:
+        cached = snapshot.load(stale_ok=True)
+        if cached is not None:
+            rec['rows'], rec['nbytes'] = len(cached), frame_bytes(cached)
+    # Snapshot starší verze bez otisků obchodů se nepoužije
+    if cached is not None and 'fingerprint' not in cached.columns:
+        cached = None
+    if cached is not None:
+        if 'diary' in snapshot.manifest:
+            loader.seed(cached[cached['source'] == loader.source], **snapshot.manifest['diary'])
+        if snapshot.is_valid():
+            cached = index_by_exit_date(cached)
+            cached.attrs['overlap'] = snapshot.manifest.get('overlap', {})
+            return cached
+    loaded_state = loader.state() if loader.watermark is not None else None
+
+    # SQLite data - normalizují se jen nové řádky od posledního načtení
+    try:
+        with PERF.stage('sqlite.load') as rec:
+            df_sql = loader.load()
+            rec.update(rows=len(df_sql), nbytes=frame_bytes(df_sql), mode=loader.last_mode,
+                       new_rows=loader.last_new_rows)
+
+        if len(df_sql) > 0:
+            frames.append(df_sql)
+
+    except Exception as e:
+        print(f"SQLite error: {e}")
+
+    # Jen přírůstek deníku a beze změny sešitu - nové řádky se kontrolují proti otiskům snapshotu.
+    # Nový obchod deníku, který už ve snapshotu vlastní Excel, má přednost - pak se deduplikuje vše znovu.
+    dedup = TradeDeduplicator()
+    incremental = (cached is not None and frames and loader.last_mode == 'incremental'
+                   and loaded_state == snapshot.manifest.get('diary') and snapshot.source_unchanged('excel'))
+    if incremental:
+        dedup.seed(cached, snapshot.manifest.get('overlap'))
+        incremental = dedup.conflicts(loader.last_new_frame) == 0
+        if not incremental:
+            dedup = TradeDeduplicator()
+    if incremental:
+        frames = [cached, dedup.filter(loader.last_new_frame)]
+
+    # Excel data - všechny sheets (ze snapshotu, pokud se sešit nezměnil a žádný jeho obchod nebyl zahozen)
+    else:
+        excel_dropped = any(source.startswith('Excel-') for source in snapshot.manifest.get('overlap', {}))
+        try:
+            if cached is not None and snapshot.source_unchanged('excel') and not excel_dropped:
+                frames.append(cached[cached['source'].str.startswith('Excel-')])
+
+            elif os.path.exists(excel_path):
+                # Všechny sheets v jednom průchodu sešitem, každý sheet se měří zvlášť
+                with PERF.stage('excel.read') as rec:
+                    excel_data_combined, sheets = read_excel_trades(excel_path)
+                    rec.update(rows=len(excel_data_combined), nbytes=os.path.getsize(excel_path),
+                               sheets=len(sheets))
+
+                for sheet in sheets:
+                    if sheet['status'] == 'chyba':
+                        print(f"Chyba při zpracování sheet {sheet['sheet']}: {sheet['error']}")
+
+                # Přidání všech Excel dat
+                if len(excel_data_combined) > 0:
+                    with PERF.stage('excel.normalize', rows=len(excel_data_combined)) as rec:
+                        excel_data_combined, stats = normalize_trades(excel_data_combined)
+                        rec.update(nbytes=frame_bytes(excel_data_combined),
+                                   rejected=stats['rows_in'] - stats['rows_out'])
+                    frames.append(excel_data_combined)
+
+        except Exception as e:
+            print(f"Excel error: {e}")
+            import traceback
+            print(traceback.format_exc())
+
+        # Obchody obsažené ve více zdrojích se počítají jen jednou (priorita: deník, pak sheety)
+        frames = list(dedup.frames(frames))
+
+    if not frames:
+        return pd.DataFrame()
+
+    with PERF.stage('combine') as rec:
+        all_data = pd.concat(frames, ignore_index=True)
+        all_data = apply_trade_schema(all_data)
+        all_data = index_by_exit_date(all_data)
+        rec['rows'], rec['nbytes'] = len(all_data), frame_bytes(all_data)
+
+    try:
+        extra = {'diary': loader.state()} if loader.watermark is not None else {}
+        extra['overlap'] = dedup.overlap
+        with PERF.stage('snapshot.save', rows=len(all_data)):
+            snapshot.save(all_data, extra)
+    except Exception as e:
+        print(f"Snapshot error: {e}")
+
+    all_data.attrs['overlap'] = dedup.overlap
+    return all_data
+
+
+def iter_source_frames(db_path, excel_path, chunk_rows=SOURCE_CHUNK_ROWS):
+    """Normalizované obchody ze všech zdrojů po blocích - deník se celý nenačítá"""
+    try:
+        if os.path.exists(db_path):
+            yield from iter_diary_chunks(db_path, chunk_rows)
+    except Exception as e:
+        print(f"SQLite error: {e}")
+
+    try:
+        if os.path.exists(excel_path):
+            excel_data_combined, _ = read_excel_trades(excel_path)
+            if len(excel_data_combined) > 0:
+                yield normalize_trades(excel_data_combined)[0]
+    except Exception as e:
+        print(f"Excel error: {e}")
+
+
+def sync_trade_mirror(mirror, db_path, excel_path):
+    """Přestaví SQL kopii (bez překryvů zdrojů), pokud se změnil některý zdroj - vrací souhrn kopie"""
+    if not mirror.is_current():
+        dedup = TradeDeduplicator()
+        mirror.rebuild(dedup.frames(iter_source_frames(db_path, excel_path)), extra={'overlap': dedup.overlap})
+    return mirror.summary()
+
+
+def load_trade_stream(spool, db_path, excel_path):
+    """Jeden průchod zdroji po blocích - deduplikace, součty do agregací, obchody do spoolu"""
+    aggregator = TradeAggregator()
+    dedup = TradeDeduplicator()
+    spool.rebuild(aggregator.fold(dedup.frames(iter_source_frames(db_path, excel_path))))
+    aggregator.overlap = dedup.overlap
+    aggregator.cube()
+    return aggregator
+
+
+def time_filter_bounds(time_filter, start_date=None, end_date=None):
+    """Hranice období (start, end) pro časový filtr - None znamená neomezeno
+
+    Relativní období začínají o půlnoci prvního celého dne, takže řez
+    obchodů, kostky i SQL kopie po dnech dává ve všech režimech totéž.
+    """
+    now = datetime.now()
+
+    if time_filter == "Vlastní období (OD-DO)":
+        if start_date and end_date:
+            start_ts = pd.Timestamp(start_date)
+            end_ts = pd.Timestamp(end_date) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+            return start_ts, end_ts
+        return None, None
+    elif time_filter == "YTD":
+        start_ts = pd.Timestamp(now.year, 1, 1)
+    elif time_filter == "Kalendářní rok":
+        start_ts = pd.Timestamp(now.year, 1, 1)
+    elif time_filter == "Poslední kalendářní rok":
+        start_ts = pd.Timestamp(now.year - 1, 1, 1)
+        end_ts = pd.Timestamp(now.year - 1, 12, 31)
+        return start_ts, end_ts
+    elif time_filter == "Posledních 12 měsíců":
+        start_ts = pd.Timestamp(now - timedelta(days=365)).ceil('D')
+    elif time_filter == "Posledních 6 měsíců":
+        start_ts = pd.Timestamp(now - timedelta(days=180)).ceil('D')
+    elif time_filter == "Poslední 3 měsíce":
+        start_ts = pd.Timestamp(now - timedelta(days=90)).ceil('D')
+    elif time_filter == "Posledních 30 dní":
+        start_ts = pd.Timestamp(now - timedelta(days=30)).ceil('D')
+    elif time_filter == "MTD":
+        start_ts = pd.Timestamp(now.year, now.month, 1)
+    elif time_filter == "Týden":
+        start_ts = pd.Timestamp(now - timedelta(days=7)).ceil('D')
+    else:
+        return None, None
+
+    return start_ts, None
+
+
+def filter_by_time(df, time_filter, start_date=None, end_date=None):
+    """Filtruje data podle času - řez seřazeným indexem exitDate"""
+    if time_filter == "All Time" or df.empty:
+        return df
+
+    start_ts, end_ts = time_filter_bounds(time_filter, start_date, end_date)
+    return slice_by_exit_date(df, start_ts, end_ts)
+
+
+def calc_metrics(df):
+    """Výpočet portfolio metrik"""
+    if df.empty:
+        return {}
+
+    total_pl = df['netPL'].sum()
+    total_pl_pct = (total_pl / INITIAL_CAPITAL) * 100
+    total_trades = len(df)
+    wins = len(df[df['netPL'] > 0])
+    losses = len(df[df['netPL'] < 0])
+    win_rate = (wins / total_trades) * 100 if total_trades > 0 else 0
+
+    avg_win = df[df['netPL'] > 0]['netPL'].mean() if wins > 0 else 0
+    avg_loss = df[df['netPL'] < 0]['netPL'].mean() if losses > 0 else 0
+    profit_factor = abs(avg_win / avg_loss) if avg_loss != 0 else 0
+
+    # Drawdown
+    df_sorted = df.sort_values('exitDate')
+    df_sorted['cum_pl'] = df_sorted['netPL'].cumsum()
+    df_sorted['running_max'] = df_sorted['cum_pl'].expanding().max()
+    df_sorted['dd'] = df_sorted['cum_pl'] - df_sorted['running_max']
+    max_dd = df_sorted['dd'].min()
+
+    return {
+        'total_pl': total_pl,
+        'total_pl_percent': total_pl_pct,
+        'total_capital': INITIAL_CAPITAL + total_pl,
+        'total_trades': total_trades,
+        'winning_trades': wins,
+        'losing_trades': losses,
+        'win_rate': win_rate,
+        'avg_win': avg_win,
+        'avg_loss': avg_loss,
+        'profit_factor': profit_factor,
+        'max_drawdown': max_dd
+    }
+
+
+def format_strategy_table(table):
+    """Tabulka strategií k zobrazení - formátované sloupce z grouped_metrics"""
+    return pd.DataFrame({
+        'Strategie': table['strategy'],
+        'P&L (USD)': table['total_pl'].map("${:,.2f}".format),
+        'P&L (%)': table['total_pl_percent'].map("{:.2f}%".format),
+        'Obchody': table['total_trades'],
+        'Win Rate': table['win_rate'].map("{:.1f}%".format),
+        'Profit Factor': table['profit_factor'].map("{:.2f}".format)
+    })
+
+
+def lod_trace(x, y, point_budget):
+    """Redukce bodů nad point_budget a volba SVG/WebGL traces podle velikosti řady"""
+    idx = downsample_minmax(x, y, point_budget)
+    trace = go.Scattergl if len(idx) > WEBGL_MIN_POINTS else go.Scatter
+    return idx, trace
+
+
+def create_cumulative_chart(df, title="Kumulativní P&L", point_budget=LOD_POINT_BUDGET):
+    """Graf kumulativního P&L"""
+    if df.empty:
+        return go.Figure()
+
+    df_sorted = df.sort_values('exitDate')
+    dates = df_sorted['exitDate'].to_numpy()
+    cum_pl = df_sorted['netPL'].cumsum().to_numpy()
+
+    # Level-of-detail - tvar křivky i extrémy drawdownu zůstanou zachovány
+    idx, scatter = lod_trace(dates, cum_pl, point_budget)
+    dates, cum_pl = dates[idx], cum_pl[idx]
+    cum_pct = (cum_pl / INITIAL_CAPITAL) * 100
+
+    fig = go.Figure()
+
+    fig.add_trace(scatter(
+        x=dates,
+        y=cum_pl,
+        mode='lines',
+        name='P&L (USD)',
+        line=dict(color='blue', width=2),
+        yaxis='y'
+    ))
+
+    fig.add_trace(scatter(
+        x=dates,
+        y=cum_pct,
+        mode='lines',
+        name='P&L (%)',
+        line=dict(color='orange', width=2),
+        yaxis='y2'
+    ))
+
+    fig.update_layout(
+        title=title,
+        xaxis_title="Datum",
+        yaxis=dict(title="P&L (USD)", side="left", color="blue"),
+        yaxis2=dict(title="P&L (%)", side="right", overlaying="y", color="orange"),
+        hovermode='x unified',
+        height=600
+    )
+
+    return fig
+
+
+MONTH_NAMES = ['Led', 'Úno', 'Bře', 'Dub', 'Kvě', 'Čer',
+               'Čvc', 'Srp', 'Zář', 'Říj', 'Lis', 'Pro']
+
+HEATMAP_COLORSCALE = [
+    [0, 'darkred'],
+    [0.25, 'red'],
+    [0.4, 'lightcoral'],
+    [0.5, 'white'],
+    [0.6, 'lightgreen'],
+    [0.75, 'green'],
+    [1, 'darkgreen']
+]
+
+
+def create_heatmap_figure(z, y, title, yaxis_title, height=400, text_size=10):
+    """Heat mapa řádky × měsíce z hotové matice P&L"""
+    fig = go.Figure(data=go.Heatmap(
+        z=z,
+        x=MONTH_NAMES,
+        y=y,
+        colorscale=HEATMAP_COLORSCALE,
+        zmid=0,
+        colorbar=dict(title="P&L (USD)"),
+        hovertemplate='<b>%{y}</b><br>' +
+                      'Měsíc: %{x}<br>' +
+                      'P&L: $%{z:,.0f}<br>' +
+                      '<extra></extra>',
+        text=format_usd_labels(z),
+        texttemplate="%{text}",
+        textfont={"size": text_size},
+        showscale=True
+    ))
+
+    fig.update_layout(
+        title=title,
+        xaxis_title="Měsíc",
+        yaxis_title=yaxis_title,
+        height=height,
+        template='plotly_white',
+        font=dict(size=12)
+    )
+
+    return fig
+
+
+def create_monthly_heatmap(cube, title="Heat mapa měsíční výkonnosti"):
+    """Heat mapa výkonnosti podle měsíců a let (součet přes strategie kostky)"""
+    years, pl, _ = cube.monthly()
+    if len(years) == 0:
+        return go.Figure()
+
+    return create_heatmap_figure(pl.sum(axis=0), years, title, "Rok")
+
+
+def create_strategy_chart(df):
+    """Vytvoří graf porovnání strategií"""
+    if df.empty:
+        return go.Figure()
+
+    totals = df.groupby('strategy', observed=True)['netPL'].sum().sort_values(ascending=True)
+
+    fig = go.Figure(go.Bar(
+        y=totals.index,
+        x=totals.values,
+        orientation='h',
+        marker_color=['red' if x < 0 else 'green' for x in totals.values]
+    ))
+
+    fig.update_layout(
+        title="P&L podle strategií",
+        xaxis_title="P&L (USD)",
+        yaxis_title="Strategie"
+    )
+
+    return fig
+
+
+def create_individual_chart(df, title="Jednotlivé obchody", point_budget=LOD_POINT_BUDGET):
+    """Graf jednotlivých obchodů"""
+    if df.empty:
+        return go.Figure()
+
+    df_sorted = df.sort_values('exitDate')
+    dates = df_sorted['exitDate'].to_numpy()
+    trade_pl = df_sorted['netPL'].to_numpy()
+
+    idx, scatter = lod_trace(dates, trade_pl, point_budget)
+    dates, trade_pl = dates[idx], trade_pl[idx]
+    trade_pct = (trade_pl / INITIAL_CAPITAL) * 100
+
+    fig = go.Figure()
+
+    fig.add_trace(scatter(
+        x=dates,
+        y=trade_pl,
+        mode='lines+markers',
+        name='P&L (USD)',
+        line=dict(color='blue'),
+        yaxis='y'
+    ))
+
+    fig.add_trace(scatter(
+        x=dates,
+        y=trade_pct,
+        mode='lines+markers',
+        name='P&L (%)',
+        line=dict(color='orange'),
+        yaxis='y2'
+    ))
+
+    fig.update_layout(
+        title=title,
+        xaxis_title="Datum",
+        yaxis=dict(title="P&L (USD)", side="left", color="blue"),
+        yaxis2=dict(title="P&L (%)", side="right", overlaying="y", color="orange"),
+        hovermode='x unified',
+        height=600
+    )
+
+    return fig
+
+
+def create_strategy_monthly_heatmap(cube, title="Heat mapa strategií podle měsíců"):
+    """Heat mapa výkonnosti strategií podle měsíců (součet přes roky)"""
+    _, pl, trades = cube.monthly()
+    active = trades.sum(axis=(1, 2)) > 0
+    if not active.any():
+        return go.Figure()
+
+    names = np.array(cube.strategies, dtype=object)[active]
+    order = np.argsort(names)
+    z = pl[active].sum(axis=1)[order]
+
+    # Dynamická výška podle počtu strategií
+    return create_heatmap_figure(z, names[order], title, "Strategie", max(400, len(names) * 40), 9)
+
+
+ROLLING_METRIC_LABELS = {
+    'win_rate': "Win Rate (%)",
+    'profit_factor': "Profit Factor",
+    'sharpe': "Sharpe",
+    'sortino': "Sortino",
+    'drawdown': "Drawdown (USD)",
+}
+
+
+def create_rolling_chart(rolling, series=ROLLING_PORTFOLIO, title="Klouzavé metriky portfolia", height=800):
+    """Klouzavé metriky jedné řady pod sebou - win rate, profit factor, Sharpe / Sortino, drawdown"""
+    data = rolling[rolling['series'] == series]
+    if data.empty:
+        return go.Figure()
+
+    dates = data['exitDate'].to_numpy()
+    scatter = go.Scattergl if len(data) > WEBGL_MIN_POINTS else go.Scatter
+    fig = make_subplots(
+        rows=4, cols=1, shared_xaxes=True, vertical_spacing=0.05,
+        subplot_titles=("Win Rate (%)", "Profit Factor", "Sharpe / Sortino", "Drawdown (USD)")
+    )
+
+    fig.add_trace(scatter(x=dates, y=data['win_rate'], mode='lines', name='Win Rate',
+                          line=dict(color='blue')), row=1, col=1)
+    fig.add_trace(scatter(x=dates, y=data['profit_factor'], mode='lines', name='Profit Factor',
+                          line=dict(color='purple')), row=2, col=1)
+    fig.add_trace(scatter(x=dates, y=data['sharpe'], mode='lines', name='Sharpe',
+                          line=dict(color='green')), row=3, col=1)
+    fig.add_trace(scatter(x=dates, y=data['sortino'], mode='lines', name='Sortino',
+                          line=dict(color='orange')), row=3, col=1)
+    fig.add_trace(scatter(x=dates, y=data['drawdown'], mode='lines', name='Drawdown',
+                          line=dict(color='red'), fill='tozeroy'), row=4, col=1)
+
+    fig.update_layout(
+        title=title,
+        hovermode='x unified',
+        height=height,
+        template='plotly_white'
+    )
+
+    return fig
+
+
+def create_rolling_comparison_chart(rolling, metric, title):
+    """Jedna klouzavá metrika pro portfolio a všechny strategie v jednom grafu"""
+    if rolling.empty:
+        return go.Figure()
+
+    scatter = go.Scattergl if len(rolling) > WEBGL_MIN_POINTS else go.Scatter
+    fig = go.Figure()
+    for series, data in rolling.groupby('series', sort=False):
+        portfolio = series == ROLLING_PORTFOLIO
+        fig.add_trace(scatter(
+            x=data['exitDate'].to_numpy(),
+            y=data[metric].to_numpy(),
+            mode='lines',
+            name=series,
+            line=dict(color='black', width=3) if portfolio else dict(width=1),
+            opacity=1 if portfolio else 0.7
+        ))
+
+    fig.update_layout(
+        title=title,
+        xaxis_title="Datum",
+        yaxis_title=ROLLING_METRIC_LABELS[metric],
+        hovermode='closest',
+        height=600,
+        template='plotly_white'
+    )
+
+    return fig
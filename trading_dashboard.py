@@ -8,11 +8,21 @@ Spuštění: streamlit run trading_dashboard.py
 """
 
 import streamlit as st
-import sqlite3
 import pandas as pd
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
+import math
+from functools import partial
+
+from trade_analytics import ROLLING_WINDOWS, FigureCache, TradeCube, grouped_metrics
+from trade_pipeline import BackgroundRefresher, DiaryLoader, TradeMirror, TradeSpool, memory_report, overlap_report
+from trade_perf import PERF, frame_bytes
+from trade_views import (
+    CACHE_DIR, DB_PATH, EXCEL_PATH, INITIAL_CAPITAL, LOD_POINT_BUDGET, ROLLING_METRIC_LABELS, TIME_FILTERS,
+    create_cumulative_chart, create_individual_chart, create_monthly_heatmap, create_rolling_chart,
+    create_rolling_comparison_chart, create_strategy_chart, filter_by_time, format_strategy_table,
+    load_combined_data, load_trade_stream, sync_trade_mirror, time_filter_bounds
+)
 
 # Konfigurace
 st.set_page_config(
@@ -21,723 +31,52 @@ st.set_page_config(
     layout="wide"
 )
 
-# Cesty k souborům
-DB_PATH = r"C:\Users\ppola\OneDrive\Komoditni_trhy\Autotrader_LIVE\data\tradebook.db3"
-EXCEL_PATH = r"C:\Users\ppola\OneDrive\Komoditni_trhy\Autotrader_LIVE\data\portfolio_k_30012024_new.xlsx"
-INITIAL_CAPITAL = 50000
+# Sdílená cache grafů - maximální počet položek a paměť
+FIGURE_CACHE_ENTRIES = 256
+FIGURE_CACHE_BYTES = 256 * 2**20
 
-def convert_to_date_only(date_series):
-    """Konverze datetime na datum bez času - s filtrováním neplatných dat"""
-    print(f"\n=== KONVERZE DATUMŮ ===")
-    print(f"Celkem řádků k zpracování: {len(date_series)}")
-    print(f"Ukázka původních hodnot: {date_series.head().tolist()}")
-    
-    # Předčištění dat - odstranění timezone před konverzí
-    cleaned_series = date_series.copy()
-    
-    # Konverze na string a čištění timezone značek
-    cleaned_values = []
-    problematic_found = []
-    
-    for i, val in enumerate(cleaned_series):
-        try:
-            if pd.isna(val) or val == '' or str(val).strip() == '':
-                cleaned_values.append(None)
-                continue
-                
-            date_str = str(val).strip()
-            
-            # Detekce roku 1900 - problematické data
-            if '1900-' in date_str:
-                print(f"ODSTRAŇUJI problematické datum roku 1900 v řádku {i}: '{date_str}'")
-                problematic_found.append((i, date_str))
-                cleaned_values.append(None)
-                continue
-            
-            # Odstranění timezone značek
-            if '+' in date_str:
-                date_str = date_str.split('+')[0]
-            elif '-' in date_str and date_str.count('-') > 2:  # Má timezone s minus
-                parts = date_str.split('-')
-                if len(parts) > 3:  # YYYY-MM-DD-HH:MM nebo podobné
-                    date_str = '-'.join(parts[:3])  # Zachovat jen YYYY-MM-DD
-            if date_str.endswith('Z'):
-                date_str = date_str[:-1]
-            
-            # Odstranit čas - vzít jen datum část
-            if ' ' in date_str:
-                date_str = date_str.split(' ')[0]
-            
-            cleaned_values.append(date_str)
-            
-        except Exception as e:
-            print(f"Chyba při čištění řádku {i}: '{val}' -> {e}")
-            problematic_found.append((i, val))
-            cleaned_values.append(None)
-    
-    print(f"Předčištění dokončeno. Problematických řádků: {len(problematic_found)}")
-    
-    # Nyní konverze vyčištěných dat
-    try:
-        # Konverze s UTC=True pro potlačení timezone warning
-        result = pd.to_datetime(cleaned_values, errors='coerce', utc=True)
-        
-        # Odstranit timezone a převést na lokální čas
-        if hasattr(result.dtype, 'tz') and result.dtype.tz is not None:
-            result = result.dt.tz_localize(None)
-        
-        # Převést na datum pouze (odstranit čas)
-        result = result.dt.date
-        result = pd.to_datetime(result, errors='coerce')
-        
-        # Filtrovat data mimo rozumný rozsah (2020-2030)
-        date_range_mask = (result >= pd.Timestamp('2020-01-01')) & (result <= pd.Timestamp('2030-12-31'))
-        result = result.where(date_range_mask, pd.NaT)
-        
-        valid_count = result.notna().sum()
-        print(f"Konverze dokončena. Platných datumů: {valid_count}/{len(result)}")
-        if valid_count > 0:
-            print(f"Rozsah datumů: {result.min()} až {result.max()}")
-        
-        return result
-        
-    except Exception as e:
-        print(f"Chyba v konverzi datumů: {e}")
-        print("Spouštím manuální fallback...")
-        
-        # Manuální fallback
-        final_dates = []
-        for i, cleaned_val in enumerate(cleaned_values):
-            try:
-                if cleaned_val is None or cleaned_val == '':
-                    final_dates.append(pd.NaT)
-                else:
-                    # Pokus o manuální parsování
-                    parsed = pd.to_datetime(cleaned_val, errors='coerce')
-                    
-                    # Kontrola platnosti
-                    if (pd.notna(parsed) and 
-                        pd.Timestamp('2020-01-01') <= parsed <= pd.Timestamp('2030-12-31')):
-                        final_dates.append(parsed.date())
-                    else:
-                        final_dates.append(pd.NaT)
-                        
-            except Exception:
-                final_dates.append(pd.NaT)
-        
-        result = pd.Series([pd.to_datetime(d) if pd.notna(d) else pd.NaT for d in final_dates])
-        valid_count = result.notna().sum()
-        print(f"Fallback konverze dokončena. Platných datumů: {valid_count}/{len(result)}")
-        
-        return result
+# Záložka Grafy - kolik strategií se vykreslí na jedné stránce
+STRATEGY_PAGE_SIZES = [3, 5, 10, 20]
 
-@st.cache_data
-def load_combined_data():
-    """Načte a spojí data z obou zdrojů"""
-    all_data = pd.DataFrame()
-    
-    # SQLite data
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        query = """
-        SELECT strategy, exitDate, "NetP/L" as netPL, entryDate, ticker, 
-               quantity, entryPrice, exitPrice, commission
-        FROM diary 
-        WHERE exitDate IS NOT NULL AND "NetP/L" IS NOT NULL AND strategy IS NOT NULL
-        ORDER BY exitDate
-        """
-        df_sql = pd.read_sql_query(query, conn)
-        conn.close()
-        
-        if len(df_sql) > 0:
-            df_sql['source'] = 'SQLite'
-            all_data = pd.concat([all_data, df_sql], ignore_index=True)
-        print(f"SQLite data: {len(df_sql)} řádků")
-        
-    except Exception as e:
-        print(f"SQLite error: {e}")
-    
-    # Excel data - všechny sheets
-    try:
-        if os.path.exists(EXCEL_PATH):
-            print(f"Excel soubor nalezen: {EXCEL_PATH}")
-            
-            # Načtení všech sheets
-            excel_file = pd.ExcelFile(EXCEL_PATH)
-            sheet_names = excel_file.sheet_names
-            print(f"Nalezeno {len(sheet_names)} sheets: {sheet_names}")
-            
-            excel_data_combined = pd.DataFrame()
-            
-            for sheet_name in sheet_names:
-                try:
-                    print(f"\nZpracovávám sheet: {sheet_name}")
-                    df_sheet = pd.read_excel(EXCEL_PATH, sheet_name=sheet_name)
-                    print(f"Sheet {sheet_name}: {len(df_sheet)} řádků")
-                    
-                    if len(df_sheet) == 0:
-                        print(f"Sheet {sheet_name} je prázdný, přeskakuji")
-                        continue
-                    
-                    print(f"Sloupce v {sheet_name}: {df_sheet.columns.tolist()}")
-                    
-                    # Map columns pro každý sheet
-                    col_map = {}
-                    for col in df_sheet.columns:
-                        if col == 'Systém':
-                            col_map[col] = 'strategy'
-                        elif col == 'Symbol':
-                            col_map[col] = 'ticker'
-                        elif col == 'Typ':
-                            col_map[col] = 'possition'
-                        elif col == 'Datum':
-                            col_map[col] = 'entryDate'
-                        elif col == 'Datum.1':
-                            col_map[col] = 'exitDate'
-                        elif col == 'Počet':
-                            col_map[col] = 'quantity'
-                        elif col == 'Cena':
-                            col_map[col] = 'entryPrice'
-                        elif col == 'Cena.1':
-                            col_map[col] = 'exitPrice'
-                        elif col == '% změna':
-                            col_map[col] = 'chg_percent'
-                        elif col == 'Komise':
-                            col_map[col] = 'commission'
-                        elif col == 'Profit/Loss':
-                            col_map[col] = 'netPL'
-                    
-                    print(f"Mapování pro {sheet_name}: {col_map}")
-                    df_sheet = df_sheet.rename(columns=col_map)
-                    
-                    # Kontrola povinných sloupců
-                    required_cols = ['strategy', 'exitDate', 'netPL']
-                    missing_cols = [col for col in required_cols if col not in df_sheet.columns]
-                    
-                    if len(missing_cols) == 0:
-                        print(f"Sheet {sheet_name}: DATA PŘIJATA - všechny povinné sloupce nalezeny")
-                        df_sheet['source'] = f'Excel-{sheet_name}'
-                        df_sheet['sheet_name'] = sheet_name
-                        excel_data_combined = pd.concat([excel_data_combined, df_sheet], ignore_index=True)
-                        print(f"Sheet {sheet_name}: přidáno {len(df_sheet)} řádků")
-                    else:
-                        print(f"Sheet {sheet_name}: DATA ZAMÍTNUTA - chybí sloupce: {missing_cols}")
-                
-                except Exception as sheet_error:
-                    print(f"Chyba při zpracování sheet {sheet_name}: {sheet_error}")
-            
-            # Přidání všech Excel dat
-            if len(excel_data_combined) > 0:
-                all_data = pd.concat([all_data, excel_data_combined], ignore_index=True)
-                print(f"\nCELKEM z Excelu přidáno: {len(excel_data_combined)} řádků ze {len(sheet_names)} sheets")
-            else:
-                print("\nŽádná data z Excel sheets nebyla přijata")
-            
-        else:
-            print(f"Excel soubor NENALEZEN: {EXCEL_PATH}")
-        
-    except Exception as e:
-        print(f"Excel error: {e}")
-        import traceback
-        print(traceback.format_exc())
-    
-    if all_data.empty:
-        return pd.DataFrame()
-    
-    # Process data - konverze datumů a čištění
-    print(f"\nZpracovávám kombinovaná data: {len(all_data)} řádků")
-    all_data['exitDate'] = convert_to_date_only(all_data['exitDate'])
-    if 'entryDate' in all_data.columns:
-        all_data['entryDate'] = convert_to_date_only(all_data['entryDate'])
+# Režimy načtení dat v sidebaru
+LOAD_MODES = ["💾 Paměť", "🌊 Stream", "🗄 SQL"]
 
-    all_data['netPL'] = pd.to_numeric(all_data['netPL'], errors='coerce')
-    
-    # Odstranění řádků s neplatnými daty
-    original_count = len(all_data)
-    all_data = all_data.dropna(subset=['exitDate', 'netPL', 'strategy'])
-    
-    # Dodatečné filtrování datumů (jen pro jistotu)
-    all_data = all_data[
-        (all_data['exitDate'] >= pd.Timestamp('2020-01-01')) & 
-        (all_data['exitDate'] <= pd.Timestamp('2030-12-31'))
-    ]
-    
-    final_count = len(all_data)
-    print(f"Po čištění a filtrování: {final_count} řádků (odstraněno {original_count - final_count})")
-    
-    all_data = all_data.sort_values('exitDate')
-    
-    if final_count > 0:
-        print(f"Finální rozsah datumů: {all_data['exitDate'].min()} až {all_data['exitDate'].max()}")
-    
-    return all_data
+# SQL režim - indexovaná kopie obchodů, filtry se vyhodnocují v SQLite
+MIRROR_PATH = os.path.join(CACHE_DIR, "trades.db3")
 
-def filter_by_time(df, time_filter, start_date=None, end_date=None):
-    """Filtruje data podle času"""
-    if time_filter == "All Time" or df.empty:
-        return df
-    
-    now = datetime.now()
-    
-    if time_filter == "Vlastní období (OD-DO)":
-        if start_date and end_date:
-            start_ts = pd.Timestamp(start_date)
-            end_ts = pd.Timestamp(end_date) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
-            return df[(df['exitDate'] >= start_ts) & (df['exitDate'] <= end_ts)]
-        return df
-    elif time_filter == "YTD":
-        start_ts = pd.Timestamp(now.year, 1, 1)
-    elif time_filter == "Kalendářní rok":
-        start_ts = pd.Timestamp(now.year, 1, 1)
-    elif time_filter == "Poslední kalendářní rok":
-        start_ts = pd.Timestamp(now.year - 1, 1, 1)
-        end_ts = pd.Timestamp(now.year - 1, 12, 31)
-        return df[(df['exitDate'] >= start_ts) & (df['exitDate'] <= end_ts)]
-    elif time_filter == "Posledních 12 měsíců":
-        start_ts = pd.Timestamp(now - timedelta(days=365))
-    elif time_filter == "Posledních 6 měsíců":
-        start_ts = pd.Timestamp(now - timedelta(days=180))
-    elif time_filter == "Poslední 3 měsíce":
-        start_ts = pd.Timestamp(now - timedelta(days=90))
-    elif time_filter == "Posledních 30 dní":
-        start_ts = pd.Timestamp(now - timedelta(days=30))
-    elif time_filter == "MTD":
-        start_ts = pd.Timestamp(now.year, now.month, 1)
-    elif time_filter == "Týden":
-        start_ts = pd.Timestamp(now - timedelta(days=7))
-    else:
-        return df
-    
-    return df[df['exitDate'] >= start_ts]
-
-def calc_metrics(df):
-    """Výpočet portfolio metrik"""
-    if df.empty:
-        return {}
-    
-    total_pl = df['netPL'].sum()
-    total_pl_pct = (total_pl / INITIAL_CAPITAL) * 100
-    total_trades = len(df)
-    wins = len(df[df['netPL'] > 0])
-    losses = len(df[df['netPL'] < 0])
-    win_rate = (wins / total_trades) * 100 if total_trades > 0 else 0
-    
-    avg_win = df[df['netPL'] > 0]['netPL'].mean() if wins > 0 else 0
-    avg_loss = df[df['netPL'] < 0]['netPL'].mean() if losses > 0 else 0
-    profit_factor = abs(avg_win / avg_loss) if avg_loss != 0 else 0
-    
-    # Drawdown
-    df_sorted = df.sort_values('exitDate')
-    df_sorted['cum_pl'] = df_sorted['netPL'].cumsum()
-    df_sorted['running_max'] = df_sorted['cum_pl'].expanding().max()
-    df_sorted['dd'] = df_sorted['cum_pl'] - df_sorted['running_max']
-    max_dd = df_sorted['dd'].min()
-    
-    return {
-        'total_pl': total_pl,
-        'total_pl_percent': total_pl_pct,
-        'total_capital': INITIAL_CAPITAL + total_pl,
-        'total_trades': total_trades,
-        'winning_trades': wins,
-        'losing_trades': losses,
-        'win_rate': win_rate,
-        'avg_win': avg_win,
-        'avg_loss': avg_loss,
-        'profit_factor': profit_factor,
-        'max_drawdown': max_dd
-    }
+# Stream režim - v paměti jen denní agregace, obchody odložené v parquetu
+STREAM_SPOOL_PATH = os.path.join(CACHE_DIR, "trades_stream.parquet")
 
-def create_cumulative_chart(df, title="Kumulativní P&L"):
-    """Graf kumulativního P&L"""
-    if df.empty:
-        return go.Figure()
-    
-    df_sorted = df.sort_values('exitDate')
-    df_sorted['cum_pl'] = df_sorted['netPL'].cumsum()
-    df_sorted['cum_pct'] = (df_sorted['cum_pl'] / INITIAL_CAPITAL) * 100
-    
-    fig = go.Figure()
-    
-    fig.add_trace(go.Scatter(
-        x=df_sorted['exitDate'],
-        y=df_sorted['cum_pl'],
-        mode='lines',
-        name='P&L (USD)',
-        line=dict(color='blue', width=2),
-        yaxis='y'
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=df_sorted['exitDate'],
-        y=df_sorted['cum_pct'],
-        mode='lines',
-        name='P&L (%)',
-        line=dict(color='orange', width=2),
-        yaxis='y2'
-    ))
-    
-    fig.update_layout(
-        title=title,
-        xaxis_title="Datum",
-        yaxis=dict(title="P&L (USD)", side="left", color="blue"),
-        yaxis2=dict(title="P&L (%)", side="right", overlaying="y", color="orange"),
-        hovermode='x unified',
-        height=600
-    )
-    
-    return fig
+# Panel Performance - kolik posledních měření se vypíše jednotlivě
+PERF_RECENT_RECORDS = 50
 
-def create_monthly_heatmap(df, title="Heat mapa měsíční výkonnosti"):
-    """Vytvoří heat mapu výkonnosti podle měsíců a let"""
-    if df.empty:
-        return go.Figure()
-    
-    # Příprava dat - agregace podle roku a měsíce
-    df_copy = df.copy()
-    df_copy['year'] = df_copy['exitDate'].dt.year
-    df_copy['month'] = df_copy['exitDate'].dt.month
-    
-    # Agregace P&L podle roku a měsíce
-    monthly_data = df_copy.groupby(['year', 'month'])['netPL'].sum().reset_index()
-    
-    # Vytvoření pivot tabulky pro heat mapu
-    pivot_data = monthly_data.pivot(index='year', columns='month', values='netPL')
-    
-    # Doplnění chybějících měsíců nulami
-    for month in range(1, 13):
-        if month not in pivot_data.columns:
-            pivot_data[month] = 0
-    
-    # Seřazení sloupců (měsíců)
-    pivot_data = pivot_data.reindex(columns=sorted(pivot_data.columns))
-    
-    # Doplnění NaN hodnot nulami
-    pivot_data = pivot_data.fillna(0)
-    
-    # Názvy měsíců pro osu X
-    month_names = ['Led', 'Úno', 'Bře', 'Dub', 'Kvě', 'Čer', 
-                   'Čvc', 'Srp', 'Zář', 'Říj', 'Lis', 'Pro']
-    
-    # Vytvoření heat mapy
-    fig = go.Figure(data=go.Heatmap(
-        z=pivot_data.values,
-        x=month_names,
-        y=pivot_data.index,
-        colorscale=[
-            [0, 'darkred'],
-            [0.25, 'red'], 
-            [0.4, 'lightcoral'],
-            [0.5, 'white'],
-            [0.6, 'lightgreen'],
-            [0.75, 'green'],
-            [1, 'darkgreen']
-        ],
-        zmid=0,
-        colorbar=dict(title="P&L (USD)"),
-        hovertemplate='<b>%{y}</b><br>' +
-                      'Měsíc: %{x}<br>' +
-                      'P&L: $%{z:,.0f}<br>' +
-                      '<extra></extra>',
-        text=[[f"${val:,.0f}" if val != 0 else "" for val in row] for row in pivot_data.values],
-        texttemplate="%{text}",
-        textfont={"size": 10},
-        showscale=True
-    ))
-    
-    fig.update_layout(
-        title=title,
-        xaxis_title="Měsíc",
-        yaxis_title="Rok",
-        height=400,
-        template='plotly_white',
-        font=dict(size=12)
+@st.cache_resource
+def get_data_refresher():
+    """Sdílená verze dat pro všechny session - změny zdrojů se načtou na pozadí"""
+    loader = DiaryLoader(DB_PATH)
+    return BackgroundRefresher(
+        lambda: load_combined_data(DB_PATH, EXCEL_PATH, CACHE_DIR, loader),
+        {'db': DB_PATH, 'excel': EXCEL_PATH}
     )
-    
-    return fig
 
-def create_strategy_chart(df):
-    """Vytvoří graf porovnání strategií"""
-    if df.empty:
-        return go.Figure()
-    
-    totals = df.groupby('strategy')['netPL'].sum().sort_values(ascending=True)
-    
-    fig = go.Figure(go.Bar(
-        y=totals.index,
-        x=totals.values,
-        orientation='h',
-        marker_color=['red' if x < 0 else 'green' for x in totals.values]
-    ))
-    
-    fig.update_layout(
-        title="P&L podle strategií",
-        xaxis_title="P&L (USD)",
-        yaxis_title="Strategie"
-    )
-    
-    return fig
+@st.cache_resource
+def get_mirror_refresher():
+    """Sdílená SQL kopie obchodů - změny zdrojů se promítnou na pozadí"""
+    sources = {'db': DB_PATH, 'excel': EXCEL_PATH}
+    mirror = TradeMirror(MIRROR_PATH, sources)
+    return mirror, BackgroundRefresher(lambda: sync_trade_mirror(mirror, DB_PATH, EXCEL_PATH), sources)
 
-def create_individual_chart(df, title="Jednotlivé obchody"):
-    """Graf jednotlivých obchodů"""
-    if df.empty:
-        return go.Figure()
-    
-    df_sorted = df.sort_values('exitDate')
-    df_sorted['trade_pct'] = (df_sorted['netPL'] / INITIAL_CAPITAL) * 100
-    
-    fig = go.Figure()
-    
-    fig.add_trace(go.Scatter(
-        x=df_sorted['exitDate'],
-        y=df_sorted['netPL'],
-        mode='lines+markers',
-        name='P&L (USD)',
-        line=dict(color='blue'),
-        yaxis='y'
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=df_sorted['exitDate'],
-        y=df_sorted['trade_pct'],
-        mode='lines+markers',
-        name='P&L (%)',
-        line=dict(color='orange'),
-        yaxis='y2'
-    ))
-    
-    fig.update_layout(
-        title=title,
-        xaxis_title="Datum",
-        yaxis=dict(title="P&L (USD)", side="left", color="blue"),
-        yaxis2=dict(title="P&L (%)", side="right", overlaying="y", color="orange"),
-        hovermode='x unified',
-        height=600
-    )
-    
-    return fig
+@st.cache_resource
+def get_stream_refresher():
+    """Sdílené streamované načtení - změny zdrojů se načtou na pozadí"""
+    spool = TradeSpool(STREAM_SPOOL_PATH)
+    sources = {'db': DB_PATH, 'excel': EXCEL_PATH}
+    return spool, BackgroundRefresher(lambda: load_trade_stream(spool, DB_PATH, EXCEL_PATH), sources)
 
-def create_monthly_heatmap(df, title="Heat mapa měsíční výkonnosti"):
-    """Vytvoří heat mapu výkonnosti podle měsíců a let"""
-    if df.empty:
-        return go.Figure()
-    
-    # Příprava dat - agregace podle roku a měsíce
-    df_copy = df.copy()
-    df_copy['year'] = df_copy['exitDate'].dt.year
-    df_copy['month'] = df_copy['exitDate'].dt.month
-    
-    # Agregace P&L podle roku a měsíce
-    monthly_data = df_copy.groupby(['year', 'month'])['netPL'].sum().reset_index()
-    
-    # Vytvoření pivot tabulky pro heat mapu
-    pivot_data = monthly_data.pivot(index='year', columns='month', values='netPL')
-    
-    # Doplnění chybějících měsíců nulami
-    for month in range(1, 13):
-        if month not in pivot_data.columns:
-            pivot_data[month] = 0
-    
-    # Seřazení sloupců (měsíců)
-    pivot_data = pivot_data.reindex(columns=sorted(pivot_data.columns))
-    
-    # Doplnění NaN hodnot nulami
-    pivot_data = pivot_data.fillna(0)
-    
-    # Názvy měsíců pro osu X
-    month_names = ['Led', 'Úno', 'Bře', 'Dub', 'Kvě', 'Čer', 
-                   'Čvc', 'Srp', 'Zář', 'Říj', 'Lis', 'Pro']
-    
-    # Vytvoření heat mapy
-    fig = go.Figure(data=go.Heatmap(
-        z=pivot_data.values,
-        x=month_names,
-        y=pivot_data.index,
-        colorscale=[
-            [0, 'darkred'],
-            [0.25, 'red'], 
-            [0.4, 'lightcoral'],
-            [0.5, 'white'],
-            [0.6, 'lightgreen'],
-            [0.75, 'green'],
-            [1, 'darkgreen']
-        ],
-        zmid=0,
-        colorbar=dict(title="P&L (USD)"),
-        hovertemplate='<b>%{y}</b><br>' +
-                      'Měsíc: %{x}<br>' +
-                      'P&L: $%{z:,.0f}<br>' +
-                      '<extra></extra>',
-        text=[[f"${val:,.0f}" if val != 0 else "" for val in row] for row in pivot_data.values],
-        texttemplate="%{text}",
-        textfont={"size": 10},
-        showscale=True
-    ))
-    
-    fig.update_layout(
-        title=title,
-        xaxis_title="Měsíc",
-        yaxis_title="Rok",
-        height=400,
-        template='plotly_white',
-        font=dict(size=12)
-    )
-    
-    return fig
-
-def create_strategy_monthly_heatmap(df, title="Heat mapa strategií podle měsíců"):
-    """Vytvoří heat mapu výkonnosti strategií podle měsíců"""
-    if df.empty:
-        return go.Figure()
-    
-    # Příprava dat - agregace podle strategie a měsíce
-    df_copy = df.copy()
-    df_copy['month'] = df_copy['exitDate'].dt.month
-    
-    # Agregace P&L podle strategie a měsíce
-    strategy_monthly = df_copy.groupby(['strategy', 'month'])['netPL'].sum().reset_index()
-    
-    # Vytvoření pivot tabulky pro heat mapu
-    pivot_data = strategy_monthly.pivot(index='strategy', columns='month', values='netPL')
-    
-    # Doplnění chybějících měsíců nulami
-    for month in range(1, 13):
-        if month not in pivot_data.columns:
-            pivot_data[month] = 0
-    
-    # Seřazení sloupců (měsíců)
-    pivot_data = pivot_data.reindex(columns=sorted(pivot_data.columns))
-    
-    # Doplnění NaN hodnot nulami
-    pivot_data = pivot_data.fillna(0)
-    
-    # Názvy měsíců pro osu X
-    month_names = ['Led', 'Úno', 'Bře', 'Dub', 'Kvě', 'Čer', 
-                   'Čvc', 'Srp', 'Zář', 'Říj', 'Lis', 'Pro']
-    
-    # Vytvoření heat mapy
-    fig = go.Figure(data=go.Heatmap(
-        z=pivot_data.values,
-        x=month_names,
-        y=pivot_data.index,
-        colorscale=[
-            [0, 'darkred'],
-            [0.25, 'red'], 
-            [0.4, 'lightcoral'],
-            [0.5, 'white'],
-            [0.6, 'lightgreen'],
-            [0.75, 'green'],
-            [1, 'darkgreen']
-        ],
-        zmid=0,
-        colorbar=dict(title="P&L (USD)"),
-        hovertemplate='<b>%{y}</b><br>' +
-                      'Měsíc: %{x}<br>' +
-                      'P&L: $%{z:,.0f}<br>' +
-                      '<extra></extra>',
-        text=[[f"${val:,.0f}" if val != 0 else "" for val in row] for row in pivot_data.values],
-        texttemplate="%{text}",
-        textfont={"size": 9},
-        showscale=True
-    ))
-    
-    fig.update_layout(
-        title=title,
-        xaxis_title="Měsíc",
-        yaxis_title="Strategie",
-        height=max(400, len(pivot_data.index) * 40),  # Dynamická výška podle počtu strategií
-        template='plotly_white',
-        font=dict(size=12)
-    )
-    
-    return fig
-    """Vytvoří heat mapu výkonnosti podle měsíců a let"""
-    if df.empty:
-        return go.Figure()
-    
-    # Příprava dat - agregace podle roku a měsíce
-    df_copy = df.copy()
-    df_copy['year'] = df_copy['exitDate'].dt.year
-    df_copy['month'] = df_copy['exitDate'].dt.month
-    
-    # Agregace P&L podle roku a měsíce
-    monthly_data = df_copy.groupby(['year', 'month'])['netPL'].sum().reset_index()
-    
-    # Vytvoření pivot tabulky pro heat mapu
-    pivot_data = monthly_data.pivot(index='year', columns='month', values='netPL')
-    
-    # Doplnění chybějících měsíců nulami
-    for month in range(1, 13):
-        if month not in pivot_data.columns:
-            pivot_data[month] = 0
-    
-    # Seřazení sloupců (měsíců)
-    pivot_data = pivot_data.reindex(columns=sorted(pivot_data.columns))
-    
-    # Doplnění NaN hodnot nulami
-    pivot_data = pivot_data.fillna(0)
-    
-    # Názvy měsíců pro osu X
-    month_names = ['Led', 'Úno', 'Bře', 'Dub', 'Kvě', 'Čer', 
-                   'Čvc', 'Srp', 'Zář', 'Říj', 'Lis', 'Pro']
-    
-    # Vytvoření heat mapy
-    fig = go.Figure(data=go.Heatmap(
-        z=pivot_data.values,
-        x=month_names,
-        y=pivot_data.index,
-        colorscale=[
-            [0, 'darkred'],
-            [0.25, 'red'], 
-            [0.4, 'lightcoral'],
-            [0.5, 'white'],
-            [0.6, 'lightgreen'],
-            [0.75, 'green'],
-            [1, 'darkgreen']
-        ],
-        zmid=0,  # Středová hodnota pro barevné schéma
-        colorbar=dict(
-            title="P&L (USD)"
-        ),
-        hovertemplate='<b>%{y}</b><br>' +
-                      'Měsíc: %{x}<br>' +
-                      'P&L: $%{z:,.0f}<br>' +
-                      '<extra></extra>',
-        text=[[f"${val:,.0f}" if val != 0 else "" for val in row] for row in pivot_data.values],
-        texttemplate="%{text}",
-        textfont={"size": 10},
-        showscale=True
-    ))
-    
-    fig.update_layout(
-        title=title,
-        xaxis_title="Měsíc",
-        yaxis_title="Rok",
-        height=400,
-        template='plotly_white',
-        font=dict(size=12)
-    )
-    
-    return fig
-    """Graf porovnání strategií"""
-    if df.empty:
-        return go.Figure()
-    
-    totals = df.groupby('strategy')['netPL'].sum().sort_values(ascending=True)
-    
-    fig = go.Figure(go.Bar(
-        y=totals.index,
-        x=totals.values,
-        orientation='h',
-        marker_color=['red' if x < 0 else 'green' for x in totals.values]
-    ))
-    
-    fig.update_layout(
-        title="P&L podle strategií",
-        xaxis_title="P&L (USD)",
-        yaxis_title="Strategie"
-    )
-    
-    return fig
+@st.cache_resource(max_entries=2)
+def get_trade_cube(data_version, _df):
+    """Kostka strategie × den - sestaví se jednou pro každou verzi dat"""
+    return TradeCube.from_trades(_df)
 
 def show_help():
     """Nápověda k metrikám"""
@@ -753,7 +92,13 @@ def show_help():
         
         **⚖️ Profit Factor:** |Průměrný zisk / Průměrná ztráta|
         
-        **📉 Max Drawdown:** Největší pokles od vrcholu
+        **📉 Max Drawdown:** Největší pokles od vrcholu (denní kumulativní P&L)
+        
+        **🔁 Klouzavé metriky (záložka Grafy):** Win Rate, Profit Factor, Sharpe, Sortino a Drawdown
+        za posledních 20 / 60 / 250 obchodních dní (dny, kdy portfolio obchodovalo)
+        - Sharpe = průměr / směrodatná odchylka denního P&L × √252
+        - Sortino = průměr / odchylka ztrátových dní × √252
+        - Drawdown = pokles od nejvyššího stavu v okně
         
         **🔥 Heat mapa:** Vizualizace měsíční výkonnosti podle let a měsíců
         - 🟢 Zelená = Pozitivní výkonnost v daném měsíci
@@ -796,59 +141,241 @@ def show_help():
         - Optimalizace portfolio mixu podle měsíčních vzorů
         """)
 
+@st.cache_resource
+def get_figure_cache():
+    """Sdílená cache hotových grafů pro všechny session"""
+    return FigureCache(FIGURE_CACHE_ENTRIES, FIGURE_CACHE_BYTES)
+
+def lazy_strategy_trades(df, strategy):
+    """Obchody strategie vybrané až při prvním použití (při zásahu cache vůbec)"""
+    selected = []
+    def trades():
+        if not selected:
+            selected.append(df[df['strategy'] == strategy])
+        return selected[0]
+    return trades
+
+def show_strategy_charts(cube, strategies, view_key, strategy_trades, daily_cumulative=False, rolling_window=None):
+    """Grafy strategií po stránkách - počítají se jen grafy na aktuální stránce
+
+    strategy_trades(strategie) vrací funkci, která obchody strategie načte
+    až při stavbě grafu. S daily_cumulative se kumulativní graf kreslí
+    z denních součtů kostky místo z jednotlivých obchodů. S rolling_window
+    se pod heat mapou vykreslí klouzavé metriky strategie.
+    """
+    figures = get_figure_cache()
+    if not strategies:
+        st.info("Vyberte alespoň jednu strategii")
+        return
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        page_size = st.selectbox("Strategií na stránku:", STRATEGY_PAGE_SIZES, key="strategy_page_size")
+    pages = math.ceil(len(strategies) / page_size)
+    with col2:
+        page = st.selectbox("Stránka:", range(1, pages + 1), key="strategy_page")
+    
+    first = (page - 1) * page_size
+    last = min(first + page_size, len(strategies))
+    st.caption(f"Strategie {first + 1}–{last} z {len(strategies)}")
+    
+    for i in range(first, last):
+        strategy = strategies[i]
+        st.write(f"**{strategy}**")
+        strat_key = (view_key[0], view_key[1], strategy)
+        strat_data = strategy_trades(strategy)
+        if daily_cumulative:
+            cumulative_data = cube.slice(strategies=[strategy]).daily
+        else:
+            cumulative_data = strat_data
+        
+        # První řádek - kumulativní a jednotlivé obchody
+        col1, col2 = st.columns(2)
+        with col1:
+            st.plotly_chart(
+                figures.get(
+                    ('cumulative', strat_key),
+                    lambda: create_cumulative_chart(cumulative_data(), f"Kumulativní - {strategy}")
+                ),
+                use_container_width=True,
+                key=f"strategy_cumulative_{i}_{strategy.replace(' ', '_')}"
+            )
+        with col2:
+            st.plotly_chart(
+                figures.get(
+                    ('individual', strat_key),
+                    lambda: create_individual_chart(strat_data(), f"Obchody - {strategy}")
+                ),
+                use_container_width=True,
+                key=f"strategy_individual_{i}_{strategy.replace(' ', '_')}"
+            )
+        
+        # Druhý řádek - heat mapa pro strategii
+        st.plotly_chart(
+            figures.get(
+                ('monthly_heatmap', strat_key),
+                lambda: create_monthly_heatmap(cube.slice(strategies=[strategy]), f"Heat mapa - {strategy}")
+            ),
+            use_container_width=True,
+            key=f"strategy_heatmap_{i}_{strategy.replace(' ', '_')}"
+        )
+        
+        # Třetí řádek - klouzavé metriky strategie (dny obchodování portfolia v řezu)
+        # Osa obchodních dní závisí na výběru strategií, proto je výběr v klíči
+        if rolling_window is not None:
+            st.plotly_chart(
+                figures.get(
+                    ('rolling', strat_key + (view_key[2], rolling_window)),
+                    lambda: create_rolling_chart(
+                        cube.rolling(rolling_window), strategy,
+                        f"Klouzavé metriky ({rolling_window} dní) - {strategy}", height=600
+                    )
+                ),
+                use_container_width=True,
+                key=f"strategy_rolling_{i}_{strategy.replace(' ', '_')}"
+            )
+        
+        st.markdown("---")
+
+def show_performance(meta):
+    """Panel ⏱ Performance - souhrn měřených fází a export do JSON"""
+    summary = PERF.summary()
+    if summary.empty:
+        st.write("Zatím žádná měření")
+        return
+    
+    st.caption("Měření všech session od startu serveru - poslední, průměrný a nejdelší běh fáze")
+    st.dataframe(summary.round({'last_ms': 1, 'mean_ms': 1, 'max_ms': 1, 'total_ms': 1, 'MB': 2}), hide_index=True)
+    
+    st.write("**Poslední záznamy:**")
+    recent = pd.DataFrame(PERF.records()[-PERF_RECENT_RECORDS:][::-1])
+    recent['at'] = pd.to_datetime(recent['at'], unit='s').dt.strftime('%H:%M:%S')
+    st.dataframe(recent.round({'ms': 1}), hide_index=True)
+    
+    # Hotová data - odložené data a on_click="ignore" vyžadují novější Streamlit než requirements.txt
+    st.download_button(
+        "💾 Export JSON",
+        data=PERF.to_json(meta).encode('utf-8'),
+        file_name=f"performance_{datetime.now():%Y%m%d_%H%M%S}.json",
+        mime="application/json"
+    )
+
 # HLAVNÍ APLIKACE
 def main():
     st.title("📊 Trading Portfolio Dashboard")
     st.subheader("SQLite + Excel - Kombinované zdroje")
     
-    # Načtení dat
-    with st.spinner("Načítám data..."):
-        df = load_combined_data()
+    # Stream a SQL režim drží v paměti jen denní agregace, obchody se čtou jen pro detailní pohledy
+    load_mode = st.sidebar.radio(
+        "Režim dat:",
+        LOAD_MODES,
+        horizontal=True,
+        help="Paměť - všechny obchody v paměti. Stream - deník se čte po blocích do denních "
+             "agregací, obchody se načtou jen pro detailní grafy. SQL - filtry se vyhodnotí "
+             "v lokální indexované SQLite kopii. Stream a SQL jsou pro velmi velké tradebooky."
+    )
+    sql_mode = load_mode == "🗄 SQL"
+    stream_mode = load_mode == "🌊 Stream"
     
-    if df.empty:
+    # Načtení dat
+    if stream_mode:
+        spool, refresher = get_stream_refresher()
+        with st.spinner("Načítám data po blocích..."):
+            aggregator, data_version = refresher.get()
+        summary = aggregator.summary()
+        total_rows = summary['rows']
+        source_counts = summary['by_source']
+        overlap = summary['overlap']
+        if total_rows:
+            first_date, last_date = pd.Timestamp(summary['first']), pd.Timestamp(summary['last'])
+    elif sql_mode:
+        mirror, refresher = get_mirror_refresher()
+        with st.spinner("Synchronizuji SQL kopii..."):
+            summary, data_version = refresher.get()
+        total_rows = summary.get('rows', 0)
+        source_counts = summary.get('by_source', {})
+        overlap = summary.get('overlap', {})
+        if total_rows:
+            first_date, last_date = pd.Timestamp(summary['first']), pd.Timestamp(summary['last'])
+    else:
+        refresher = get_data_refresher()
+        with st.spinner("Načítám data..."):
+            df, data_version = refresher.get()
+        total_rows = len(df)
+        source_counts = df['source'].value_counts().to_dict() if 'source' in df.columns else {}
+        overlap = df.attrs.get('overlap', {})
+        if total_rows:
+            first_date, last_date = df.index[0], df.index[-1]
+    
+    if total_rows == 0:
         st.error("Nepodařilo se načíst data")
         st.info(f"SQLite: {DB_PATH}")
         st.info(f"Excel: {EXCEL_PATH}")
         return
     
     # Success
-    msg = f"✅ Načteno {len(df)} obchodů"
-    if 'source' in df.columns:
-        counts = df['source'].value_counts()
-        info = " | ".join([f"{k}: {v}" for k, v in counts.items()])
+    msg = f"✅ Načteno {total_rows} obchodů"
+    if source_counts:
+        info = " | ".join([f"{k}: {v}" for k, v in source_counts.items()])
         msg += f" | {info}"
+    if overlap:
+        msg += f" | duplicity mezi zdroji: {sum(sum(owners.values()) for owners in overlap.values())}"
     st.success(msg)
     
     # Debug
     with st.expander("🔧 Debug"):
-        if 'source' in df.columns:
+        if source_counts:
             st.write("**Zdroje:**")
-            for source, count in df['source'].value_counts().items():
+            for source, count in source_counts.items():
                 st.write(f"- {source}: {count}")
         
-        st.write(f"**Rozsah:** {df['exitDate'].min()} až {df['exitDate'].max()}")
+        if overlap:
+            st.write("**Překryvy zdrojů (započteno jednou):**")
+            st.dataframe(overlap_report(overlap), hide_index=True)
+        
+        st.write(f"**Rozsah:** {first_date} až {last_date}")
+        st.write(f"**Verze dat:** {data_version} (sestaveno {refresher.built_at:%H:%M:%S})")
+        if refresher.is_refreshing:
+            st.write("**Zdroje se změnily, nová verze se načítá na pozadí**")
+        if refresher.last_error:
+            st.write(f"**Chyba poslední přestavby:** {refresher.last_error}")
         st.write("**Čas odstraněn z datumů**")
         
-        cols = ['strategy', 'exitDate', 'netPL']
-        if 'source' in df.columns:
-            cols.append('source')
-        st.dataframe(df[cols].head())
+        if stream_mode:
+            st.write(f"**Agregace:** {summary['MB']:.2f} MB, obchody odložené v {spool.path}")
+        elif sql_mode:
+            st.write(f"**SQL kopie:** {mirror.path}")
+        else:
+            cols = ['strategy', 'exitDate', 'netPL']
+            if 'source' in df.columns:
+                cols.append('source')
+            st.dataframe(df[cols].head(), hide_index=True)
+        
+        cache_stats = get_figure_cache().stats()
+        st.write(
+            f"**Cache grafů:** {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0f}%), {cache_stats['entries']} grafů, "
+            f"{cache_stats['MB']:.1f} MB, vyřazeno {cache_stats['evictions']}"
+        )
+        
+        if not (sql_mode or stream_mode):
+            memory = memory_report(df)
+            st.write(f"**Paměť:** {memory['MB'].sum():.2f} MB")
+            st.dataframe(memory)
+    
+    # Performance - vyplní se až na konci běhu, aby obsahoval i filtry, metriky a grafy
+    perf_panel = st.expander("⏱ Performance")
     
     # Filtry
     st.sidebar.header("🔧 Filtry")
     
-    time_filter = st.sidebar.selectbox(
-        "📅 Období:",
-        ["All Time", "Vlastní období (OD-DO)", "YTD", "Kalendářní rok", 
-         "Poslední kalendářní rok", "Posledních 12 měsíců", "Posledních 6 měsíců", 
-         "Poslední 3 měsíce", "Posledních 30 dní", "MTD", "Týden"]
-    )
+    time_filter = st.sidebar.selectbox("📅 Období:", TIME_FILTERS)
     
     start_date = None
     end_date = None
     if time_filter == "Vlastní období (OD-DO)":
-        min_dt = df['exitDate'].min().date()
-        max_dt = df['exitDate'].max().date()
+        min_dt = first_date.date()
+        max_dt = last_date.date()
         
         col1, col2 = st.sidebar.columns(2)
         with col1:
@@ -856,18 +383,56 @@ def main():
         with col2:
             end_date = st.date_input("DO:", value=max_dt, min_value=min_dt, max_value=max_dt)
     
+    if stream_mode:
+        all_strategies = aggregator.strategies()
+    elif sql_mode:
+        all_strategies = mirror.strategies()
+    else:
+        all_strategies = df['strategy'].unique()
     strategies = st.sidebar.multiselect(
         "📈 Strategie:",
-        options=df['strategy'].unique(),
-        default=df['strategy'].unique()
+        options=all_strategies,
+        default=all_strategies
     )
     
-    # Filtrování
-    filtered_df = filter_by_time(df, time_filter, start_date, end_date)
-    filtered_df = filtered_df[filtered_df['strategy'].isin(strategies)]
+    # Filtrování - agregace jsou řezy kostky, obchody jen pro detailní pohledy
+    start_ts, end_ts = time_filter_bounds(time_filter, start_date, end_date)
+    # Verze dat čísluje každý režim zvlášť a cache grafů je sdílená - klíč proto nese i režim
+    data_key = (load_mode, data_version)
+    with PERF.stage('filter', mode=load_mode) as rec:
+        if stream_mode:
+            # Řez kostky z agregací, obchody se čtou ze spoolu až při stavbě grafu
+            cube = aggregator.cube().slice(start_ts, end_ts, strategies)
+            time_key = tuple(None if ts is None else ts.floor('D') for ts in (start_ts, end_ts))
+            view_key = (data_key, time_key, tuple(strategies))
+            individual_data = lambda: spool.select(start_ts, end_ts, strategies)
+            strategy_trades = lambda strategy: partial(spool.select, start_ts, end_ts, [strategy])
+        elif sql_mode:
+            # Filtry jdou do SQL - denní součty pro kostku, obchody jen jako omezený vzorek
+            daily = mirror.daily(start_ts, end_ts, strategies)
+            cube = TradeCube.from_daily(daily, strategies)
+            rec['rows'] = len(daily)
+            time_key = tuple(None if ts is None else ts.floor('D') for ts in (start_ts, end_ts))
+            view_key = (data_key, time_key, tuple(strategies))
+            individual_data = lambda: mirror.trade_points(start_ts, end_ts, strategies, LOD_POINT_BUDGET)
+            strategy_trades = lambda strategy: partial(
+                mirror.trade_points, start_ts, end_ts, [strategy], LOD_POINT_BUDGET
+            )
+        else:
+            cube = get_trade_cube(data_version, df).slice(start_ts, end_ts, strategies)
+            filtered_df = filter_by_time(df, time_filter, start_date, end_date)
+            # Otisk řezu pro cache grafů - časový řez je souvislý, určí ho začátek a délka
+            time_key = (len(filtered_df), filtered_df.index[0] if len(filtered_df) else None)
+            view_key = (data_key, time_key, tuple(strategies))
+            if len(strategies) < len(all_strategies):
+                filtered_df = filtered_df[filtered_df['strategy'].isin(strategies)]
+            individual_data = lambda: filtered_df
+            strategy_trades = partial(lazy_strategy_trades, filtered_df)
+            rec['rows'], rec['nbytes'] = len(filtered_df), frame_bytes(filtered_df)
     
     # Metriky
-    metrics = calc_metrics(filtered_df)
+    with PERF.stage('metrics', rows=total_rows):
+        metrics = cube.metrics(INITIAL_CAPITAL)
     
     col1, col2, col3, col4, col5 = st.columns(5)
     
@@ -919,62 +484,88 @@ def main():
             st.write(f"Max Drawdown: ${metrics.get('max_drawdown', 0):.2f}")
             st.write(f"Počáteční kapitál: ${INITIAL_CAPITAL:,}")
         
-        st.plotly_chart(create_cumulative_chart(filtered_df), use_container_width=True)
-        st.plotly_chart(create_individual_chart(filtered_df), use_container_width=True)
+        figures = get_figure_cache()
+        st.plotly_chart(
+            figures.get(('cumulative', view_key), lambda: create_cumulative_chart(cube.daily())),
+            use_container_width=True,
+            key="portfolio_cumulative"
+        )
+        st.plotly_chart(
+            figures.get(('individual', view_key), lambda: create_individual_chart(individual_data())),
+            use_container_width=True,
+            key="portfolio_individual"
+        )
     
     with tab2:
         st.subheader("Strategie")
         
-        strategy_data = []
-        for strategy in filtered_df['strategy'].unique():
-            strat_df = filtered_df[filtered_df['strategy'] == strategy]
-            strat_metrics = calc_metrics(strat_df)
-            strategy_data.append({
-                'Strategie': strategy,
-                'P&L (USD)': f"${strat_metrics['total_pl']:,.2f}",
-                'P&L (%)': f"{strat_metrics['total_pl_percent']:.2f}%",
-                'Obchody': strat_metrics['total_trades'],
-                'Win Rate': f"{strat_metrics['win_rate']:.1f}%",
-                'Profit Factor': f"{strat_metrics['profit_factor']:.2f}"
-            })
-        
-        st.dataframe(pd.DataFrame(strategy_data), use_container_width=True)
-        st.plotly_chart(create_strategy_chart(filtered_df), use_container_width=True, key="strategy_comparison")
+        # Metriky všech strategií v jednom průchodu
+        with PERF.stage('metrics.strategies') as rec:
+            if sql_mode or stream_mode:
+                table = cube.strategy_metrics(INITIAL_CAPITAL)
+            else:
+                table = grouped_metrics(filtered_df, INITIAL_CAPITAL)
+            rec['rows'] = len(table)
+        st.dataframe(format_strategy_table(table), use_container_width=True)
+        st.plotly_chart(
+            get_figure_cache().get(('strategy', view_key), lambda: create_strategy_chart(cube.strategy_totals())),
+            use_container_width=True,
+            key="strategy_comparison"
+        )
     
     with tab3:
-        st.subheader("Grafy jednotlivých strategií")
+        st.subheader("Klouzavé metriky")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            rolling_window = st.selectbox("Okno (obchodní dny):", ROLLING_WINDOWS, key="rolling_window")
+        with col2:
+            rolling_metric = st.selectbox(
+                "Porovnání strategií:", list(ROLLING_METRIC_LABELS),
+                format_func=ROLLING_METRIC_LABELS.get, key="rolling_metric"
+            )
         
-        for i, strategy in enumerate(strategies):
-            st.write(f"**{strategy}**")
-            strat_data = filtered_df[filtered_df['strategy'] == strategy]
-            
-            # První řádek - kumulativní a jednotlivé obchody
-            col1, col2 = st.columns(2)
-            with col1:
-                st.plotly_chart(
-                    create_cumulative_chart(strat_data, f"Kumulativní - {strategy}"),
-                    use_container_width=True,
-                    key=f"strategy_cumulative_{i}_{strategy.replace(' ', '_')}"
-                )
-            with col2:
-                st.plotly_chart(
-                    create_individual_chart(strat_data, f"Obchody - {strategy}"),
-                    use_container_width=True,
-                    key=f"strategy_individual_{i}_{strategy.replace(' ', '_')}"
-                )
-            
-            # Druhý řádek - heat mapa pro strategii
+        # Metriky se počítají z denních součtů kostky - jeden průchod na okno pro všechny strategie
+        figures = get_figure_cache()
+        rolling_key = view_key + (rolling_window,)
+        if len(cube.daily()) < rolling_window:
+            st.info(f"Období má méně než {rolling_window} obchodních dní - zvolte kratší okno nebo delší období")
+        else:
+            st.plotly_chart(
+                figures.get(
+                    ('rolling', rolling_key),
+                    lambda: create_rolling_chart(
+                        cube.rolling(rolling_window), title=f"Klouzavé metriky portfolia ({rolling_window} dní)"
+                    )
+                ),
+                use_container_width=True,
+                key="rolling_portfolio"
+            )
             st.plotly_chart(
-                create_monthly_heatmap(strat_data, f"Heat mapa - {strategy}"),
+                figures.get(
+                    ('rolling_comparison', rolling_key + (rolling_metric,)),
+                    lambda: create_rolling_comparison_chart(
+                        cube.rolling(rolling_window), rolling_metric,
+                        f"{ROLLING_METRIC_LABELS[rolling_metric]} - {rolling_window} dní, portfolio a strategie"
+                    )
+                ),
                 use_container_width=True,
-                key=f"strategy_heatmap_{i}_{strategy.replace(' ', '_')}"
+                key="rolling_comparison"
             )
-            
-            st.markdown("---")
+        
+        st.subheader("Grafy jednotlivých strategií")
+        
+        show_strategy_charts(
+            cube, strategies, view_key, strategy_trades, daily_cumulative=sql_mode or stream_mode,
+            rolling_window=rolling_window
+        )
+    
+    with perf_panel:
+        show_performance({'mode': load_mode, 'rows': total_rows, 'data_version': data_version})
     
     # Footer
     st.sidebar.markdown("---")
-    st.sidebar.info(f"📊 {len(df)} obchodů")
+    st.sidebar.info(f"📊 {total_rows} obchodů")
     st.sidebar.info(f"💰 Kapitál: ${INITIAL_CAPITAL:,}")
     st.sidebar.info("📁 SQLite + Excel")
 